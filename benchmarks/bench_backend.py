@@ -0,0 +1,54 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+
+RPC latency and throughput of the local benchmark service on every event loop backend.
+
+Run from the repository root after generating the rpc code::
+
+    PYTHONPATH=src python benchmarks/bench_backend.py
+"""
+
+import os
+import subprocess  # noqa: S404
+import sys
+import tempfile
+from pathlib import Path
+
+from pyasyncrpc.model.BenchmarkConfig import BenchmarkReport
+
+BACKENDS = ("asyncio", "uvloop", "trio")
+ARGS = (
+    *("--handle_func_name", "add_ServiceServicer_to_server"),
+    *("--server_stub_name", "ServiceStub"),
+    *("--request_func_name", "ServiceRequest"),
+    *("--reply_func_name", "ServiceReply"),
+    *("--pd2_pkg", "rpc.simple_pb2"),
+    *("--pd2_grpc_pkg", "rpc.simple_pb2_grpc"),
+    *("--method", "sayHello"),
+    *("--concurrency", "50", "--duration", "5", "--warmup", "1"),
+)
+
+
+def main() -> None:
+    """Run the bench command in a fresh process per backend, the loop policy being process-wide."""
+    print(f"{'requested':<12}{'backend':<10}{'throughput':>14}{'p50':>10}{'p99':>10}{'p999':>10}")  # noqa: T201
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in BACKENDS:
+            save = Path(tmp) / f"{backend}.json"
+            subprocess.run(  # noqa: S603
+                [sys.executable, "-m", "pyasyncrpc", "bench", "--backend", backend, "--save", str(save), *ARGS],
+                check=True,
+                env={**os.environ, "PYTHONPATH": os.pathsep.join(["src", "tests", os.environ.get("PYTHONPATH", "")])},
+                stdout=subprocess.DEVNULL,
+            )
+            report = BenchmarkReport.model_validate_json(save.read_text())
+            for result in report.results:
+                print(  # noqa: T201
+                    f"{backend:<12}{report.backend:<10}{result.throughput:>10.1f} rps"
+                    f"{result.p50:>8.3f}ms{result.p99:>8.3f}ms{result.p999:>8.3f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
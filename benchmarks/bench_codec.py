@@ -0,0 +1,68 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+
+Encoding of numeric and binary python script results, JSON text against the binary frame.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_codec.py
+"""
+
+import time
+from array import array
+from typing import Any, Callable, Dict
+
+from pyasyncrpc.model.PyScriptConfig import PyScriptResult
+from pyasyncrpc.util.PyScriptCodec import PyScriptCodec
+
+ROUNDS = 20
+SIZES = (1_000, 100_000, 1_000_000)
+
+
+def measure(name: str, encode: Callable[[], Any], decode: Callable[[Any], object]) -> None:
+    """Print the mean encoding and decoding time, and the encoded size."""
+    data = encode()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        data = encode()
+    encoded = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        decode(data)
+    decoded = time.perf_counter() - start
+    print(  # noqa: T201
+        f"{name:<28}{encoded / ROUNDS * 1000:10.3f} ms{decoded / ROUNDS * 1000:10.3f} ms{len(data) / 1024:12.1f} KiB"
+    )
+
+
+def main() -> None:
+    """Compare the text and the binary encodings."""
+    print(f"{'':<28}{'encode':>13}{'decode':>13}{'size':>16}")  # noqa: T201
+    for size in SIZES:
+        responses: Dict[str, Dict[str, Any]] = {
+            "floats": {"values": array("d", range(size))},
+            "bytes": {"values": bytes(size)},
+        }
+        for kind, response in responses.items():
+            result = PyScriptResult(response=response)
+            text = PyScriptResult(response={key: list(value) for key, value in response.items()})
+            measure(
+                f"{kind}[{size}] str",
+                lambda result=result: f"Execute python script:{result}".encode(),
+                lambda data: data.decode(),
+            )
+            measure(
+                f"{kind}[{size}] json",
+                text.model_dump_json,
+                lambda data: PyScriptResult.model_validate_json(data),
+            )
+            measure(
+                f"{kind}[{size}] binary",
+                lambda result=result: PyScriptCodec.dumps(result),
+                lambda data: PyScriptCodec.loads(data, PyScriptResult),
+            )
+
+
+if __name__ == "__main__":
+    main()
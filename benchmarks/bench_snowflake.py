@@ -0,0 +1,41 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+
+Throughput of the snowflake ID generator.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_snowflake.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from pyasyncrpc.util.Snowflake import Snowflake
+
+IDS = 1_000_000
+
+
+def measure(name: str, func: Callable[[], object], threads: int = 1) -> None:
+    """Print the number of IDs generated per second."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for _ in range(threads):
+            pool.submit(func)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28}{IDS / elapsed / 1e6:8.2f} M ids/s")  # noqa: T201
+
+
+def main() -> None:
+    """Compare single IDs, bulk blocks and contended threads."""
+    snowflake = Snowflake(1, 1)
+    measure("next_id", lambda: [snowflake.next_id() for _ in range(IDS)])
+    measure("next_id, 4 threads", lambda: [snowflake.next_id() for _ in range(IDS // 4)], 4)
+    measure("next_ids(4096)", lambda: [snowflake.next_ids(4096) for _ in range(IDS // 4096)])
+    measure("next_ids(4096), 4 threads", lambda: [snowflake.next_ids(4096) for _ in range(IDS // 4096 // 4)], 4)
+
+
+if __name__ == "__main__":
+    main()
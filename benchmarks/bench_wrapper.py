@@ -0,0 +1,84 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+
+Per-request overhead of the register_method wrapper.
+
+Run from the repository root after generating the rpc code::
+
+    PYTHONPATH=src:tests python benchmarks/bench_wrapper.py
+"""
+
+import time
+from typing import Any, Callable
+
+import anyio
+from pyasyncrpc.model.GRPCConfig import GRPCInfo
+from pyasyncrpc.model.RequestContext import FastRequestContext, RequestContext
+from pyasyncrpc.service.GRPCService import GRPCService
+from pyasyncrpc.util.Snowflake import Snowflake
+from pydantic import BaseModel
+
+REQUESTS = 100_000
+
+
+class Data(BaseModel):
+    """reply data."""
+
+    message: str
+    status: int
+
+
+def create_service() -> GRPCService:
+    """Service without any registered method."""
+    info = GRPCInfo(
+        service_name="Simple",
+        handle_func_name="add_ServiceServicer_to_server",
+        server_stub_name="ServiceStub",
+        request_func_name="ServiceRequest",
+        reply_func_name="ServiceReply",
+        pd2_pkg="rpc.simple_pb2",
+        pd2_grpc_pkg="rpc.simple_pb2_grpc",
+        listen_addr="localhost:0",
+    )
+    return GRPCService(info)
+
+
+async def measure(name: str, wrap: Callable[..., Any], request: object) -> None:
+    """Print the mean wrapper overhead per request."""
+    for _ in range(1000):
+        await wrap(None, request, None)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await wrap(None, request, None)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24}{elapsed / REQUESTS * 1e6:8.2f} us/request")  # noqa: T201
+
+
+async def main() -> None:
+    """Compare the wrapper variants."""
+    service = create_service()
+    reply_func = service.config.reply_func
+    request = service.config.request_func(name="bench")  # type: ignore[call-arg]
+
+    async def model_handler(ctx: Any) -> Data:  # noqa: ANN401, ARG001
+        return Data(message="hello", status=200)
+
+    async def message_handler(ctx: FastRequestContext) -> object:  # noqa: ARG001
+        return reply_func(message="hello", status=200)
+
+    snowflake = Snowflake(1, 1)
+
+    async def legacy(*args: Any) -> object:
+        ctx = RequestContext(request_id=snowflake.next_id(), request=args[1], context=args[2])
+        ret = await model_handler(ctx)
+        return reply_func(**ret.model_dump(by_alias=True))
+
+    await measure("legacy (model_dump)", legacy, request)
+    await measure("validated context", service.register_method("validated")(model_handler), request)
+    await measure("fast context + model", service.register_method("fast_model", fast=True)(model_handler), request)
+    await measure("fast context + message", service.register_method("fast_msg", fast=True)(message_handler), request)
+
+
+if __name__ == "__main__":
+    anyio.run(main)
@@ -3,18 +3,19 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
+import json
+import logging
+import sys
+from pathlib import Path
 from typing import Any
 
 import click
 
 from pyasyncrpc._version import version
-from pyasyncrpc.launcher.LauncherFactory import LauncherFactory
-from pyasyncrpc.log.LoguruLog import LoguruLog
-from pyasyncrpc.model.GRPCConfig import GRPCInfo, GRPCMethodInfo
-from pyasyncrpc.service.GRPCService import GRPCService
+from pyasyncrpc.util.ImportProfiler import ImportProfiler
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option("-v", "--version", is_flag=True, help="print version")
 @click.option("--service_name", help="any string")
 @click.option("--handle_func_name", help="eg. add_XXServicer_to_server")
@@ -24,18 +25,134 @@ from pyasyncrpc.service.GRPCService import GRPCService
 @click.option("--pd2_pkg", help="")
 @click.option("--pd2_grpc_pkg", help="")
 @click.option("--listen_addr", default="[::]:50051", help="service address")
+@click.option("--workers", default=1, type=int, help="number of worker processes sharing the service address")
+@click.option(
+    "--backend",
+    default="asyncio",
+    type=click.Choice(["asyncio", "uvloop", "trio"]),
+    help="event loop backend, asyncio when unavailable",
+)
+@click.option("--reload", is_flag=True, help="replace the processes without downtime on SIGHUP or SIGUSR2")
+@click.option("--worker_id", type=int, help="snowflake worker id, defaults to $PYASYNCRPC_WORKER_ID")
+@click.option("--data_center_id", type=int, help="snowflake data center id, defaults to $PYASYNCRPC_DATA_CENTER_ID")
+@click.option("--admin", is_flag=True, help="serve the admin service")
+@click.option("--health/--no_health", default=True, help="serve grpc.health.v1.Health and the load report")
+@click.option("--thread_limiter", default=40, type=int, help="tokens of the default thread limiter")
+@click.option("--adaptive_thread_limiter", help='JSON format configuration, eg. {"min_tokens": 4, "max_tokens": 200}')
+@click.option("--warmup", help='JSON format configuration, eg. {"pkgs": [], "requests": {"sayHello": [{}]}}')
+@click.option("--tracing", help='JSON format configuration, eg. {"sample_rate": 0.01, "exporter": "ring"}')
+@click.option("--profiler", help='JSON format configuration, eg. {"duration": 10, "slow_request_threshold": 1}')
+@click.option("--metrics_file", help="write the metrics in the Prometheus text format to the file")
+@click.option("--metrics_host", default="127.0.0.1", help="the host serving the metrics")
+@click.option("--metrics_port", type=int, help="serve the metrics in the Prometheus text format on the port")
+@click.option("--log_level", default="DEBUG", help="minimum level of the background log writer")
+@click.option("--log_queue_size", default=0, type=int, help="write logs in the background through a bounded queue")
+@click.option("--log_block", is_flag=True, help="block instead of dropping records when the log queue is full")
 @click.option("--method", multiple=True, default=(), help="JSON format configuration")
+@click.option("--profile_startup", is_flag=True, help="log the import time of the modules loaded at startup")
 def main(**kwargs: Any) -> None:
     """The asynchronous rpc application."""
+    if click.get_current_context().invoked_subcommand is not None:
+        return
     if kwargs.get("version"):
         print(version)  # noqa: T201
         return
+    profiler = ImportProfiler()
+    if kwargs.get("profile_startup"):
+        profiler.install()
+    from pyasyncrpc.launcher.LauncherFactory import LauncherFactory
+    from pyasyncrpc.log.Log import Log
+    from pyasyncrpc.log.LoguruLog import LoguruLog
+    from pyasyncrpc.log.QueueLog import QueueLog
+    from pyasyncrpc.model.GRPCConfig import GRPCInfo, GRPCMethodInfo
+    from pyasyncrpc.service.GRPCService import GRPCService
+
+    if kwargs.get("metrics_file") or kwargs.get("metrics_port") is not None:
+        kwargs["metrics"] = {
+            "file": kwargs["metrics_file"],
+            "host": kwargs["metrics_host"],
+            "port": kwargs["metrics_port"],
+        }
+    for key in ("adaptive_thread_limiter", "warmup", "tracing", "profiler"):
+        if kwargs.get(key):
+            kwargs[key] = json.loads(kwargs[key])
     info = GRPCInfo.model_validate(kwargs)
     methods_info = [GRPCMethodInfo.model_validate_json(_) for _ in kwargs.get("method", [])]
-    service = GRPCService(info, methods_info, LoguruLog())
-    launcher = LauncherFactory.create_launcher(service)
+    log: Log = LoguruLog()
+    if kwargs.get("log_queue_size"):
+        log = QueueLog(kwargs["log_level"], kwargs["log_queue_size"], block=kwargs["log_block"])
+    service = GRPCService(info, methods_info, log)
+    launcher = LauncherFactory.create_launcher(service, info.workers, info.backend, hot_reload=info.reload)
+    if kwargs.get("profile_startup"):
+        profiler.uninstall()
+        logging.info(profiler.report())
     launcher.launch()
 
 
+@main.command()
+@click.option("--target", help="service address, a local service is started when omitted")
+@click.option("--pythonpath", help="path added to sys.path to import the generated code")
+@click.option("--handle_func_name", help="eg. add_XXServicer_to_server, required without --target")
+@click.option("--server_stub_name", required=True, help="eg. XXStub")
+@click.option("--request_func_name", required=True, help="grpc request message name")
+@click.option("--reply_func_name", required=True, help="grpc response message name")
+@click.option("--pd2_pkg", required=True, help="")
+@click.option("--pd2_grpc_pkg", required=True, help="")
+@click.option("--method", "methods", multiple=True, required=True, help="method to drive, eg. sayHello")
+@click.option("--mode", type=click.Choice(["closed", "open"]), default="closed", help="closed-loop or open-loop load")
+@click.option("--concurrency", default=10, type=int, help="closed-loop workers or open-loop outstanding requests")
+@click.option("--rate", type=float, help="open-loop requests per second")
+@click.option("--duration", default=10.0, type=float, help="measured seconds per method")
+@click.option("--payload_size", default=16, type=int, help="request payload size in bytes")
+@click.option("--warmup", default=1.0, type=float, help="unmeasured seconds per method")
+@click.option("--channels", default=1, type=int, help="number of channels used round-robin")
+@click.option("--save", help="write the results to the JSON file")
+@click.option("--baseline", help="compare the results with the JSON file")
+@click.option("--threshold", default=0.1, type=float, help="tolerated throughput or p99 regression ratio")
+@click.option(
+    "--backend",
+    default="asyncio",
+    type=click.Choice(["asyncio", "uvloop", "trio"]),
+    help="event loop backend of the client and the local service",
+)
+def bench(**kwargs: Any) -> None:
+    """Measure throughput and tail latency of the methods."""
+    import anyio
+
+    from pyasyncrpc.launcher.Launcher import Launcher
+    from pyasyncrpc.model.BenchmarkConfig import BenchmarkInfo, BenchmarkReport
+    from pyasyncrpc.service.Benchmark import Benchmark
+
+    if kwargs["mode"] == "open" and not kwargs.get("rate"):
+        msg = "--rate is required in the open-loop mode"
+        raise click.UsageError(msg)
+    if not kwargs.get("target") and not kwargs.get("handle_func_name"):
+        msg = "--handle_func_name is required to start the local service without --target"
+        raise click.UsageError(msg)
+    if kwargs.get("pythonpath"):
+        sys.path.insert(0, str(Path(kwargs["pythonpath"]).resolve()))
+    backend, backend_options = Launcher.resolve_backend(kwargs["backend"])
+    report = anyio.run(
+        Benchmark.run_all, BenchmarkInfo.model_validate(kwargs), backend=backend, backend_options=backend_options
+    )
+    report.version = version
+    report.backend = "uvloop" if backend_options.get("use_uvloop") else backend
+    for result in report.results:
+        click.echo(
+            f"{result.method:<20}{result.mode:<8}{result.throughput:>10.1f} rps"
+            f"  p50 {result.p50:.3f}  p90 {result.p90:.3f}  p99 {result.p99:.3f}  p999 {result.p999:.3f} ms"
+            f"  errors {result.errors}"
+        )
+    if kwargs.get("save"):
+        Path(kwargs["save"]).write_text(report.model_dump_json(indent=2))
+    if kwargs.get("baseline"):
+        baseline = BenchmarkReport.model_validate_json(Path(kwargs["baseline"]).read_text())
+        regressions = report.compare(baseline, kwargs["threshold"])
+        for regression in regressions:
+            click.echo(f"regression {regression}", err=True)
+        if regressions:
+            sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import itertools
+from typing import Any, ClassVar, List, Optional, Sequence, Tuple
+
+import grpc
+
+
+class PooledChannel:
+    """channel of the pool with its stub and the number of calls in flight."""
+
+    __slots__ = ("channel", "endpoint", "in_flight", "stub")
+
+    def __init__(self, endpoint: str, channel: grpc.aio.Channel, stub: Any) -> None:  # noqa: ANN401
+        """Init."""
+        self.endpoint = endpoint
+        self.channel = channel
+        self.stub = stub
+        self.in_flight = 0
+
+
+class ChannelPool:
+    """several channels per endpoint, each one a separate HTTP/2 connection."""
+
+    BALANCES: ClassVar[Tuple[str, ...]] = ("round_robin", "least_in_flight")
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        server_stub: type,
+        channels: int = 2,
+        balance: str = "round_robin",
+        options: Sequence[Tuple[str, Any]] = (),
+    ) -> None:
+        """Init."""
+        if balance not in ChannelPool.BALANCES:
+            msg = f"Unknown balance:{balance}"
+            raise RuntimeError(msg)
+        if not endpoints:
+            msg = "At least one endpoint is required"
+            raise RuntimeError(msg)
+        self.balance = balance
+        # a local subchannel pool keeps grpc from sharing one connection between the channels of an endpoint
+        self.channels: List[PooledChannel] = []
+        for endpoint in endpoints:
+            for _ in range(max(1, channels)):
+                channel = grpc.aio.insecure_channel(endpoint, (*options, ("grpc.use_local_subchannel_pool", 1)))
+                self.channels.append(PooledChannel(endpoint, channel, server_stub(channel)))
+        self._next = itertools.count()
+
+    def select(self, exclude: Optional[PooledChannel] = None) -> PooledChannel:
+        """Next channel by round robin, or the least loaded one starting from the round-robin position."""
+        size = len(self.channels)
+        start = next(self._next)
+        candidates: List[PooledChannel] = [self.channels[(start + index) % size] for index in range(size)]
+        if exclude is not None and size > 1:
+            candidates = [pooled for pooled in candidates if pooled is not exclude]
+        if self.balance == "least_in_flight":
+            return min(candidates, key=lambda pooled: pooled.in_flight)
+        return candidates[0]
+
+    async def close(self) -> None:
+        """Close the channels."""
+        for pooled in self.channels:
+            await pooled.channel.close()
@@ -0,0 +1,186 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import importlib
+import random
+import time
+from types import TracebackType
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple, Type
+
+import anyio
+import grpc
+from typing_extensions import Self
+
+from pyasyncrpc.client.ChannelPool import ChannelPool, PooledChannel
+from pyasyncrpc.client.RetryBudget import RetryBudget
+from pyasyncrpc.model.GRPCClientConfig import GRPCClientInfo
+from pyasyncrpc.model.GRPCConfig import GRPCInfo
+from pyasyncrpc.model.PyScriptConfig import PyScriptBatch, PyScriptBatchResult, PyScriptConfig, PyScriptResult
+from pyasyncrpc.util.PyScriptCodec import PyScriptCodec
+
+
+class GRPCClient:
+    """pooled grpc client of the service described by the grpc info."""
+
+    def __init__(self, info: GRPCInfo, client_info: Optional[GRPCClientInfo] = None) -> None:
+        """Init."""
+        client_info = client_info or GRPCClientInfo()
+        pd2_pkg = importlib.import_module(info.pd2_pkg)
+        pd2_grpc_pkg = importlib.import_module(info.pd2_grpc_pkg)
+        self.info = client_info
+        self.request_func: type = getattr(pd2_pkg, info.request_func_name)
+        self._pool = ChannelPool(
+            client_info.endpoints or [info.listen_addr],
+            getattr(pd2_grpc_pkg, info.server_stub_name),
+            client_info.channels,
+            client_info.balance,
+            client_info.options,
+        )
+        self._budget = RetryBudget(**client_info.retry_budget.model_dump())
+        self._retry_codes = {grpc.StatusCode[_] for _ in client_info.retry_codes}
+        if client_info.encoding not in ("json", "binary"):
+            msg = f"Unknown encoding:{client_info.encoding}"
+            raise RuntimeError(msg)
+
+    @property
+    def pool(self) -> ChannelPool:
+        """Channel pool."""
+        return self._pool
+
+    @property
+    def budget(self) -> RetryBudget:
+        """Retry budget shared by the retries and the hedges."""
+        return self._budget
+
+    async def call(self, method: str, request: object, timeout: Optional[float] = None) -> Any:  # noqa: ANN401, ASYNC109
+        """Call the unary method, retrying the retryable codes within the deadline and the budget."""
+        timeout = self.info.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self._budget.deposit()
+        retries = 0
+        while True:
+            try:
+                return await self.attempt(method, request, deadline)
+            except grpc.aio.AioRpcError as e:
+                if e.code() not in self._retry_codes or retries >= self.info.retries or not self._budget.withdraw():
+                    raise
+                retries += 1
+                backoff = self.info.retry_backoff * 2 ** (retries - 1) * random.uniform(0.5, 1.5)  # noqa: S311
+                if deadline is not None and time.monotonic() + backoff >= deadline:
+                    raise
+                await anyio.sleep(backoff)
+
+    async def attempt(self, method: str, request: object, deadline: Optional[float]) -> Any:  # noqa: ANN401
+        """Send the request, hedged on another channel when no reply came within the hedge delay.
+
+        The attempts run in a task group cancelled once the first reply arrives, the last error is raised when they
+        all fail.
+        """
+        first = self._pool.select()
+        if not self.info.hedge_delay:
+            return await self.send(first, method, request, deadline)
+        send, receive = anyio.create_memory_object_stream(self.info.max_hedges + 1)
+
+        async def hedge(pooled: PooledChannel) -> None:
+            try:
+                reply = await self.send(pooled, method, request, deadline)
+            except Exception as e:  # noqa: BLE001
+                send.send_nowait((False, e))
+            else:
+                send.send_nowait((True, reply))
+
+        error: Optional[BaseException] = None
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(hedge, first)
+            pending, hedges = 1, 0
+            while pending:
+                outcome: Optional[Tuple[bool, Any]] = None
+                with anyio.move_on_after(self.info.hedge_delay if hedges < self.info.max_hedges else None):
+                    outcome = await receive.receive()
+                if outcome is None:
+                    if self._budget.withdraw():
+                        tg.start_soon(hedge, self._pool.select(exclude=first))
+                        pending += 1
+                        hedges += 1
+                    else:
+                        hedges = self.info.max_hedges
+                    continue
+                pending -= 1
+                ok, value = outcome
+                if ok:
+                    tg.cancel_scope.cancel()
+                    return value
+                error = value
+        raise error  # type: ignore[misc]
+
+    @staticmethod
+    async def send(pooled: PooledChannel, method: str, request: object, deadline: Optional[float]) -> Any:  # noqa: ANN401
+        """Send the request on the channel."""
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        pooled.in_flight += 1
+        try:
+            return await getattr(pooled.stub, method)(request, timeout=timeout)
+        finally:
+            pooled.in_flight -= 1
+
+    async def stream(
+        self,
+        method: str,
+        request: object,
+        timeout: Optional[float] = None,  # noqa: ASYNC109
+    ) -> AsyncIterator[Any]:
+        """Iterate the replies of the server-streaming method, without retries or hedges."""
+        pooled = self._pool.select()
+        timeout = self.info.timeout if timeout is None else timeout
+        pooled.in_flight += 1
+        try:
+            async for reply in getattr(pooled.stub, method)(request, timeout=timeout):
+                yield reply
+        finally:
+            pooled.in_flight -= 1
+
+    def create_request(self, value: str) -> object:
+        """Request message carrying the value in the request field."""
+        return self.request_func(**{self.info.request_field: value})
+
+    async def execute_py_script(
+        self,
+        config: PyScriptConfig,
+        method: str = "executePyScript",
+        timeout: Optional[float] = None,  # noqa: ASYNC109
+    ) -> PyScriptResult:
+        """Execute the python script, the result comes in JSON in the reply field or binary in the data field."""
+        if self.info.encoding == "binary":
+            request = self.request_func(**{self.info.data_field: PyScriptCodec.dumps(config)})
+            reply = await self.call(method, request, timeout)
+            return PyScriptCodec.loads(getattr(reply, self.info.data_field), PyScriptResult)
+        reply = await self.call(method, self.create_request(config.model_dump_json()), timeout)
+        return PyScriptResult.model_validate_json(getattr(reply, self.info.reply_field))
+
+    async def execute_py_script_batch(
+        self,
+        configs: Sequence[PyScriptConfig],
+        concurrency: int = 16,
+        method: str = "executePyScriptBatch",
+        timeout: Optional[float] = None,  # noqa: ASYNC109
+    ) -> List[PyScriptResult]:
+        """Execute the python scripts in one call, the reply field carries the batch result in JSON."""
+        batch = PyScriptBatch(configs=[_.model_dump_json() for _ in configs], concurrency=concurrency)
+        reply = await self.call(method, self.create_request(batch.model_dump_json()), timeout)
+        return PyScriptBatchResult.model_validate_json(getattr(reply, self.info.reply_field)).results
+
+    async def close(self) -> None:
+        """Close the channels."""
+        await self._pool.close()
+
+    async def __aenter__(self) -> Self:
+        """Enter."""
+        return self
+
+    async def __aexit__(
+        self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException], exc_tb: Optional[TracebackType]
+    ) -> None:
+        """Exit."""
+        await self.close()
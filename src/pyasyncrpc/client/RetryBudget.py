@@ -0,0 +1,27 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+
+class RetryBudget:
+    """token bucket bounding the extra attempts to a ratio of the requests."""
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10, max_tokens: float = 100) -> None:
+        """Init."""
+        self.ratio = ratio
+        self.max_tokens = max(max_tokens, min_tokens)
+        self.tokens = min_tokens
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        """Earn a fraction of a retry for a request."""
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        """Spend a retry, False when the budget is exhausted."""
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        return True
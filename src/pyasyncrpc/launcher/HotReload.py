@@ -0,0 +1,77 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import logging
+import os
+import signal
+import socket
+import subprocess  # noqa: S404
+import sys
+from typing import ClassVar, Dict, List, Tuple
+
+
+class HotReload:
+    """start the process replacing the current one, which reports ready on an inherited socket."""
+
+    SIGNAL_NAMES: ClassVar[Tuple[str, ...]] = ("SIGHUP", "SIGUSR2")
+    READY_FD_ENV: ClassVar[str] = "PYASYNCRPC_READY_FD"
+    READY_TIMEOUT: ClassVar[float] = 60
+
+    @staticmethod
+    def signals() -> Tuple[signal.Signals, ...]:
+        """Reload signals of the platform, none on windows."""
+        return tuple(getattr(signal, name) for name in HotReload.SIGNAL_NAMES if hasattr(signal, name))
+
+    @staticmethod
+    def spawn_replacement(env: Dict[str, str]) -> Tuple[socket.socket, "subprocess.Popen[bytes]"]:
+        """Start the process replacing this one, it reports ready on the returned socket."""
+        parent, child = socket.socketpair()
+        env = {**os.environ, **env, HotReload.READY_FD_ENV: str(child.fileno())}
+        try:
+            process = subprocess.Popen(  # noqa: S603
+                HotReload.reload_command(), env=env, pass_fds=(child.fileno(),), start_new_session=True
+            )
+        except BaseException:
+            parent.close()
+            raise
+        finally:
+            child.close()
+        logging.info(f"reload:started the new process {process.pid}")
+        return parent, process
+
+    @staticmethod
+    def check_ready(process: "subprocess.Popen[bytes]", ready: bytes) -> bool:
+        """Whether the new process reported ready, it is killed otherwise."""
+        if ready:
+            logging.info(f"reload:the new process {process.pid} is ready, stop accepting")
+            return True
+        logging.error(f"reload:the new process {process.pid} did not report ready, keep serving")
+        if process.poll() is None:
+            process.kill()
+        return False
+
+    @staticmethod
+    def notify_ready() -> None:
+        """Tell the process being replaced that this one serves."""
+        fd = os.environ.pop(HotReload.READY_FD_ENV, None)
+        if fd is not None:
+            HotReload.send_ready(int(fd))
+
+    @staticmethod
+    def send_ready(fd: int) -> None:
+        """Report ready on the inherited socket."""
+        with socket.socket(fileno=fd) as sock:
+            sock.sendall(b"ready")
+
+    @staticmethod
+    def reload_command() -> List[str]:
+        """Command line of the current process."""
+        orig_argv: List[str] = getattr(sys, "orig_argv", [])
+        if orig_argv:
+            return [sys.executable, *orig_argv[1:]]
+        spec = getattr(sys.modules["__main__"], "__spec__", None)
+        if spec is not None and spec.name:
+            return [sys.executable, "-m", spec.name.rpartition(".__main__")[0] or spec.name, *sys.argv[1:]]
+        return [sys.executable, *sys.argv]
@@ -3,8 +3,12 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
+import importlib.util
+import logging
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Awaitable, Callable, ClassVar, Dict, Optional, Tuple
+
+import anyio
 
 from pyasyncrpc.service.Service import Service
 
@@ -12,9 +16,18 @@ from pyasyncrpc.service.Service import Service
 class Launcher(ABC):
     """application launcher."""
 
+    BACKENDS: ClassVar[Dict[str, Tuple[str, Dict[str, Any], Optional[str]]]] = {
+        "asyncio": ("asyncio", {}, None),
+        "uvloop": ("asyncio", {"use_uvloop": True}, "uvloop"),
+        "trio": ("trio", {}, "trio"),
+    }
+    GRPC_BACKENDS: ClassVar[Tuple[str, ...]] = ("asyncio",)
+
     def __init__(self) -> None:
         """Init."""
         self._service: Optional[Service] = None
+        self.backend = "asyncio"
+        self.hot_reload = False
 
     @abstractmethod
     def launch(self) -> None:
@@ -31,3 +44,24 @@ class Launcher(ABC):
             msg = "Service instance must be added"
             raise RuntimeError(msg)
         return self._service
+
+    def run(self, func: Callable[[], Awaitable[None]]) -> None:
+        """Run the function on the event loop of the backend."""
+        backend, backend_options = Launcher.resolve_backend(self.backend)
+        anyio.run(func, backend=backend, backend_options=backend_options)
+
+    @staticmethod
+    def resolve_backend(name: str) -> Tuple[str, Dict[str, Any]]:
+        """The anyio backend and its options, asyncio when the backend is not available."""
+        if name not in Launcher.BACKENDS:
+            msg = f"Unknown backend:{name}"
+            raise RuntimeError(msg)
+        backend, backend_options, module = Launcher.BACKENDS[name]
+        if backend not in Launcher.GRPC_BACKENDS:
+            logging.warning(f"grpc.aio does not run on {name}, falling back to asyncio")
+            return "asyncio", {}
+        if module is not None and importlib.util.find_spec(module) is None:
+            logging.warning(f"{module} is not installed, falling back to asyncio")
+            return "asyncio", {}
+        logging.info(f"event loop backend:{name}")
+        return backend, dict(backend_options)
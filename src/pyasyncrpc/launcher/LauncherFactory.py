@@ -3,28 +3,50 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
+import importlib
 import platform
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar, Dict, Type, cast
 
-import pyasyncrpc.launcher
 from pyasyncrpc.launcher.Launcher import Launcher
 from pyasyncrpc.service.Service import Service
-from pyasyncrpc.util.utils import get_special_modules
+
+if TYPE_CHECKING:
+    from pyasyncrpc.launcher.MultiProcessLauncher import MultiProcessLauncher
 
 
 class LauncherFactory:
     """application launcher factory."""
 
     PLATFORM: ClassVar[str] = platform.system()
+    LAUNCHERS: ClassVar[Dict[str, str]] = {
+        "Linux": "pyasyncrpc.launcher.LinuxLauncher:LinuxLauncher",
+        "Darwin": "pyasyncrpc.launcher.DarwinLauncher:DarwinLauncher",
+        "Windows": "pyasyncrpc.launcher.WindowsLauncher:WindowsLauncher",
+        "MultiProcess": "pyasyncrpc.launcher.MultiProcessLauncher:MultiProcessLauncher",
+    }
+
+    @staticmethod
+    def load_launcher(name: str) -> Type[Launcher]:
+        """Import the registered launcher class, only the launcher in use is imported."""
+        path = LauncherFactory.LAUNCHERS.get(name)
+        if path is None:
+            msg = "No Implementation"
+            raise RuntimeError(msg)
+        module_name, _, class_name = path.partition(":")
+        launcher: Type[Launcher] = getattr(importlib.import_module(module_name), class_name)
+        return launcher
 
     @staticmethod
-    def create_launcher(service: Service) -> Launcher:
-        """Create launcher."""
-        launchers = get_special_modules(pyasyncrpc.launcher.__name__, Launcher)
-        for launcher in launchers:
-            if LauncherFactory.PLATFORM in launcher.__name__:
-                ret = launcher()  # type: ignore[abstract]
-                ret.add_service(service)
-                return ret
-        msg = "No Implementation"
-        raise RuntimeError(msg)
+    def create_launcher(
+        service: Service, workers: int = 1, backend: str = "asyncio", *, hot_reload: bool = False
+    ) -> Launcher:
+        """Create launcher, it replaces the processes without downtime on the reload signals when hot_reload is set."""
+        if workers > 1:
+            multi_process = cast("Type[MultiProcessLauncher]", LauncherFactory.load_launcher("MultiProcess"))
+            ret: Launcher = multi_process(workers)
+        else:
+            ret = LauncherFactory.load_launcher(LauncherFactory.PLATFORM)()
+        ret.backend = backend
+        ret.hot_reload = hot_reload
+        ret.add_service(service)
+        return ret
@@ -3,40 +3,85 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
+import logging
 import signal
+from typing import ClassVar, Tuple
 
 import anyio
 from typing_extensions import override
 
+from pyasyncrpc.launcher.HotReload import HotReload
 from pyasyncrpc.launcher.Launcher import Launcher
 from pyasyncrpc.service.Service import Service
 
 
 class LinuxLauncher(Launcher, Service):
-    """suitable for linux platform."""
+    """suitable for linux platform, reloaded without downtime on the reload signals when hot_reload is set."""
+
+    DRAIN_LOG_INTERVAL: ClassVar[float] = 1
 
     def __init__(self) -> None:
         """Init."""
         super().__init__()
+        self.signals: Tuple[signal.Signals, ...] = (signal.SIGINT, signal.SIGTERM)
+
+    @property
+    def reload_signals(self) -> Tuple[signal.Signals, ...]:
+        """Signals replacing the process, none without hot_reload."""
+        return HotReload.signals() if self.hot_reload else ()
 
     @override
     def launch(self) -> None:
-        anyio.run(self.start)
+        if self.hot_reload:
+            self.service.prepare_reload()
+        self.run(self.start)
 
     @override
     async def start(self) -> None:
         async with anyio.create_task_group() as tg:
             tg.start_soon(self.close)
             await self.service.start()
+            HotReload.notify_ready()
             await self.wait()
 
     @override
     async def close(self) -> None:
-        with anyio.open_signal_receiver(signal.SIGINT, signal.SIGTERM) as signals:
-            async for _ in signals:
-                await self.service.close()
+        with anyio.open_signal_receiver(*self.signals, *self.reload_signals) as signals:
+            async for signum in signals:
+                if signum in self.reload_signals and not await self.reload():
+                    continue
+                await self.drain()
                 return
 
     @override
     async def wait(self) -> None:
         await self.service.wait()
+
+    async def drain(self) -> None:
+        """Close the service, logging the requests still in flight until they are done."""
+
+        async def log_progress() -> None:
+            while True:
+                logging.info(f"draining, {self.service.in_flight} requests in flight")
+                await anyio.sleep(LinuxLauncher.DRAIN_LOG_INTERVAL)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(log_progress)
+            await self.service.close()
+            tg.cancel_scope.cancel()
+        logging.info("drained")
+
+    async def reload(self) -> bool:
+        """Start a new process on the shared listen address, True once it reported ready."""
+        try:
+            env = self.service.reload_env(1)
+        except RuntimeError:
+            logging.exception("reload:refused, keep serving")
+            return False
+        parent, process = HotReload.spawn_replacement(env)
+        ready = b""
+        with parent:
+            with anyio.move_on_after(HotReload.READY_TIMEOUT):
+                await anyio.wait_socket_readable(parent)
+                ready = parent.recv(16)
+        return HotReload.check_ready(process, ready)
@@ -0,0 +1,210 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import contextlib
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess  # noqa: S404
+import time
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from types import FrameType
+from typing import ClassVar, Dict, Optional, Sequence, Tuple
+
+from typing_extensions import override
+
+from pyasyncrpc.launcher.HotReload import HotReload
+from pyasyncrpc.launcher.Launcher import Launcher
+from pyasyncrpc.launcher.LinuxLauncher import LinuxLauncher
+
+
+class MultiProcessLauncher(Launcher):
+    """supervise several worker processes sharing the listen address.
+
+    With hot_reload, the reload signals start a new supervisor and its workers, and the current workers drain once
+    they all reported ready. A new supervisor whose worker exits first gives up and the current workers keep serving.
+    Without it, the reload signals stop the workers like SIGTERM.
+    """
+
+    MAX_WORKERS: ClassVar[int] = 32
+    RESTART_DELAY: ClassVar[float] = 1
+
+    def __init__(self, workers: int) -> None:
+        """Init."""
+        super().__init__()
+        if not 1 <= workers <= MultiProcessLauncher.MAX_WORKERS:
+            msg = f"The number of workers must be between 1 and {MultiProcessLauncher.MAX_WORKERS}"
+            raise RuntimeError(msg)
+        self._workers = workers
+        self._processes: Dict[int, BaseProcess] = {}
+        self._ready: Dict[int, socket.socket] = {}
+        self._ready_fd: Optional[int] = None
+        self._replacement: Optional[Tuple[socket.socket, subprocess.Popen[bytes], float]] = None
+        self._stopping = False
+        self._reloading = False
+        self._wakeup: Optional[socket.socket] = None
+
+    @override
+    def launch(self) -> None:
+        if "fork" not in multiprocessing.get_all_start_methods():
+            msg = "Multiple workers require the fork start method"
+            raise RuntimeError(msg)
+        ready_fd = os.environ.pop(HotReload.READY_FD_ENV, None)
+        self._ready_fd = None if ready_fd is None else int(ready_fd)
+        wakeup, self._wakeup = socket.socketpair()
+        self._wakeup.settimeout(0)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for signum in HotReload.signals():
+            signal.signal(signum, self.request_reload if self.hot_reload else self.stop)
+        for index in range(self._workers):
+            self.spawn(index)
+        while not self._stopping:
+            replacement = () if self._replacement is None else (self._replacement[0],)
+            timeout = None if self._replacement is None else max(0.0, self._replacement[2] - time.monotonic())
+            ready = wait(
+                [
+                    *(process.sentinel for process in self._processes.values()),
+                    wakeup,
+                    *self._ready.values(),
+                    *replacement,
+                ],
+                timeout,
+            )
+            if wakeup in ready:
+                wakeup.recv(64)
+            if not self.collect_ready(ready) and self._ready_fd is not None:
+                self.report_ready(ready=False)
+                self.stop_workers("a worker failure before the first ready")
+            if self._ready_fd is not None and not self._ready:
+                self.report_ready(ready=True)
+            if self._reloading:
+                self._reloading = False
+                self.reload()
+            if self._replacement is not None and self.check_replacement(ready):
+                self.stop_workers("reload")
+            for index, process in list(self._processes.items()):
+                if self._stopping or process.is_alive():
+                    continue
+                logging.warning(f"worker {index}(pid {process.pid}) exited with code {process.exitcode}")
+                time.sleep(MultiProcessLauncher.RESTART_DELAY)
+                if not self._stopping:
+                    self.spawn(index)
+        for process in self._processes.values():
+            process.join()
+        logging.info("All workers have been shut down")
+
+    def spawn(self, index: int) -> None:
+        """Start the worker process with the given index."""
+        parent, child = socket.socketpair()
+        process = multiprocessing.get_context("fork").Process(
+            target=self.run_worker, args=(index, child.fileno()), daemon=False
+        )
+        try:
+            process.start()
+        finally:
+            child.close()
+        self._processes[index] = process
+        previous = self._ready.pop(index, None)
+        if previous is not None:
+            previous.close()
+        self._ready[index] = parent
+        logging.info(f"worker {index}(pid {process.pid}) started")
+
+    def run_worker(self, index: int, ready_fd: int) -> None:
+        """Run the service in the worker process, it reports ready on the inherited socket."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for signum in HotReload.signals():
+            signal.signal(signum, signal.SIG_IGN)
+        if self._ready_fd is not None:
+            os.close(self._ready_fd)
+        if self._replacement is not None:
+            self._replacement[0].close()
+        os.environ[HotReload.READY_FD_ENV] = str(ready_fd)
+        self.service.prepare_worker(index)
+        launcher = LinuxLauncher()
+        launcher.signals = (signal.SIGTERM,)
+        launcher.backend = self.backend
+        launcher.add_service(self.service)
+        launcher.launch()
+
+    def collect_ready(self, ready: Sequence[object]) -> bool:
+        """Forget the workers that reported ready, False when one of them exited before."""
+        started = True
+        for index, sock in list(self._ready.items()):
+            if sock in ready:
+                report = b""
+                with contextlib.suppress(OSError):
+                    report = sock.recv(16)
+                sock.close()
+                del self._ready[index]
+                if not report:
+                    logging.error(f"worker {index} exited before reporting ready")
+                    started = False
+        return started
+
+    def report_ready(self, *, ready: bool) -> None:
+        """Tell the supervisor being replaced whether every worker serves, it kills this one otherwise."""
+        if self._ready_fd is None:
+            return
+        ready_fd, self._ready_fd = self._ready_fd, None
+        if ready:
+            HotReload.send_ready(ready_fd)
+        else:
+            os.close(ready_fd)
+
+    def reload(self) -> None:
+        """Start a new supervisor with its workers on the shared listen address, polled by the supervision loop."""
+        if self._replacement is not None:
+            logging.warning("reload:a new supervisor is already starting")
+            return
+        try:
+            env = self.service.reload_env(self._workers)
+        except RuntimeError:
+            logging.exception("reload:refused, keep serving")
+            return
+        parent, process = HotReload.spawn_replacement(env)
+        self._replacement = (parent, process, time.monotonic() + HotReload.READY_TIMEOUT)
+
+    def check_replacement(self, ready: Sequence[object]) -> bool:
+        """True once the new supervisor reported ready, it is killed when it fails or times out."""
+        if self._replacement is None:
+            return False
+        parent, process, deadline = self._replacement
+        if parent not in ready and time.monotonic() < deadline:
+            return False
+        report = b""
+        if parent in ready:
+            with contextlib.suppress(OSError):
+                report = parent.recv(16)
+        parent.close()
+        self._replacement = None
+        return HotReload.check_ready(process, report)
+
+    def request_reload(self, signum: int, _: Optional[FrameType]) -> None:
+        """Reload from the supervision loop."""
+        logging.info(f"Received signal {signum}, reloading {len(self._processes)} workers")
+        self._reloading = True
+        if self._wakeup is not None:
+            with contextlib.suppress(OSError):
+                self._wakeup.send(b"\0")
+
+    def stop(self, signum: int, _: Optional[FrameType]) -> None:
+        """Forward the termination signal to every worker."""
+        self.stop_workers(f"signal {signum}")
+
+    def stop_workers(self, reason: str) -> None:
+        """Terminate every worker, they drain before exiting."""
+        if self._stopping:
+            return
+        logging.info(f"Received {reason}, stopping {len(self._processes)} workers")
+        self._stopping = True
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
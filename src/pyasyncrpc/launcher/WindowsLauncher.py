@@ -34,7 +34,7 @@ class WindowsLauncher(Launcher, Service):
             logging.info(f"Error setting control handler: {err}")
             sys.exit(1)
         try:
-            anyio.run(self.start)
+            self.run(self.start)
         except KeyboardInterrupt:
             if handler_func:
                 kernel32.SetConsoleCtrlHandler(handler_func, False)  # noqa: FBT003
@@ -55,8 +55,7 @@ class WindowsLauncher(Launcher, Service):
 
     @override
     async def wait(self) -> None:
-        while True:  # noqa: ASYNC110 RUF100
-            await anyio.sleep(3)
+        await self.service.wait()
 
     async def cancel(self, task_status: TaskStatus[None]) -> None:
         """Cancel waiting."""
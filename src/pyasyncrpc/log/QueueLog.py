@@ -0,0 +1,41 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import atexit
+import logging
+from typing import Union
+
+from typing_extensions import override
+
+from pyasyncrpc.log.Log import Log
+from pyasyncrpc.log.QueueLoggingHandler import QueueLoggingHandler
+
+
+class QueueLog(Log):
+    """loguru config writing in the background."""
+
+    def __init__(
+        self,
+        level: Union[int, str] = logging.DEBUG,
+        maxsize: int = 10000,
+        batch_size: int = 256,
+        *,
+        block: bool = False,
+    ) -> None:
+        """Init."""
+        self._level = level
+        self._handler = QueueLoggingHandler(maxsize, batch_size, block=block)
+
+    @property
+    def handler(self) -> QueueLoggingHandler:
+        """The queue handler with its dropped and written counters."""
+        return self._handler
+
+    @override
+    def init_log(self) -> None:
+        logging.root.handlers = [self._handler]
+        logging.root.setLevel(self._level)
+        self._handler.start()
+        atexit.register(self._handler.close)
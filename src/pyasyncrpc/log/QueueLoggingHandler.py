@@ -0,0 +1,129 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import copy
+import functools
+import logging
+import os
+import queue
+import sys
+import threading
+import weakref
+from typing import List, Optional
+
+import loguru
+from typing_extensions import override
+
+from pyasyncrpc.log.LoggingHandler import LoggingHandler
+
+
+class QueueLoggingHandler(logging.Handler):
+    """logging redirects to loguru through a bounded queue drained by a background writer.
+
+    A forked child starts with an empty queue and restarts the writer, which does not survive the fork.
+    """
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = 256, *, block: bool = False) -> None:
+        """Init."""
+        super().__init__()
+        self._queue: queue.Queue[Optional[logging.LogRecord]] = queue.Queue(maxsize)
+        self._batch_size = batch_size
+        self._block = block
+        self._logger = loguru.logger.patch(QueueLoggingHandler.patch)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=functools.partial(QueueLoggingHandler.reset, weakref.ref(self)))
+
+    @staticmethod
+    def reset(ref: "weakref.ReferenceType[QueueLoggingHandler]") -> None:
+        """Reset the handler still alive in the forked child."""
+        handler = ref()
+        if handler is not None:
+            handler.after_fork()
+
+    def after_fork(self) -> None:
+        """Recreate the queue and the lock in the forked child, and restart the writer if it was running."""
+        running = self._writer is not None
+        self._queue = queue.Queue(self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._writer = None
+        if running:
+            self.start()
+
+    @override
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._writer is None:
+            self.start()
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        if self._block:
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def start(self) -> None:
+        """Start the background writer."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self.drain, name="pyasyncrpc-log", daemon=True)
+                self._writer.start()
+
+    def drain(self) -> None:
+        """Write the queued records in batches until the handler is closed."""
+        while True:
+            batch: List[Optional[logging.LogRecord]] = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is None:
+                    return
+                self.write(record)
+                self.written += 1
+
+    def write(self, record: logging.LogRecord) -> None:
+        """Write the record to loguru."""
+        self._logger.bind(origin=record).opt(exception=record.exc_info or None).log(
+            LoggingHandler.LEVEL_MAPPING.get(record.levelno, "INFO"), record.msg
+        )
+
+    @staticmethod
+    def patch(message: "loguru.Record") -> None:
+        """Restore the origin of the logging record."""
+        record = message["extra"].pop("origin", None)
+        if record is None:
+            return
+        message["name"] = record.name if record.name != "root" else QueueLoggingHandler.module_name(record.pathname)
+        message["function"] = record.funcName
+        message["line"] = record.lineno
+        message["time"] = message["time"].fromtimestamp(record.created, message["time"].tzinfo)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def module_name(pathname: str) -> str:
+        """Name of the loaded module of the file, like loguru names the records of the root logger."""
+        for name, module in list(sys.modules.items()):
+            if getattr(module, "__file__", None) == pathname:
+                return name
+        return "root"
+
+    @override
+    def close(self) -> None:
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+        super().close()
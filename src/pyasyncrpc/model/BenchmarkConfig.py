@@ -0,0 +1,68 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel
+
+
+class BenchmarkInfo(BaseModel):
+    """benchmark info, the local service requires the handle function name."""
+
+    target: Optional[str] = None
+    handle_func_name: Optional[str] = None
+    server_stub_name: str
+    request_func_name: str
+    reply_func_name: str
+    pd2_pkg: str
+    pd2_grpc_pkg: str
+    methods: Sequence[str]
+    mode: str = "closed"
+    concurrency: int = 10
+    rate: Optional[float] = None
+    duration: float = 10
+    payload_size: int = 16
+    warmup: float = 1
+    channels: int = 1
+
+
+class BenchmarkResult(BaseModel):
+    """the result of a benchmark run, latencies in milliseconds."""
+
+    method: str
+    mode: str
+    concurrency: int
+    rate: Optional[float] = None
+    payload_size: int
+    duration: float
+    requests: int
+    errors: int
+    throughput: float
+    p50: float
+    p90: float
+    p99: float
+    p999: float
+
+
+class BenchmarkReport(BaseModel):
+    """the results of the benchmark runs."""
+
+    version: str = ""
+    backend: str = "asyncio"
+    results: List[BenchmarkResult] = []
+
+    def compare(self, baseline: "BenchmarkReport", threshold: float) -> List[str]:
+        """Regressions against the baseline beyond the threshold ratio."""
+        previous = {(_.method, _.mode, _.concurrency, _.payload_size): _ for _ in baseline.results}
+        regressions: List[str] = []
+        for result in self.results:
+            old = previous.get((result.method, result.mode, result.concurrency, result.payload_size))
+            if old is None:
+                continue
+            if result.throughput < old.throughput * (1 - threshold):
+                regressions.append(f"{result.method}:throughput {old.throughput:.1f} -> {result.throughput:.1f} rps")
+            if result.p99 > old.p99 * (1 + threshold):
+                regressions.append(f"{result.method}:p99 {old.p99:.3f} -> {result.p99:.3f} ms")
+        return regressions
@@ -0,0 +1,36 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+
+class RetryBudgetInfo(BaseModel):
+    """retries and hedges allowed as a ratio of the requests, on top of a minimum reserve."""
+
+    ratio: float = 0.1
+    min_tokens: float = 10
+    max_tokens: float = 100
+
+
+class GRPCClientInfo(BaseModel):
+    """grpc client info, the endpoints default to the listen address of the service, times in seconds."""
+
+    endpoints: List[str] = []
+    channels: int = 2
+    balance: str = "round_robin"
+    timeout: Optional[float] = None
+    retries: int = 2
+    retry_codes: List[str] = ["UNAVAILABLE", "RESOURCE_EXHAUSTED"]
+    retry_backoff: float = 0.01
+    retry_budget: RetryBudgetInfo = RetryBudgetInfo()
+    hedge_delay: Optional[float] = None
+    max_hedges: int = 1
+    request_field: str = "name"
+    reply_field: str = "message"
+    encoding: str = "json"
+    data_field: str = "data"
+    options: Sequence[Tuple[str, Any]] = ()
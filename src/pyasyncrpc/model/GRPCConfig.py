@@ -3,7 +3,7 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
-from typing import Any, Callable, List, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import grpc
 from pydantic import BaseModel
@@ -18,6 +18,7 @@ class GRPCConfig(BaseModel):
     server_stub: type
     request_func: type
     reply_func: type
+    servicer_base: type = object
 
 
 class GRPCMethod(BaseModel):
@@ -25,6 +26,10 @@ class GRPCMethod(BaseModel):
 
     grpc_method_name: str
     method: Callable[[Any], Any]
+    cache: Any = None
+    admission: Any = None
+    request_streaming: bool = False
+    warmup: Any = None
 
 
 class GRPCInfo(BaseModel):
@@ -41,6 +46,21 @@ class GRPCInfo(BaseModel):
     grace: int = 200
     thread_limiter: int = 40
     options: Sequence[Tuple[str, Any]] = ()
+    workers: int = 1
+    backend: str = "asyncio"
+    reload: bool = False
+    worker_id: Optional[int] = None
+    data_center_id: Optional[int] = None
+    process_pool: Optional["PyScriptPoolInfo"] = None
+    plan_cache_size: int = 512
+    admin: bool = False
+    health: bool = True
+    metrics: Optional["MetricsInfo"] = None
+    adaptive_thread_limiter: Optional["AdaptiveThreadLimiterInfo"] = None
+    warmup: Optional["WarmupInfo"] = None
+    deferred_queue: Optional["DeferredQueueInfo"] = None
+    tracing: Optional["TracingInfo"] = None
+    profiler: Optional["ProfilerInfo"] = None
 
 
 class GRPCMethodInfo(BaseModel):
@@ -49,3 +69,101 @@ class GRPCMethodInfo(BaseModel):
     grpc_method_name: str
     pkg: str
     method_name: str
+    executor: str = "thread"
+    cache: Optional["ReplyCacheInfo"] = None
+    fast: bool = False
+    request_streaming: bool = False
+    admission: Optional["AdmissionInfo"] = None
+    lazy: bool = False
+    compression: Optional["CompressionInfo"] = None
+
+
+class ReplyCacheInfo(BaseModel):
+    """reply cache of the method."""
+
+    ttl: float = 60
+    max_entries: int = 1024
+    max_bytes: int = 16 * 1024 * 1024
+    skip_middlewares: bool = False
+
+
+class AdmissionInfo(BaseModel):
+    """admission control of the method, target_delay in seconds enables shedding by queue wait."""
+
+    max_in_flight: int
+    max_queued: int = 0
+    target_delay: Optional[float] = None
+    interval: float = 0.1
+
+
+class CompressionInfo(BaseModel):
+    """reply compression of the method: none, gzip or deflate, from min_size bytes."""
+
+    algorithm: str = "gzip"
+    min_size: int = 1024
+    sample_every: int = 100
+
+
+class MetricsInfo(BaseModel):
+    """export of the service metrics."""
+
+    file: Optional[str] = None
+    host: str = "127.0.0.1"
+    port: Optional[int] = None
+    interval: float = 15
+
+
+class AdaptiveThreadLimiterInfo(BaseModel):
+    """adjustment of the thread limiter between min_tokens and max_tokens, times in seconds."""
+
+    min_tokens: int = 4
+    max_tokens: int = 200
+    step: int = 4
+    interval: float = 1
+    target_wait: float = 0.005
+
+
+class WarmupInfo(BaseModel):
+    """warm-up run before the service address is bound, requests are message fields by method name."""
+
+    pkgs: List[str] = []
+    requests: Dict[str, List[Dict[str, Any]]] = {}
+
+
+class DeferredQueueInfo(BaseModel):
+    """bounded queue running the post hooks of the deferred middlewares after the reply."""
+
+    max_size: int = 1000
+    workers: int = 4
+    overflow: str = "drop_newest"
+
+
+class TracingInfo(BaseModel):
+    """sampled request tracing, the spans are kept in a ring buffer or appended to a JSON lines file."""
+
+    sample_rate: float = 0.0
+    parent_based: bool = True
+    exporter: str = "ring"
+    file: Optional[str] = None
+    ring_size: int = 10000
+    batch_size: int = 512
+    flush_interval: float = 1
+
+
+class ProfilerInfo(BaseModel):
+    """sampling profiler started by SIGUSR1 writing collapsed stacks to the directory, and slow request log."""
+
+    duration: float = 10
+    max_duration: float = 60
+    interval: float = 0.005
+    directory: str = "."
+    signal: bool = True
+    slow_request_threshold: Optional[float] = None
+
+
+class PyScriptPoolInfo(BaseModel):
+    """process pool executing python scripts."""
+
+    size: Optional[int] = None
+    max_tasks_per_child: Optional[int] = None
+    max_rss: Optional[int] = None
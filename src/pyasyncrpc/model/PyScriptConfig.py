@@ -13,6 +13,7 @@ class PyScriptConfig(BaseModel):
 
     pkg: str
     objects: Optional[List["PyScriptObject"]] = None
+    executor: Optional[str] = None
 
 
 class PyScriptResult(BaseModel):
@@ -23,6 +24,19 @@ class PyScriptResult(BaseModel):
     success: bool = True
 
 
+class PyScriptBatch(BaseModel):
+    """python scripts executed concurrently in one call, their raw JSON configurations key the plan cache."""
+
+    configs: List[str]
+    concurrency: int = 16
+
+
+class PyScriptBatchResult(BaseModel):
+    """the results of the python scripts in the batch, in order."""
+
+    results: List[PyScriptResult] = []
+
+
 class PyScriptObject(BaseModel):
     """The methods or classes of the executed python script."""
 
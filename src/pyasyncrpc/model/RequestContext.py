@@ -3,14 +3,97 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
-from typing import Any
+import functools
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union
 
 from pydantic import BaseModel
 
+from pyasyncrpc.model.PyScriptConfig import PyScriptResult
+from pyasyncrpc.util.CancelToken import CancelToken
+from pyasyncrpc.util.PyScriptExecutor import PyScriptExecutor
+from pyasyncrpc.util.PyScriptPlan import PyScriptPlan, PyScriptPlanCache
 
-class RequestContext(BaseModel):
+
+class RequestContextMixin:
+    """helpers shared by the request contexts."""
+
+    __slots__ = ()
+
+    if TYPE_CHECKING:
+        context: Any
+        executor: str
+        executors: Dict[str, Any]
+        plans: Any
+        cancel_token: Any
+
+    def get_executor(self, name: Optional[str] = None) -> PyScriptExecutor:
+        """Python script executor by name, the executor of the method by default."""
+        name = name or self.executor
+        if name not in self.executors:
+            msg = f"Unknown python script executor:{name}"
+            raise RuntimeError(msg)
+        return self.executors[name]  # type: ignore[no-any-return]
+
+    def get_plan(self, raw: Union[str, bytes]) -> PyScriptPlan:
+        """Compiled execution plan of the raw python script configuration."""
+        if self.plans is None:
+            self.plans = PyScriptPlanCache(0)
+        return self.plans.get(raw)  # type: ignore[no-any-return]
+
+    async def execute_many(
+        self, raws: Sequence[Union[str, bytes]], concurrency: Optional[int] = None
+    ) -> List[PyScriptResult]:
+        """Execute the raw python script configurations concurrently, each one on its executor with its cached plan."""
+        token = self.get_cancel_token()
+
+        async def execute(raw: Union[str, bytes]) -> PyScriptResult:
+            plan = self.get_plan(raw)
+            return await self.get_executor(plan.config.executor).execute(plan, token)
+
+        return await PyScriptExecutor.run_many([functools.partial(execute, raw) for raw in raws], concurrency)
+
+    def time_remaining(self) -> Optional[float]:
+        """Seconds until the deadline of the call, None without deadline."""
+        return self.context.time_remaining() if self.context is not None else None
+
+    def get_cancel_token(self) -> CancelToken:
+        """Token cancelled at the deadline or once the call terminates, to pass to the executors."""
+        if self.cancel_token is None:
+            self.cancel_token = CancelToken.from_context(self.context)
+        return self.cancel_token  # type: ignore[no-any-return]
+
+
+class RequestContext(RequestContextMixin, BaseModel):
     """request context."""
 
     request_id: int
     request: Any
     context: Any
+    executor: str = "thread"
+    executors: Dict[str, Any] = {}
+    plans: Any = None
+    cancel_token: Any = None
+
+
+class FastRequestContext(RequestContextMixin):
+    """request context without validation."""
+
+    __slots__ = ("cancel_token", "context", "executor", "executors", "plans", "request", "request_id")
+
+    def __init__(
+        self,
+        request_id: int,
+        request: Any,  # noqa: ANN401
+        context: Any,  # noqa: ANN401
+        executor: str = "thread",
+        executors: Optional[Dict[str, Any]] = None,
+        plans: Any = None,  # noqa: ANN401
+    ) -> None:
+        """Init."""
+        self.request_id = request_id
+        self.request = request
+        self.context = context
+        self.executor = executor
+        self.executors = executors or {}
+        self.plans = plans
+        self.cancel_token: Optional[CancelToken] = None
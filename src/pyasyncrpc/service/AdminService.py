@@ -0,0 +1,39 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, ClassVar, Dict
+
+import grpc
+
+AdminMethod = Callable[[bytes, Any], Awaitable[bytes]]
+
+
+class AdminService:
+    """generic grpc service exchanging raw bytes, no generated code required."""
+
+    SERVICE_NAME: ClassVar[str] = "pyasyncrpc.Admin"
+
+    def __init__(self, service_name: str = SERVICE_NAME) -> None:
+        """Init."""
+        self.service_name = service_name
+        self._methods: Dict[str, AdminMethod] = {}
+
+    @property
+    def methods(self) -> Dict[str, AdminMethod]:
+        """Admin methods by name."""
+        return self._methods
+
+    def add_method(self, name: str, method: AdminMethod) -> None:
+        """Add the admin method, called with the raw request and the servicer context."""
+        logging.info(f"register admin method:{name}")
+        self._methods[name] = method
+
+    def create_handler(self) -> grpc.GenericRpcHandler:
+        """Create the generic rpc handler."""
+        return grpc.method_handlers_generic_handler(
+            self.service_name,
+            {name: grpc.unary_unary_rpc_method_handler(method) for name, method in self._methods.items()},
+        )
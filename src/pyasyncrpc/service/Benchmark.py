@@ -0,0 +1,204 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import importlib
+import itertools
+import math
+import socket
+import time
+from typing import Any, Awaitable, Callable, ClassVar, Dict, List, Optional
+
+import anyio
+import grpc
+
+from pyasyncrpc.model.BenchmarkConfig import BenchmarkInfo, BenchmarkReport, BenchmarkResult
+from pyasyncrpc.model.GRPCConfig import GRPCInfo
+from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject
+from pyasyncrpc.model.RequestContext import FastRequestContext
+from pyasyncrpc.service.GRPCService import GRPCService
+
+
+class Benchmark:
+    """drive a method with closed-loop or open-loop load."""
+
+    PERCENTILES: ClassVar[Dict[str, float]] = {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p999": 0.999}
+
+    def __init__(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        method: str,
+        mode: str = "closed",
+        concurrency: int = 10,
+        rate: Optional[float] = None,
+        duration: float = 10,
+        payload_size: int = 0,
+    ) -> None:
+        """Init."""
+        if mode not in ("closed", "open"):
+            msg = f"Unknown benchmark mode:{mode}"
+            raise RuntimeError(msg)
+        if mode == "open" and not rate:
+            msg = "The open-loop mode requires a rate"
+            raise RuntimeError(msg)
+        self._call = call
+        self._method = method
+        self._mode = mode
+        self._concurrency = concurrency
+        self._rate = rate
+        self._duration = duration
+        self._payload_size = payload_size
+        self._latencies: List[float] = []
+        self._errors = 0
+
+    async def run(self, warmup: float = 1) -> BenchmarkResult:
+        """Warm up with a closed loop, then measure for the configured duration."""
+        if warmup > 0:
+            await self.closed_loop(time.perf_counter() + warmup)
+        self._latencies, self._errors = [], 0
+        start = time.perf_counter()
+        if self._mode == "open":
+            await self.open_loop(start + self._duration)
+        else:
+            await self.closed_loop(start + self._duration)
+        elapsed = time.perf_counter() - start
+        latencies = sorted(self._latencies)
+        return BenchmarkResult(
+            method=self._method,
+            mode=self._mode,
+            concurrency=self._concurrency,
+            rate=self._rate if self._mode == "open" else None,
+            payload_size=self._payload_size,
+            duration=elapsed,
+            requests=len(latencies),
+            errors=self._errors,
+            throughput=len(latencies) / elapsed,
+            **{name: Benchmark.percentile(latencies, q) * 1000 for name, q in Benchmark.PERCENTILES.items()},
+        )
+
+    @staticmethod
+    def percentile(latencies: List[float], q: float) -> float:
+        """Nearest-rank percentile of the sorted latencies."""
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, max(0, math.ceil(q * len(latencies)) - 1))]
+
+    async def request(self, scheduled: float) -> None:
+        """Send one request, the latency is measured from the scheduled time."""
+        try:
+            await self._call()
+        except Exception:  # noqa: BLE001
+            self._errors += 1
+            return
+        self._latencies.append(time.perf_counter() - scheduled)
+
+    async def closed_loop(self, deadline: float) -> None:
+        """Every worker sends the next request once the previous one completed."""
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                await self.request(time.perf_counter())
+
+        async with anyio.create_task_group() as tg:
+            for _ in range(self._concurrency):
+                tg.start_soon(worker)
+
+    async def open_loop(self, deadline: float) -> None:
+        """Send requests at the rate whatever the response time, with at most concurrency outstanding.
+
+        A request waiting for a slot keeps its scheduled time, so the queueing delay is part of its latency.
+        """
+        interval = 1 / (self._rate or 1)
+        limiter = anyio.CapacityLimiter(self._concurrency)
+
+        async def send(scheduled: float) -> None:
+            async with limiter:
+                await self.request(scheduled)
+
+        async with anyio.create_task_group() as tg:
+            scheduled = time.perf_counter()
+            while scheduled < deadline:
+                tg.start_soon(send, scheduled)
+                scheduled += interval
+                await anyio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+    @staticmethod
+    def create_payload(method: str, payload_size: int) -> str:
+        """Request name of the payload size for the benchmarked method."""
+        if method != "executePyScript":
+            return "x" * payload_size
+        objects = [PyScriptObject(name="dedent", args=["x" * payload_size])]
+        return PyScriptConfig(pkg="textwrap", objects=objects).model_dump_json()
+
+    @staticmethod
+    def create_methods(reply_func: type) -> Dict[str, Callable[[FastRequestContext], Awaitable[object]]]:
+        """Methods of the local benchmark service, replying with the message itself."""
+
+        async def echo(ctx: FastRequestContext) -> object:
+            return reply_func(message=ctx.request.name, status=200)
+
+        async def execute_py_script(ctx: FastRequestContext) -> object:
+            plan = ctx.get_plan(ctx.request.name)
+            result = await ctx.get_executor(plan.config.executor).execute(plan, ctx.get_cancel_token())
+            return reply_func(message=result.model_dump_json(), status=200 if result.success else 500)
+
+        return {"sayHello": echo, "executePyScript": execute_py_script}
+
+    @staticmethod
+    def create_service(info: BenchmarkInfo) -> GRPCService:
+        """Local service on a free port serving the benchmark methods."""
+        if info.handle_func_name is None:
+            msg = "The local benchmark service requires the handle function name"
+            raise RuntimeError(msg)
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        service = GRPCService(
+            GRPCInfo(
+                service_name="Benchmark",
+                handle_func_name=info.handle_func_name,
+                server_stub_name=info.server_stub_name,
+                request_func_name=info.request_func_name,
+                reply_func_name=info.reply_func_name,
+                pd2_pkg=info.pd2_pkg,
+                pd2_grpc_pkg=info.pd2_grpc_pkg,
+                listen_addr=f"127.0.0.1:{port}",
+            )
+        )
+        for name, method in Benchmark.create_methods(service.config.reply_func).items():
+            if name in info.methods:
+                service.register_method(name, fast=True)(method)
+        return service
+
+    @staticmethod
+    async def run_all(info: BenchmarkInfo) -> BenchmarkReport:
+        """Benchmark the methods one after the other, against a local service when no target is given."""
+        service = None
+        target = info.target
+        if target is None:
+            service = Benchmark.create_service(info)
+            await service.start()
+            target = service.config.info.listen_addr
+        server_stub = getattr(importlib.import_module(info.pd2_grpc_pkg), info.server_stub_name)
+        request_func = getattr(importlib.import_module(info.pd2_pkg), info.request_func_name)
+        channels = [grpc.aio.insecure_channel(target) for _ in range(max(1, info.channels))]
+        report = BenchmarkReport()
+        try:
+            for method in info.methods:
+                request = request_func(name=Benchmark.create_payload(method, info.payload_size))
+                stubs = itertools.cycle([getattr(server_stub(_), method) for _ in channels])
+
+                async def call(stubs: Any = stubs, request: Any = request) -> Any:  # noqa: ANN401
+                    return await next(stubs)(request)
+
+                benchmark = Benchmark(
+                    call, method, info.mode, info.concurrency, info.rate, info.duration, info.payload_size
+                )
+                report.results.append(await benchmark.run(info.warmup))
+        finally:
+            for channel in channels:
+                await channel.close()
+            if service is not None:
+                await service.close()
+        return report
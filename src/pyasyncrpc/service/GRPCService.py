@@ -3,40 +3,87 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
+import asyncio
+import contextlib
+import functools
 import importlib
 import inspect
+import json
 import logging
+import math
+import os
+import re
+import signal
+import time
+import typing
 from abc import ABC, abstractmethod
 from types import TracebackType
-from typing import Any, Awaitable, Callable, List, Optional, Tuple, Type
+from typing import Any, AsyncIterator, Awaitable, Callable, ClassVar, Dict, List, Optional, Tuple, Type
 
 import anyio
 import grpc
+from anyio.abc import TaskGroup
 from pydantic import BaseModel
 from typing_extensions import Self, override
 
 from pyasyncrpc.log.Log import Log
-from pyasyncrpc.model.GRPCConfig import GRPCConfig, GRPCInfo, GRPCMethod, GRPCMethodInfo
-from pyasyncrpc.model.RequestContext import RequestContext
+from pyasyncrpc.model.GRPCConfig import (
+    AdmissionInfo,
+    CompressionInfo,
+    DeferredQueueInfo,
+    GRPCConfig,
+    GRPCInfo,
+    GRPCMethod,
+    GRPCMethodInfo,
+    ProfilerInfo,
+    ReplyCacheInfo,
+    TracingInfo,
+)
+from pyasyncrpc.model.RequestContext import FastRequestContext, RequestContext
+from pyasyncrpc.service.AdminService import AdminService
+from pyasyncrpc.service.HealthService import HealthService
 from pyasyncrpc.service.Service import Service
+from pyasyncrpc.util.AdaptiveThreadLimiter import AdaptiveThreadLimiter
+from pyasyncrpc.util.AdmissionController import AdmissionController
+from pyasyncrpc.util.CompressionPolicy import CompressionPolicy
+from pyasyncrpc.util.DeferredQueue import DeferredQueue
+from pyasyncrpc.util.LoadReporter import LoadReporter
+from pyasyncrpc.util.Metrics import Metrics
+from pyasyncrpc.util.PyScriptExecutor import ProcessPyScriptExecutor, PyScriptExecutor, ThreadPyScriptExecutor
+from pyasyncrpc.util.PyScriptPlan import PyScriptPlanCache
+from pyasyncrpc.util.ReplyCache import ReplyCache
+from pyasyncrpc.util.ReplyConverter import ReplyConverter
+from pyasyncrpc.util.SamplingProfiler import SamplingProfiler
+from pyasyncrpc.util.SlowRequestLog import SlowRequest, SlowRequestLog
 from pyasyncrpc.util.Snowflake import Snowflake
+from pyasyncrpc.util.SpanExporter import JsonLinesSpanExporter, RingBufferSpanExporter, SpanExporter
+from pyasyncrpc.util.Tracer import Trace, Tracer
 
 
 class GRPCServiceMiddleware(ABC):
-    """grpc service middleware interface."""
+    """grpc service middleware interface.
+
+    The post hook of a deferred middleware runs on the background queue after the reply, and the pre hooks of
+    consecutive concurrent middlewares run concurrently.
+    """
+
+    deferred: ClassVar[bool] = False
+    concurrent: ClassVar[bool] = False
 
     @abstractmethod
     async def pre(self, ctx: RequestContext) -> None:
         """Execute before service."""
 
     @abstractmethod
-    async def post(self, ctx: RequestContext, ret: BaseModel) -> None:
+    async def post(self, ctx: RequestContext, ret: Any) -> None:  # noqa: ANN401
         """Execute after service."""
 
 
 class GRPCService(Service):
     """grpc service."""
 
+    LOAD_SERVICE_NAME: ClassVar[str] = "pyasyncrpc.Load"
+
     def __init__(
         self,
         info: GRPCInfo,
@@ -52,6 +99,7 @@ class GRPCService(Service):
         server_stub = getattr(pd2_grpc_pkg, info.server_stub_name)
         request_func = getattr(pd2_pkg, info.request_func_name)
         reply_func = getattr(pd2_pkg, info.reply_func_name)
+        servicer_name = re.sub(r"^add_(\w+)_to_server$", r"\1", info.handle_func_name)
         self._config = GRPCConfig(
             info=info,
             methods=[],
@@ -59,19 +107,76 @@ class GRPCService(Service):
             server_stub=server_stub,
             request_func=request_func,
             reply_func=reply_func,
+            servicer_base=getattr(pd2_grpc_pkg, servicer_name, object),
         )
+        self._executors: Dict[str, PyScriptExecutor] = {"thread": ThreadPyScriptExecutor()}
+        if info.process_pool:
+            self._executors["process"] = ProcessPyScriptExecutor(
+                info.process_pool.size, info.process_pool.max_tasks_per_child, info.process_pool.max_rss
+            )
+        self._plans = PyScriptPlanCache(info.plan_cache_size)
+        self._reply_converter = ReplyConverter(reply_func)
+        self._metrics = Metrics()
+        self._admin = AdminService()
+        service_names = [info.service_name]
+        with contextlib.suppress(AttributeError):
+            service_names.extend(_.full_name for _ in pd2_pkg.DESCRIPTOR.services_by_name.values())
+        self._health = HealthService(*service_names)
+        self._load_reporter = LoadReporter(self._metrics)
+        self._load = AdminService(GRPCService.LOAD_SERVICE_NAME)
+        self._load.add_method("Report", self.report_load)
+        self._admin.add_method("Metrics", self.dump_metrics)
+        self._adaptive_thread_limiter: Optional[AdaptiveThreadLimiter] = None
+        if info.adaptive_thread_limiter:
+            self._adaptive_thread_limiter = AdaptiveThreadLimiter(
+                lambda: self._metrics.completed, **info.adaptive_thread_limiter.model_dump()
+            )
+            self._admin.add_method("ThreadLimiter", self.dump_thread_limiter)
+        self._tracer: Optional[Tracer] = None
+        if info.tracing:
+            self._tracer = GRPCService.create_tracer(info.tracing)
+            self._admin.add_method("Traces", self.dump_traces)
+        profiler_info = info.profiler or ProfilerInfo()
+        self._profiler: Optional[SamplingProfiler] = None
+        if info.profiler:
+            self._profiler = SamplingProfiler(profiler_info.interval)
+            self._admin.add_method("Profile", self.dump_profile)
+        self._slow_requests: Optional[SlowRequestLog] = None
+        if profiler_info.slow_request_threshold:
+            self._slow_requests = SlowRequestLog(profiler_info.slow_request_threshold)
+            self._admin.add_method("SlowRequests", self.dump_slow_requests)
+        self._background: List[Callable[[], Awaitable[None]]] = []
+        self._task_group: Optional[TaskGroup] = None
+        self._background_host: Optional[asyncio.Task[None]] = None
+        self._resolvers: Dict[str, Callable[[], Awaitable[Any]]] = {}
         for method_info in methods_info or []:
-            method_pkg = importlib.import_module(method_info.pkg)
-            method_func = getattr(method_pkg, method_info.method_name)
-            self.register_method(method_info.grpc_method_name)(method_func)
+            if method_info.lazy:
+                method_func, self._resolvers[method_info.grpc_method_name] = self.create_lazy_method(
+                    method_info.pkg, method_info.method_name
+                )
+            else:
+                method_func = getattr(importlib.import_module(method_info.pkg), method_info.method_name)
+            self.register_method(
+                method_info.grpc_method_name,
+                method_info.executor,
+                method_info.cache,
+                fast=method_info.fast,
+                request_streaming=method_info.request_streaming,
+                admission=method_info.admission,
+                compression=method_info.compression,
+            )(method_func)
         if log:
             log.init_log()
         self._server: Optional[grpc.Server] = None
-        self._snowflake = Snowflake(1, 1)
+        self._snowflake = Snowflake.create(info.worker_id, info.data_center_id)
         self._grace = info.grace
         self._thread_limiter = info.thread_limiter
         self._options = info.options
         self._middlewares = middlewares or ()
+        self._pre_stages = GRPCService.create_pre_stages(self._middlewares)
+        self._post_middlewares = tuple(_ for _ in self._middlewares if not _.deferred)
+        self._deferred_middlewares = tuple(_ for _ in self._middlewares if _.deferred)
+        self._deferred_queue = DeferredQueue(self._metrics, **(info.deferred_queue or DeferredQueueInfo()).model_dump())
         self._interceptors = interceptors or ()
 
     @property
@@ -87,51 +192,653 @@ class GRPCService(Service):
             raise RuntimeError(msg)
         return self._server
 
-    def register_method(self, method_name: str) -> Callable[[Any], Any]:
-        """Register rpc method."""
+    @override
+    def prepare_worker(self, index: int) -> None:
+        info = self.config.info
+        self._snowflake = Snowflake.create(info.worker_id, info.data_center_id, index)
+        self.prepare_reload()
+        logging.info(f"worker {index}:snowflake worker id {self._snowflake.worker_id}")
+
+    @override
+    def prepare_reload(self) -> None:
+        if all(key != "grpc.so_reuseport" for key, _ in self._options):
+            self._options = (*self._options, ("grpc.so_reuseport", 1))
+
+    @override
+    def reload_env(self, workers: int) -> Dict[str, str]:
+        if self.config.info.worker_id is not None:
+            msg = "The reload requires the snowflake worker id from the environment instead of the configuration"
+            raise RuntimeError(msg)
+        worker_id = (self._snowflake.worker_id + workers) & Snowflake.MAX_ID
+        return {Snowflake.WORKER_ID_ENV: str(worker_id)}
+
+    @property
+    @override
+    def in_flight(self) -> int:
+        return self._metrics.in_flight
+
+    @property
+    def executors(self) -> Dict[str, PyScriptExecutor]:
+        """Python script executors by name."""
+        return self._executors
+
+    @property
+    def plans(self) -> PyScriptPlanCache:
+        """Compiled python script execution plans."""
+        return self._plans
+
+    @property
+    def reply_converter(self) -> ReplyConverter:
+        """Converter of method results into reply messages."""
+        return self._reply_converter
+
+    @property
+    def metrics(self) -> Metrics:
+        """Metrics of the registered methods."""
+        return self._metrics
 
-        def wrapper(func: Callable[[RequestContext], Awaitable[BaseModel]]) -> Callable[[Any], Any]:
-            if not inspect.iscoroutinefunction(func):
-                msg = "a coroutine function was expected"
+    @property
+    def deferred_queue(self) -> DeferredQueue:
+        """Queue running the post hooks of the deferred middlewares."""
+        return self._deferred_queue
+
+    @property
+    def tracer(self) -> Optional[Tracer]:
+        """Tracer of the sampled requests, None when tracing is disabled."""
+        return self._tracer
+
+    @property
+    def slow_requests(self) -> Optional[SlowRequestLog]:
+        """Log of the requests slower than the threshold, None when it is disabled."""
+        return self._slow_requests
+
+    @property
+    def admin(self) -> AdminService:
+        """Admin service, served when GRPCInfo.admin is set."""
+        return self._admin
+
+    def register_method(
+        self,
+        method_name: str,
+        executor: str = "thread",
+        cache: Optional[ReplyCacheInfo] = None,
+        *,
+        fast: bool = False,
+        request_streaming: bool = False,
+        admission: Optional[AdmissionInfo] = None,
+        compression: Optional[CompressionInfo] = None,
+    ) -> Callable[[Any], Any]:
+        """Register rpc method.
+
+        The method receives a FastRequestContext instead of a validated RequestContext when fast is set. It may
+        return the reply message itself or a model converted with a mapping computed at registration.
+        An async generator method serves a server-streaming rpc, and the request of the context is the async
+        iterator of the request messages when request_streaming is set.
+        Requests beyond the admission limits fail fast with RESOURCE_EXHAUSTED, and replies from the minimum
+        size of the compression are compressed. The stages of the sampled requests are recorded as spans, and
+        the stacks of the python scripts of the requests slower than the threshold are logged.
+        """
+        if executor not in self._executors:
+            msg = f"Unknown python script executor:{executor}"
+            raise RuntimeError(msg)
+        if cache and request_streaming:
+            msg = "The reply cache does not support request streaming"
+            raise RuntimeError(msg)
+        reply_cache = ReplyCache(cache.ttl, cache.max_entries, cache.max_bytes) if cache else None
+        skip_middlewares = bool(cache and cache.skip_middlewares)
+        decode_reply = self.config.reply_func.FromString  # type: ignore[attr-defined]
+        convert_reply = self._reply_converter
+        context_func: Callable[..., Any] = FastRequestContext if fast else RequestContext
+        metrics = self._metrics.method(method_name)
+        admission_controller = (
+            AdmissionController(
+                admission.max_in_flight, admission.max_queued, admission.target_delay, admission.interval
+            )
+            if admission
+            else None
+        )
+        compression_policy = (
+            CompressionPolicy(compression.algorithm, compression.min_size, compression.sample_every)
+            if compression
+            else None
+        )
+        tracer = self._tracer
+        slow_requests = self._slow_requests
+
+        def wrapper(func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+            response_streaming = inspect.isasyncgenfunction(func)
+            if not response_streaming and not inspect.iscoroutinefunction(func):
+                msg = "a coroutine function or an async generator function was expected"
                 raise RuntimeError(msg)
+            if cache and response_streaming:
+                msg = "The reply cache does not support response streaming"
+                raise RuntimeError(msg)
+            self.prepare_reply_converter(func)
+
+            async def admit(context: grpc.aio.ServicerContext) -> None:
+                """Reject the request beyond the admission limits."""
+                if admission_controller is not None and not await admission_controller.acquire():
+                    metrics.rejected += 1
+                    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"{method_name} is overloaded")
+
+            async def stream_wrap(*args: Any) -> AsyncIterator[object]:
+                """Process Parameters and stream the replies."""
+                metrics.requests += 1
+                await admit(args[2])
+                metrics.in_flight += 1
+                start = time.perf_counter()
+                trace = Trace.current.get() if tracer is not None else None
+                slow = slow_requests.start(method_name) if slow_requests is not None else None
+                try:
+                    ctx = context_func(
+                        request_id=self._snowflake.next_id(),
+                        request=args[1],
+                        context=args[2],
+                        executor=executor,
+                        executors=self._executors,
+                        plans=self._plans,
+                    )
+                    if slow is not None:
+                        slow.request_id = ctx.request_id
+                    if self._pre_stages:
+                        await self.run_pre(ctx)
+                    if trace is not None:
+                        trace.request_id = ctx.request_id
+                        pre_end = time.perf_counter()
+                        trace.add("pre", start, pre_end, trace.root_id)
+                        trace.parent_id = Trace.new_id()
+                    if compression_policy is not None:
+                        compression_policy.start_stream(args[2])
+                    async for ret in func(ctx):
+                        if self._middlewares:
+                            await self.run_post(ctx, ret)
+                        reply = convert_reply(ret)
+                        if compression_policy is not None:
+                            compression_policy.apply_message(args[2], reply, metrics)
+                        yield reply
+                    if trace is not None:
+                        trace.add("handler", pre_end, time.perf_counter(), trace.root_id, trace.parent_id)
+                except BaseException:
+                    metrics.errors += 1
+                    raise
+                finally:
+                    metrics.in_flight -= 1
+                    if admission_controller is not None:
+                        admission_controller.release()
+                    if slow is not None and slow_requests is not None:
+                        slow_requests.finish(slow)
+                    elapsed = time.perf_counter() - start
+                    metrics.handler.observe(elapsed)
+                    metrics.latency.observe(elapsed)
 
             async def wrap(*args: Any) -> object:
                 """Process Parameters."""
-                ctx = RequestContext(request_id=self._snowflake.next_id(), request=args[1], context=args[2])
-                for middleware in self._middlewares:
-                    await middleware.pre(ctx)
-                ret = await func(ctx)
-                for middleware in self._middlewares:
-                    await middleware.post(ctx, ret)
-                return self.config.reply_func(**ret.model_dump(by_alias=True))
+                metrics.requests += 1
+                await admit(args[2])
+                metrics.in_flight += 1
+                slow = slow_requests.start(method_name) if slow_requests is not None else None
+                try:
+                    return await process(*args)
+                except BaseException:
+                    metrics.errors += 1
+                    raise
+                finally:
+                    metrics.in_flight -= 1
+                    if admission_controller is not None:
+                        admission_controller.release()
+                    if slow is not None and slow_requests is not None:
+                        slow_requests.finish(slow)
+
+            async def process(*args: Any) -> object:
+                """Process the request."""
+                start = time.perf_counter()
+                trace = Trace.current.get() if tracer is not None else None
+                key, entry = b"", None
+                if reply_cache is not None:
+                    key = args[1].SerializeToString(deterministic=True)
+                    entry = reply_cache.get(key)
+                    if entry is None:
+                        metrics.cache_misses += 1
+                    else:
+                        metrics.cache_hits += 1
+                    if entry is not None and skip_middlewares:
+                        reply: Any = decode_reply(entry.reply)
+                        if compression_policy is not None:
+                            compression_policy.apply(args[2], reply, metrics)
+                        metrics.observe(start, start, start, start, time.perf_counter())
+                        return reply
+                ctx = context_func(
+                    request_id=self._snowflake.next_id(),
+                    request=args[1],
+                    context=args[2],
+                    executor=executor,
+                    executors=self._executors,
+                    plans=self._plans,
+                )
+                if trace is not None:
+                    trace.request_id = ctx.request_id
+                    trace.parent_id = Trace.new_id()
+                if slow_requests is not None:
+                    slow = SlowRequest.current.get()
+                    if slow is not None:
+                        slow.request_id = ctx.request_id
+                if self._pre_stages:
+                    await self.run_pre(ctx)
+                pre_end = time.perf_counter()
+                ret = await func(ctx) if entry is None else entry.ret
+                handler_end = time.perf_counter()
+                if self._middlewares:
+                    await self.run_post(ctx, ret)
+                post_end = time.perf_counter()
+                if entry is not None:
+                    reply = decode_reply(entry.reply)
+                else:
+                    reply = convert_reply(ret)
+                    if reply_cache is not None:
+                        reply_cache.put(key, reply.SerializeToString(), ret)
+                if compression_policy is not None:
+                    compression_policy.apply(args[2], reply, metrics)
+                metrics.observe(start, pre_end, handler_end, post_end, time.perf_counter())
+                if trace is not None:
+                    trace.add("pre", start, pre_end, trace.root_id)
+                    trace.add("handler", pre_end, handler_end, trace.root_id, trace.parent_id, cached=entry is not None)
+                    trace.add("post", handler_end, post_end, trace.root_id)
+                return reply
 
+            async def warmup(request: object) -> None:
+                """Run the method on the warm-up request, outside the metrics, the reply cache and the middlewares."""
+                ctx = context_func(
+                    request_id=self._snowflake.next_id(),
+                    request=request,
+                    context=None,
+                    executor=executor,
+                    executors=self._executors,
+                    plans=self._plans,
+                )
+                if response_streaming:
+                    async for ret in func(ctx):
+                        convert_reply(ret)
+                else:
+                    convert_reply(await func(ctx))
+
+            method: Callable[..., Any] = stream_wrap if response_streaming else wrap
+            if tracer is not None:
+                method = self.trace_method(tracer, method_name, method, response_streaming=response_streaming)
             logging.info(f"register method:{method_name}")
-            self.config.methods.append(GRPCMethod(grpc_method_name=method_name, method=wrap))
-            return wrap
+            self.config.methods.append(
+                GRPCMethod(
+                    grpc_method_name=method_name,
+                    method=method,
+                    cache=reply_cache,
+                    admission=admission_controller,
+                    request_streaming=request_streaming,
+                    warmup=warmup,
+                )
+            )
+            return method
 
         return wrapper
 
+    @staticmethod
+    def create_tracer(info: TracingInfo) -> Tracer:
+        """Tracer exporting the spans to the configured exporter."""
+        exporter: SpanExporter
+        if info.exporter == "ring":
+            exporter = RingBufferSpanExporter(info.ring_size)
+        elif info.exporter == "jsonl" and info.file:
+            exporter = JsonLinesSpanExporter(info.file)
+        else:
+            msg = f"Unknown span exporter:{info.exporter}, the jsonl exporter requires a file"
+            raise RuntimeError(msg)
+        return Tracer(exporter, info.sample_rate, info.parent_based, info.batch_size, info.flush_interval)
+
+    @staticmethod
+    def trace_method(
+        tracer: Tracer, method_name: str, method: Callable[..., Any], *, response_streaming: bool
+    ) -> Callable[..., Any]:
+        """Record the root span of the sampled requests, their trace is current while the method runs."""
+        name = f"rpc {method_name}"
+
+        async def traced_stream(*args: Any) -> AsyncIterator[object]:
+            trace = tracer.start(args[2])
+            if trace is None:
+                async for reply in method(*args):
+                    yield reply
+                return
+            token = Trace.current.set(trace)
+            start, status = time.perf_counter(), "ok"
+            try:
+                async for reply in method(*args):
+                    yield reply
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                with contextlib.suppress(ValueError):
+                    Trace.current.reset(token)
+                trace.add(name, start, time.perf_counter(), trace.remote_parent_id, trace.root_id, status=status)
+                tracer.finish(trace)
+
+        async def traced(*args: Any) -> object:
+            trace = tracer.start(args[2])
+            if trace is None:
+                return await method(*args)
+            token = Trace.current.set(trace)
+            start, status = time.perf_counter(), "ok"
+            try:
+                return await method(*args)
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                Trace.current.reset(token)
+                trace.add(name, start, time.perf_counter(), trace.remote_parent_id, trace.root_id, status=status)
+                tracer.finish(trace)
+
+        return traced_stream if response_streaming else traced
+
+    @staticmethod
+    def create_pre_stages(
+        middlewares: Tuple[GRPCServiceMiddleware, ...],
+    ) -> List[Tuple[GRPCServiceMiddleware, ...]]:
+        """Group the consecutive concurrent middlewares, the other ones are alone in their stage."""
+        stages: List[Tuple[GRPCServiceMiddleware, ...]] = []
+        for middleware in middlewares:
+            if middleware.concurrent and stages and stages[-1][0].concurrent:
+                stages[-1] = (*stages[-1], middleware)
+            else:
+                stages.append((middleware,))
+        return stages
+
+    async def run_pre(self, ctx: Any) -> None:  # noqa: ANN401
+        """Run the pre hooks stage by stage."""
+        for stage in self._pre_stages:
+            if len(stage) == 1:
+                await stage[0].pre(ctx)
+                continue
+            async with anyio.create_task_group() as tg:
+                for middleware in stage:
+                    tg.start_soon(middleware.pre, ctx)
+
+    async def run_post(self, ctx: Any, ret: Any) -> None:  # noqa: ANN401
+        """Run the post hooks, queue the deferred ones."""
+        for middleware in self._post_middlewares:
+            await middleware.post(ctx, ret)
+        for middleware in self._deferred_middlewares:
+            await self._deferred_queue.submit(functools.partial(middleware.post, ctx, ret))
+
+    def prepare_reply_converter(self, func: Callable[..., Any]) -> None:
+        """Build the reply converter of the model the method is annotated to return."""
+        with contextlib.suppress(Exception):
+            ret_type = typing.get_type_hints(func).get("return")
+            if inspect.isasyncgenfunction(func):
+                ret_type = getattr(ret_type, "__args__", (None,))[0]
+            if isinstance(ret_type, type) and issubclass(ret_type, BaseModel):
+                self._reply_converter.prepare(ret_type)
+
+    def create_lazy_method(
+        self, pkg: str, method_name: str
+    ) -> Tuple[Callable[[Any], Awaitable[Any]], Callable[[], Awaitable[Callable[[Any], Awaitable[Any]]]]]:
+        """Method importing its package in a worker thread on the first call, unary responses only.
+
+        Returns the method and the coroutine function resolving it ahead of the first call.
+        """
+        resolved: List[Callable[[Any], Awaitable[Any]]] = []
+
+        async def resolve() -> Callable[[Any], Awaitable[Any]]:
+            if not resolved:
+                module = await anyio.to_thread.run_sync(importlib.import_module, pkg)
+                func = getattr(module, method_name)
+                if not inspect.iscoroutinefunction(func):
+                    msg = f"{pkg}.{method_name} must be a coroutine function to be imported lazily"
+                    raise RuntimeError(msg)
+                self.prepare_reply_converter(func)
+                resolved.append(func)
+            return resolved[0]
+
+        async def lazy(ctx: Any) -> Any:  # noqa: ANN401
+            func = resolved[0] if resolved else await resolve()
+            return await func(ctx)
+
+        return lazy, resolve
+
     def create_servicer(self) -> object:
-        """Create the servicer."""
+        """Create the servicer, unregistered methods of the generated base reply UNIMPLEMENTED."""
         methods = {meta.grpc_method_name: meta.method for meta in self.config.methods}
-        return type(self.config.info.service_name, (), methods)()
+        return type(self.config.info.service_name, (self.config.servicer_base,), methods)()
 
     @override
     async def start(self) -> None:
         logging.info(f"thread limiter:{self._thread_limiter}")
         anyio.to_thread.current_default_thread_limiter().total_tokens = self._thread_limiter
+        for executor in self._executors.values():
+            await executor.start()
+        await self.warmup()
         logging.info(f"grpc options:{self._options}")
         self._server = grpc.aio.server(options=self._options, interceptors=self._interceptors)
         self.config.handle_func(self.create_servicer(), self._server)
+        if self.config.info.admin:
+            self._server.add_generic_rpc_handlers((self._admin.create_handler(),))
+        if self.config.info.health:
+            self._server.add_generic_rpc_handlers((self._health.create_handler(), self._load.create_handler()))
         listen_addr = self.config.info.listen_addr
         self._server.add_insecure_port(listen_addr)
         logging.info("Starting server on %s", listen_addr)
         await self._server.start()
+        if self.config.info.health:
+            self._health.set_status(HealthService.SERVING)
+            self.spawn(self._load_reporter.run)
+        metrics_info = self.config.info.metrics
+        if metrics_info and metrics_info.file:
+            self.spawn(self.export_metrics)
+        if metrics_info and metrics_info.port is not None:
+            self.spawn(self.serve_metrics)
+        if self._adaptive_thread_limiter is not None:
+            self.spawn(self._adaptive_thread_limiter.run)
+        if self._deferred_middlewares:
+            self.spawn(self._deferred_queue.run)
+        if self._tracer is not None:
+            self.spawn(self._tracer.run)
+        if self._slow_requests is not None:
+            self.spawn(self._slow_requests.run)
+        profiler_info = self.config.info.profiler
+        if profiler_info and profiler_info.signal and hasattr(signal, "SIGUSR1"):
+            self.spawn(self.profile_on_signal)
+        self._background_host = asyncio.get_running_loop().create_task(self.run_background())
+
+    async def warmup(self) -> None:
+        """Preload the packages, resolve the lazy methods and send the warm-up requests before binding."""
+        warmup_info = self.config.info.warmup
+        if not warmup_info:
+            return
+        start = time.perf_counter()
+        for pkg in warmup_info.pkgs:
+            step = time.perf_counter()
+            try:
+                await anyio.to_thread.run_sync(importlib.import_module, pkg)
+            except Exception:
+                logging.exception(f"warm-up:failed to preload {pkg}")
+                continue
+            logging.info(f"warm-up:preloaded {pkg} in {(time.perf_counter() - step) * 1000:.1f}ms")
+        for method_name, resolve in self._resolvers.items():
+            step = time.perf_counter()
+            try:
+                await resolve()
+            except Exception:
+                logging.exception(f"warm-up:failed to resolve {method_name}")
+                continue
+            logging.info(f"warm-up:resolved {method_name} in {(time.perf_counter() - step) * 1000:.1f}ms")
+        methods = {meta.grpc_method_name: meta for meta in self.config.methods}
+        for method_name, requests in warmup_info.requests.items():
+            meta = methods.get(method_name)
+            if meta is None:
+                logging.warning(f"warm-up:unknown method {method_name}")
+                continue
+            step = time.perf_counter()
+            for fields in requests:
+                try:
+                    await self.send_warmup_request(meta, self.config.request_func(**fields))
+                except Exception:
+                    logging.exception(f"warm-up:request to {method_name} failed")
+            elapsed = (time.perf_counter() - step) * 1000
+            logging.info(f"warm-up:{len(requests)} requests to {method_name} in {elapsed:.1f}ms")
+        logging.info(f"warm-up:done in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    @staticmethod
+    async def send_warmup_request(meta: GRPCMethod, request: object) -> None:
+        """Run the registered method on the request, outside grpc, the metrics and the reply cache."""
+
+        async def requests() -> AsyncIterator[object]:
+            yield request
+
+        await meta.warmup(requests() if meta.request_streaming else request)
+
+    def spawn(self, func: Callable[[], Awaitable[None]]) -> None:
+        """Run the coroutine function in the task group of the service until the service is closed."""
+        self._background.append(func)
+        if self._task_group is not None:
+            self._task_group.start_soon(GRPCService.run_guarded, func)
+
+    async def run_background(self) -> None:
+        """Host the task group of the background tasks, started by start and cancelled by close.
+
+        grpc.aio runs on asyncio and anyio cannot start a task outliving its caller, so start creates this one
+        host task on the running loop and the background tasks run in its task group.
+        """
+        try:
+            async with anyio.create_task_group() as tg:
+                self._task_group = tg
+                for func in self._background:
+                    tg.start_soon(GRPCService.run_guarded, func)
+                await anyio.sleep_forever()
+        finally:
+            self._task_group = None
+
+    @staticmethod
+    async def run_guarded(func: Callable[[], Awaitable[None]]) -> None:
+        """Run the background task, its error is logged without cancelling the others."""
+        try:
+            await func()
+        except Exception:
+            logging.exception(f"background task {getattr(func, '__qualname__', func)} failed")
+
+    async def dump_metrics(self, _: bytes, __: Any) -> bytes:  # noqa: ANN401
+        """Admin method returning the metrics in the Prometheus text format."""
+        return self._metrics.to_prometheus().encode()
+
+    async def report_load(self, _: bytes, __: Any) -> bytes:  # noqa: ANN401
+        """Load report in JSON: in-flight rpcs, thread utilization, loop lag and recent p99 in seconds."""
+        return json.dumps(self._load_reporter.report()).encode()
+
+    async def dump_thread_limiter(self, _: bytes, __: Any) -> bytes:  # noqa: ANN401
+        """Admin method returning the recent thread limiter adjustments in JSON."""
+        adjustments = self._adaptive_thread_limiter.adjustments if self._adaptive_thread_limiter else ()
+        return json.dumps([_._asdict() for _ in adjustments]).encode()
+
+    async def dump_traces(self, _: bytes, __: Any) -> bytes:  # noqa: ANN401
+        """Admin method returning the latest spans of the ring buffer exporter in JSON."""
+        if self._tracer is None:
+            return b"[]"
+        await self._tracer.flush()
+        exporter = self._tracer.exporter
+        return json.dumps(exporter.spans if isinstance(exporter, RingBufferSpanExporter) else []).encode()
+
+    async def profile(self, duration: float) -> str:
+        """Sample the event loop and worker threads for the duration in seconds, in collapsed stacks."""
+        if self._profiler is None:
+            msg = "The profiler is not configured"
+            raise RuntimeError(msg)
+        logging.info(f"profiler:sampling for {duration}s")
+        return await anyio.to_thread.run_sync(self._profiler.profile, duration, limiter=anyio.CapacityLimiter(1))
+
+    async def dump_profile(self, request: bytes, context: Any) -> bytes:  # noqa: ANN401
+        """Admin method profiling for the duration of the JSON request, 10 seconds by default, up to max_duration."""
+        max_duration = (self.config.info.profiler or ProfilerInfo()).max_duration
+        try:
+            duration = float(json.loads(request or b"{}").get("duration", 10))
+        except (ValueError, TypeError, AttributeError):
+            duration = math.nan
+        if not 0 < duration <= max_duration:
+            msg = f"The profile duration must be positive and at most {max_duration}s"
+            if context is not None:
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, msg)
+            raise RuntimeError(msg)
+        return (await self.profile(duration)).encode()
+
+    async def dump_slow_requests(self, _: bytes, __: Any) -> bytes:  # noqa: ANN401
+        """Admin method returning the latest slow requests and their stacks in JSON."""
+        return json.dumps(self._slow_requests.records if self._slow_requests else []).encode()
+
+    async def profile_on_signal(self) -> None:
+        """Profile on SIGUSR1 and write the collapsed stacks to the profiler directory."""
+        profiler_info = self.config.info.profiler or ProfilerInfo()
+        with anyio.open_signal_receiver(signal.SIGUSR1) as signals:
+            async for _ in signals:
+                try:
+                    text = await self.profile(profiler_info.duration)
+                except RuntimeError:
+                    logging.exception("profiler:failed")
+                    continue
+                path = os.path.join(profiler_info.directory, f"pyasyncrpc-{os.getpid()}-{int(time.time())}.collapsed")  # noqa: PTH118
+                await anyio.to_thread.run_sync(self.write_file, path, text)
+                logging.info(f"profiler:collapsed stacks written to {path}")
+
+    async def export_metrics(self) -> None:
+        """Write the metrics to the configured file periodically."""
+        metrics_info = self.config.info.metrics
+        if not metrics_info or not metrics_info.file:
+            return
+        path = metrics_info.file
+        logging.info(f"metrics file:{path}")
+        while True:
+            text = self._metrics.to_prometheus()
+            await anyio.to_thread.run_sync(self.write_file, path, text)
+            await anyio.sleep(metrics_info.interval)
+
+    @staticmethod
+    def write_file(path: str, text: str) -> None:
+        """Replace the file with the text atomically."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:  # noqa: PTH123
+            f.write(text)
+        os.replace(tmp, path)  # noqa: PTH105
+
+    async def serve_metrics(self) -> None:
+        """Serve the metrics over plain HTTP on the configured port."""
+        metrics_info = self.config.info.metrics
+        if not metrics_info or metrics_info.port is None:
+            return
+        listener = await anyio.create_tcp_listener(local_host=metrics_info.host, local_port=metrics_info.port)
+        logging.info(f"metrics address:{metrics_info.host}:{metrics_info.port}")
+
+        async def handle(stream: Any) -> None:  # noqa: ANN401
+            async with stream:
+                with contextlib.suppress(Exception):
+                    await stream.receive()
+                    body = self._metrics.to_prometheus().encode()
+                    header = (
+                        "HTTP/1.0 200 OK\r\n"
+                        "Content-Type: text/plain; version=0.0.4\r\n"
+                        f"Content-Length: {len(body)}\r\n\r\n"
+                    )
+                    await stream.send(header.encode() + body)
+
+        await listener.serve(handle)
 
     @override
     async def close(self) -> None:
         logging.info("The asynchronous rpc application will be shut down")
+        self._health.shutdown()
         await self.server.stop(self._grace)
+        await self._deferred_queue.close(self._grace)
+        host, self._background_host = self._background_host, None
+        if host is not None:
+            host.cancel()
+            await asyncio.wait((host,))
+        if self._tracer is not None:
+            await self._tracer.flush()
+        for executor in self._executors.values():
+            await executor.close()
         logging.info("The asynchronous rpc application has been shut down")
 
     @override
@@ -0,0 +1,117 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import logging
+from typing import Any, AsyncIterator, ClassVar, Dict, Optional, Tuple
+
+import anyio
+import grpc
+
+
+class HealthService:
+    """grpc.health.v1.Health with hand-encoded messages, no generated code required."""
+
+    SERVICE_NAME: ClassVar[str] = "grpc.health.v1.Health"
+    UNKNOWN: ClassVar[int] = 0
+    SERVING: ClassVar[int] = 1
+    NOT_SERVING: ClassVar[int] = 2
+    SERVICE_UNKNOWN: ClassVar[int] = 3
+
+    def __init__(self, *names: str) -> None:
+        """Init, the overall health is the empty name."""
+        self._statuses: Dict[str, int] = dict.fromkeys(("", *names), HealthService.NOT_SERVING)
+        self._changed: Optional[anyio.Event] = None
+        self._closed = False
+
+    @property
+    def statuses(self) -> Dict[str, int]:
+        """Serving status by service name."""
+        return self._statuses
+
+    def set_status(self, status: int, name: Optional[str] = None) -> None:
+        """Set the status of the service, of every service when the name is omitted."""
+        names = list(self._statuses) if name is None else [name]
+        for _ in names:
+            self._statuses[_] = status
+        logging.info(f"health:{names} -> {status}")
+        changed, self._changed = self._changed, None
+        if changed is not None:
+            changed.set()
+
+    def shutdown(self) -> None:
+        """Report NOT_SERVING and end the watches so that they do not hold the graceful stop."""
+        self._closed = True
+        self.set_status(HealthService.NOT_SERVING)
+
+    async def check(self, request: bytes, context: Any) -> bytes:  # noqa: ANN401
+        """Status of the requested service, NOT_FOUND when it is unknown."""
+        status = self._statuses.get(HealthService.decode_request(request))
+        if status is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "unknown service")
+        return HealthService.encode_response(status or HealthService.UNKNOWN)
+
+    async def watch(self, request: bytes, _: Any) -> AsyncIterator[bytes]:  # noqa: ANN401
+        """Stream the status of the requested service whenever it changes."""
+        name = HealthService.decode_request(request)
+        last = None
+        while True:
+            if self._changed is None:
+                self._changed = anyio.Event()
+            changed = self._changed
+            status = self._statuses.get(name, HealthService.SERVICE_UNKNOWN)
+            if status != last:
+                last = status
+                yield HealthService.encode_response(status)
+            if self._closed:
+                return
+            await changed.wait()
+
+    @staticmethod
+    def decode_request(request: bytes) -> str:
+        """Service name of the HealthCheckRequest."""
+        pos = 0
+        while pos < len(request):
+            key, pos = HealthService.decode_varint(request, pos)
+            wire_type = key & 7
+            if wire_type == 0:
+                _, pos = HealthService.decode_varint(request, pos)
+            elif wire_type == 2:
+                size, pos = HealthService.decode_varint(request, pos)
+                if key >> 3 == 1:
+                    return request[pos : pos + size].decode()
+                pos += size
+            elif wire_type in (1, 5):
+                pos += 8 if wire_type == 1 else 4
+            else:
+                break
+        return ""
+
+    @staticmethod
+    def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+        """Value of the varint at the position, and the position after it."""
+        value = shift = 0
+        while pos < len(data):
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        return value, pos
+
+    @staticmethod
+    def encode_response(status: int) -> bytes:
+        """HealthCheckResponse of the status."""
+        return bytes((0x08, status)) if status else b""
+
+    def create_handler(self) -> grpc.GenericRpcHandler:
+        """Create the generic rpc handler."""
+        return grpc.method_handlers_generic_handler(
+            HealthService.SERVICE_NAME,
+            {
+                "Check": grpc.unary_unary_rpc_method_handler(self.check),
+                "Watch": grpc.unary_stream_rpc_method_handler(self.watch),
+            },
+        )
@@ -4,6 +4,7 @@ Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
 from abc import ABC, abstractmethod
+from typing import Dict
 
 
 class Service(ABC):
@@ -20,3 +21,18 @@ class Service(ABC):
     @abstractmethod
     async def wait(self) -> None:
         """Wait for termination."""
+
+    def prepare_worker(self, index: int) -> None:  # noqa: B027
+        """Prepare the service for running in the worker process with the given index."""
+
+    def prepare_reload(self) -> None:  # noqa: B027
+        """Prepare the service for sharing the listen address with the process replacing it."""
+
+    def reload_env(self, workers: int) -> Dict[str, str]:  # noqa: ARG002
+        """Environment of the process replacing this one and its workers, RuntimeError when it is refused."""
+        return {}
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests being processed."""
+        return 0
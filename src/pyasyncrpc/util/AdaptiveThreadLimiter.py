@@ -0,0 +1,95 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import logging
+import time
+from typing import Callable, Deque, NamedTuple
+
+import anyio
+
+
+class ThreadLimiterAdjustment(NamedTuple):
+    """an adjustment of the thread limiter."""
+
+    time: float
+    total_tokens: int
+    throughput: float
+    wait: float
+    waiting: int
+    utilization: float
+
+
+class AdaptiveThreadLimiter:
+    """hill-climb the tokens of the default thread limiter on throughput while threads are contended."""
+
+    def __init__(
+        self,
+        completed: Callable[[], int],
+        min_tokens: int = 4,
+        max_tokens: int = 200,
+        step: int = 4,
+        interval: float = 1,
+        target_wait: float = 0.005,
+        history: int = 100,
+    ) -> None:
+        """Init."""
+        if not 1 <= min_tokens <= max_tokens:
+            msg = "min_tokens must be positive and not greater than max_tokens"
+            raise ValueError(msg)
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.step = step
+        self.interval = interval
+        self.target_wait = target_wait
+        self.adjustments: Deque[ThreadLimiterAdjustment] = collections.deque(maxlen=history)
+        self._completed = completed
+        self._last_completed = completed()
+        self._last_time = time.perf_counter()
+        self._last_throughput = 0.0
+        self._last_delta = 0
+        self._direction = 1
+
+    async def run(self) -> None:
+        """Adjust the tokens every interval."""
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        limiter.total_tokens = min(max(int(limiter.total_tokens), self.min_tokens), self.max_tokens)
+        while True:
+            await anyio.sleep(self.interval)
+            start = time.perf_counter()
+            await anyio.to_thread.run_sync(time.perf_counter)
+            self.sample(time.perf_counter() - start)
+
+    def sample(self, wait: float) -> int:
+        """Decide the tokens from the thread wait of a probe and the throughput since the previous sample."""
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        statistics = limiter.statistics()
+        total = int(limiter.total_tokens)
+        now = time.perf_counter()
+        completed = self._completed()
+        throughput = (completed - self._last_completed) / max(now - self._last_time, 1e-9)
+        self._last_completed, self._last_time = completed, now
+        utilization = statistics.borrowed_tokens / total
+        delta = 0
+        if statistics.tasks_waiting or wait > self.target_wait:
+            if self._last_delta and throughput < self._last_throughput:
+                self._direction = -self._direction
+            delta = self._direction * self.step
+        elif utilization < 0.5:
+            self._direction = 1
+            delta = -self.step
+        self._last_throughput = throughput
+        tokens = min(max(total + delta, self.min_tokens), self.max_tokens)
+        self._last_delta = tokens - total
+        if tokens != total:
+            limiter.total_tokens = tokens
+            self.adjustments.append(
+                ThreadLimiterAdjustment(now, tokens, throughput, wait, statistics.tasks_waiting, utilization)
+            )
+            logging.info(
+                f"thread limiter:{total} -> {tokens}, throughput:{throughput:.1f}/s, wait:{wait * 1000:.3f}ms, "
+                f"waiting:{statistics.tasks_waiting}, utilization:{utilization:.2f}"
+            )
+        return tokens
@@ -0,0 +1,85 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import time
+from typing import Deque, Optional
+
+import anyio
+
+
+class AdmissionController:
+    """bound the requests in flight and queued, shedding by queue wait in the manner of CoDel."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queued: int = 0,
+        target_delay: Optional[float] = None,
+        interval: float = 0.1,
+    ) -> None:
+        """Init."""
+        if max_in_flight < 1 or max_queued < 0:
+            msg = "max_in_flight must be positive and max_queued must not be negative"
+            raise ValueError(msg)
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.target_delay = target_delay
+        self.interval = interval
+        self.in_flight = 0
+        self.rejected = 0
+        self.shed = 0
+        self._waiters: Deque[anyio.Event] = collections.deque()
+        self._first_above: float = 0
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, False when the request must be rejected."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queued:
+            self.rejected += 1
+            return False
+        event = anyio.Event()
+        self._waiters.append(event)
+        start = time.perf_counter()
+        try:
+            await event.wait()
+        except BaseException:
+            if event.is_set():
+                self.release()
+            else:
+                self._waiters.remove(event)
+            raise
+        if self.should_shed(time.perf_counter() - start):
+            self.release()
+            self.shed += 1
+            return False
+        return True
+
+    def release(self) -> None:
+        """Hand the slot over to the oldest waiter, or free it."""
+        if self._waiters:
+            self._waiters.popleft().set()
+        else:
+            self.in_flight -= 1
+
+    def should_shed(self, wait: float) -> bool:
+        """Shed once the queue wait stayed above the target for an interval."""
+        if self.target_delay is None:
+            return False
+        if wait < self.target_delay:
+            self._first_above = 0
+            return False
+        now = time.perf_counter()
+        if not self._first_above:
+            self._first_above = now + self.interval
+            return False
+        return now >= self._first_above
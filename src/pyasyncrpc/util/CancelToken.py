@@ -0,0 +1,49 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import time
+from typing import Any, Optional
+
+
+class CancelToken:
+    """cooperative cancellation of the python script, by the call or its deadline."""
+
+    __slots__ = ("deadline", "reason")
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        """Init, the deadline is the timeout in seconds from now."""
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.reason: Optional[str] = None
+
+    @classmethod
+    def from_context(cls, context: Any) -> "CancelToken":  # noqa: ANN401
+        """Token of the deadline of the servicer context, cancelled once the rpc terminates."""
+        if context is None:
+            return cls()
+        token = cls(context.time_remaining())
+        context.add_done_callback(lambda _: token.cancel("The call is terminated"))
+        return token
+
+    @property
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, None without deadline."""
+        return max(0.0, self.deadline - time.monotonic()) if self.deadline is not None else None
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the script should stop."""
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "The deadline is exceeded"
+        return self.reason is not None
+
+    def cancel(self, reason: str = "The python script is cancelled") -> None:
+        """Cancel, the first reason is kept."""
+        if self.reason is None:
+            self.reason = reason
+
+    def raise_if_cancelled(self) -> None:
+        """Raise once cancelled."""
+        if self.cancelled:
+            raise RuntimeError(self.reason)
@@ -0,0 +1,71 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import time
+import zlib
+from typing import Any, ClassVar, Dict, Tuple
+
+import grpc
+
+from pyasyncrpc.util.Metrics import MethodMetrics
+
+
+class CompressionPolicy:
+    """compress the replies of a method from a minimum size, sampling the compression ratio and time."""
+
+    ALGORITHMS: ClassVar[Dict[str, Tuple[grpc.Compression, int]]] = {
+        "none": (grpc.Compression.NoCompression, 0),
+        "gzip": (grpc.Compression.Gzip, 31),
+        "deflate": (grpc.Compression.Deflate, 15),
+    }
+
+    def __init__(self, algorithm: str = "gzip", min_size: int = 1024, sample_every: int = 100) -> None:
+        """Init."""
+        if algorithm not in CompressionPolicy.ALGORITHMS:
+            msg = f"Unknown compression algorithm:{algorithm}"
+            raise RuntimeError(msg)
+        self.compression, self._wbits = CompressionPolicy.ALGORITHMS[algorithm]
+        self.min_size = min_size
+        self.sample_every = max(1, sample_every)
+
+    def apply(self, context: Any, reply: Any, metrics: MethodMetrics) -> None:  # noqa: ANN401
+        """Set the compression of the reply on the servicer context."""
+        if context is None:
+            return
+        if self.compression is grpc.Compression.NoCompression or reply.ByteSize() < self.min_size:
+            context.set_compression(grpc.Compression.NoCompression)
+            metrics.uncompressed += 1
+            return
+        context.set_compression(self.compression)
+        metrics.compressed += 1
+        if (metrics.compressed - 1) % self.sample_every == 0:
+            self.sample(reply.SerializeToString(), metrics)
+
+    def start_stream(self, context: Any) -> None:  # noqa: ANN401
+        """Set the compression of the streaming call, before its first message."""
+        if context is not None:
+            context.set_compression(self.compression)
+
+    def apply_message(self, context: Any, reply: Any, metrics: MethodMetrics) -> None:  # noqa: ANN401
+        """Leave the streamed reply below the minimum size uncompressed."""
+        if context is None or self.compression is grpc.Compression.NoCompression:
+            return
+        if reply.ByteSize() < self.min_size:
+            context.disable_next_message_compression()
+            metrics.uncompressed += 1
+            return
+        metrics.compressed += 1
+        if (metrics.compressed - 1) % self.sample_every == 0:
+            self.sample(reply.SerializeToString(), metrics)
+
+    def sample(self, data: bytes, metrics: MethodMetrics) -> None:
+        """Compress the serialized reply like the transport does to estimate the ratio and the time."""
+        start = time.perf_counter()
+        compressor = zlib.compressobj(wbits=self._wbits)
+        size = len(compressor.compress(data)) + len(compressor.flush())
+        metrics.compression_seconds += time.perf_counter() - start
+        metrics.compression_samples += 1
+        metrics.compression_raw_bytes += len(data)
+        metrics.compression_bytes += size
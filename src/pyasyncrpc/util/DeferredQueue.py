@@ -0,0 +1,103 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import logging
+from typing import Awaitable, Callable, ClassVar, Optional, Tuple
+
+import anyio
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+
+from pyasyncrpc.util.Metrics import Metrics
+
+DeferredJob = Callable[[], Awaitable[None]]
+
+
+class DeferredQueue:
+    """run jobs off the request path on a bounded queue served by background workers.
+
+    When the queue is full, drop_newest drops the submitted job, drop_oldest drops the oldest queued job, block
+    waits for room and inline runs the job in the caller.
+    """
+
+    OVERFLOWS: ClassVar[Tuple[str, ...]] = ("drop_newest", "drop_oldest", "block", "inline")
+
+    def __init__(self, metrics: Metrics, max_size: int = 1000, workers: int = 4, overflow: str = "drop_newest") -> None:
+        """Init."""
+        if overflow not in DeferredQueue.OVERFLOWS:
+            msg = f"Unknown overflow policy:{overflow}"
+            raise RuntimeError(msg)
+        if max_size < 1 or workers < 1:
+            msg = "max_size and workers must be positive"
+            raise RuntimeError(msg)
+        self._metrics = metrics
+        self._workers = workers
+        self._overflow = overflow
+        self._send: MemoryObjectSendStream[DeferredJob]
+        self._receive: MemoryObjectReceiveStream[DeferredJob]
+        self._send, self._receive = anyio.create_memory_object_stream(max_size)
+        self._done: Optional[anyio.Event] = None
+
+    async def submit(self, job: DeferredJob) -> None:
+        """Queue the job, applying the overflow policy when the queue is full."""
+        try:
+            self._send.send_nowait(job)
+        except anyio.WouldBlock:
+            if self._overflow == "drop_newest":
+                self._metrics.deferred_dropped += 1
+                return
+            if self._overflow == "inline":
+                await self.run_job(job)
+                return
+            if self._overflow == "drop_oldest":
+                self._receive.receive_nowait()
+                self._metrics.deferred_dropped += 1
+                self._metrics.deferred_queued -= 1
+                self._send.send_nowait(job)
+            else:
+                try:
+                    await self._send.send(job)
+                except anyio.ClosedResourceError:
+                    await self.run_job(job)
+                    return
+        except anyio.ClosedResourceError:
+            await self.run_job(job)
+            return
+        self._metrics.deferred_queued += 1
+
+    async def run(self) -> None:
+        """Serve the queue with the workers until it is closed and empty."""
+        self._done = anyio.Event()
+        try:
+            async with anyio.create_task_group() as tg:
+                for _ in range(self._workers):
+                    tg.start_soon(self.work)
+        finally:
+            self._done.set()
+
+    async def work(self) -> None:
+        """Run the queued jobs one after the other."""
+        async for job in self._receive:
+            self._metrics.deferred_queued -= 1
+            await self.run_job(job)
+
+    async def run_job(self, job: DeferredJob) -> None:
+        """Run the job, its error is logged and counted."""
+        try:
+            await job()
+        except Exception:
+            self._metrics.deferred_errors += 1
+            logging.exception("deferred job failed")
+        else:
+            self._metrics.deferred_completed += 1
+
+    async def close(self, timeout: Optional[float] = None) -> None:  # noqa: ASYNC109
+        """Stop accepting jobs and wait for the queued ones to complete within the timeout."""
+        self._send.close()
+        if self._done is None:
+            return
+        with anyio.move_on_after(timeout):
+            await self._done.wait()
+        if self._metrics.deferred_queued:
+            logging.warning(f"{self._metrics.deferred_queued} deferred jobs were not run")
@@ -0,0 +1,100 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import importlib.abc
+import importlib.machinery
+import sys
+import time
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """record the time spent executing each imported module."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.cumulative: Dict[str, float] = {}
+        self.self_time: Dict[str, float] = {}
+        self._children: List[float] = []
+        self._installed = time.perf_counter()
+
+    def install(self) -> None:
+        """Profile the following imports."""
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        self._installed = time.perf_counter()
+
+    def uninstall(self) -> None:
+        """Stop profiling."""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(
+        self, fullname: str, path: Optional[Sequence[str]], target: Optional[ModuleType] = None
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        """Find the spec with the next finders and time its loader."""
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def record(self, name: str, elapsed: float, children: float) -> None:
+        """Record the time of the module, children being the time of the nested imports."""
+        self.cumulative[name] = elapsed
+        self.self_time[name] = elapsed - children
+
+    def timed(self, name: str, loader: importlib.abc.Loader, module: ModuleType) -> None:
+        """Execute the module, keeping the time of the nested imports apart."""
+        parent, self._children = self._children, []
+        start = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record(name, elapsed, sum(self._children))
+            self._children = parent
+            self._children.append(elapsed)
+
+    def report(self, limit: int = 20) -> str:
+        """The slowest modules by cumulative time."""
+        ranked: List[Tuple[str, float]] = sorted(self.cumulative.items(), key=lambda _: _[1], reverse=True)
+        lines = [
+            f"startup {time.perf_counter() - self._installed:.3f}s, "
+            f"{len(self.cumulative)} modules imported in {sum(self.self_time.values()):.3f}s",
+            f"{'cumulative(ms)':>14} {'self(ms)':>10}  module",
+        ]
+        lines.extend(
+            f"{cumulative * 1000:>14.1f} {self.self_time[name] * 1000:>10.1f}  {name}"
+            for name, cumulative in ranked[:limit]
+        )
+        return "\n".join(lines)
+
+
+class TimedLoader(importlib.abc.Loader):
+    """loader delegating to the original loader under the profiler."""
+
+    def __init__(self, loader: importlib.abc.Loader, profiler: ImportProfiler) -> None:
+        """Init."""
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec: importlib.machinery.ModuleSpec) -> Optional[ModuleType]:
+        """Create the module with the original loader."""
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        """Execute the module with the original loader."""
+        self._profiler.timed(module.__name__, self._loader, module)
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        """Delegate the other attributes to the original loader."""
+        return getattr(self._loader, name)
@@ -0,0 +1,57 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import time
+from typing import Any, Deque, Dict, List
+
+import anyio
+
+from pyasyncrpc.util.Metrics import Histogram, Metrics
+
+
+class LoadReporter:
+    """sample the event loop lag and the recent request latencies for client-side balancing."""
+
+    def __init__(self, metrics: Metrics, interval: float = 0.5, window: float = 10) -> None:
+        """Init."""
+        self.interval = interval
+        self.loop_lag = 0.0
+        self._metrics = metrics
+        self._snapshots: Deque[List[int]] = collections.deque(maxlen=max(1, int(window / interval)) + 1)
+
+    async def run(self) -> None:
+        """Measure how late the loop wakes up and keep the latency counts of the window."""
+        while True:
+            start = time.perf_counter()
+            await anyio.sleep(self.interval)
+            self.loop_lag = max(0.0, time.perf_counter() - start - self.interval)
+            self._snapshots.append(self.counts())
+
+    def counts(self) -> List[int]:
+        """Request latency counts of all the methods by bucket."""
+        counts = [0] * len(Histogram.BUCKETS)
+        for method in self._metrics.methods.values():
+            for index, count in enumerate(method.latency.counts):
+                counts[index] += count
+        return counts
+
+    def recent(self) -> Histogram:
+        """Request latencies observed within the window."""
+        histogram = Histogram()
+        oldest = self._snapshots[0] if self._snapshots else [0] * len(Histogram.BUCKETS)
+        histogram.counts = [now - then for now, then in zip(self.counts(), oldest)]
+        histogram.count = sum(histogram.counts)
+        return histogram
+
+    def report(self) -> Dict[str, Any]:
+        """Load of the service, latencies in seconds."""
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        return {
+            "in_flight": self._metrics.in_flight,
+            "thread_utilization": limiter.borrowed_tokens / limiter.total_tokens,
+            "loop_lag": self.loop_lag,
+            "p99": self.recent().quantile(0.99),
+        }
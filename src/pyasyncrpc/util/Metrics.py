@@ -0,0 +1,187 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import bisect
+import math
+from typing import ClassVar, Dict, List, Tuple
+
+import anyio
+
+
+class Histogram:
+    """latency histogram with fixed buckets in seconds."""
+
+    BUCKETS: ClassVar[Tuple[float, ...]] = (
+        0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf,
+    )  # fmt: skip
+
+    __slots__ = ("count", "counts", "sum")
+
+    def __init__(self) -> None:
+        """Init."""
+        self.counts = [0] * len(Histogram.BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.counts[bisect.bisect_left(Histogram.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the quantile, 0 without observations."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(Histogram.BUCKETS, self.counts):
+            total += count
+            if total >= rank:
+                return bound if bound != math.inf else Histogram.BUCKETS[-2]
+        return Histogram.BUCKETS[-2]
+
+
+class MethodMetrics:
+    """metrics of a registered method."""
+
+    STAGES: ClassVar[Tuple[str, ...]] = ("middleware", "handler", "reply")
+
+    __slots__ = (
+        "cache_hits",
+        "cache_misses",
+        "compressed",
+        "compression_bytes",
+        "compression_raw_bytes",
+        "compression_samples",
+        "compression_seconds",
+        "errors",
+        "handler",
+        "in_flight",
+        "latency",
+        "middleware",
+        "rejected",
+        "reply",
+        "requests",
+        "uncompressed",
+    )
+
+    def __init__(self) -> None:
+        """Init."""
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.middleware = Histogram()
+        self.handler = Histogram()
+        self.reply = Histogram()
+        self.latency = Histogram()
+        self.compressed = 0
+        self.uncompressed = 0
+        self.compression_samples = 0
+        self.compression_raw_bytes = 0
+        self.compression_bytes = 0
+        self.compression_seconds = 0.0
+
+    def observe(self, start: float, pre_end: float, handler_end: float, post_end: float, end: float) -> None:
+        """Record the stage latencies of a request."""
+        self.middleware.observe(pre_end - start + post_end - handler_end)
+        self.handler.observe(handler_end - pre_end)
+        self.reply.observe(end - post_end)
+        self.latency.observe(end - start)
+
+
+class Metrics:
+    """metrics of the service."""
+
+    PREFIX: ClassVar[str] = "pyasyncrpc"
+
+    def __init__(self) -> None:
+        """Init."""
+        self._methods: Dict[str, MethodMetrics] = {}
+        self.deferred_completed = 0
+        self.deferred_dropped = 0
+        self.deferred_errors = 0
+        self.deferred_queued = 0
+
+    @property
+    def methods(self) -> Dict[str, MethodMetrics]:
+        """Metrics by method name."""
+        return self._methods
+
+    @property
+    def in_flight(self) -> int:
+        """Number of rpcs being processed."""
+        return sum(_.in_flight for _ in self._methods.values())
+
+    @property
+    def completed(self) -> int:
+        """Number of rpcs processed."""
+        return sum(_.handler.count for _ in self._methods.values())
+
+    def method(self, name: str) -> MethodMetrics:
+        """Metrics of the method, created on first use."""
+        metrics = self._methods.get(name)
+        if metrics is None:
+            metrics = self._methods[name] = MethodMetrics()
+        return metrics
+
+    def to_prometheus(self) -> str:
+        """Dump the metrics in the Prometheus text format."""
+        prefix = Metrics.PREFIX
+        lines: List[str] = []
+        for name, kind, attr in (
+            ("requests_total", "counter", "requests"),
+            ("errors_total", "counter", "errors"),
+            ("rejected_total", "counter", "rejected"),
+            ("compressed_total", "counter", "compressed"),
+            ("uncompressed_total", "counter", "uncompressed"),
+            ("compression_samples_total", "counter", "compression_samples"),
+            ("compression_raw_bytes_total", "counter", "compression_raw_bytes"),
+            ("compression_bytes_total", "counter", "compression_bytes"),
+            ("compression_seconds_total", "counter", "compression_seconds"),
+            ("in_flight", "gauge", "in_flight"),
+        ):
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for method, m in self._methods.items():
+                lines.append(f'{prefix}_{name}{{method="{method}"}} {getattr(m, attr)}')
+        lines.append(f"# TYPE {prefix}_cache_requests_total counter")
+        for method, m in self._methods.items():
+            if m.cache_hits or m.cache_misses:
+                lines.append(f'{prefix}_cache_requests_total{{method="{method}",cache="hit"}} {m.cache_hits}')
+                lines.append(f'{prefix}_cache_requests_total{{method="{method}",cache="miss"}} {m.cache_misses}')
+        lines.append(f"# TYPE {prefix}_request_seconds histogram")
+        for method, m in self._methods.items():
+            Metrics.dump_histogram(lines, f"{prefix}_request_seconds", f'method="{method}"', m.latency)
+        lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+        for method, m in self._methods.items():
+            for stage in MethodMetrics.STAGES:
+                labels = f'method="{method}",stage="{stage}"'
+                Metrics.dump_histogram(lines, f"{prefix}_stage_seconds", labels, getattr(m, stage))
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        for name, kind, value in (
+            ("thread_limiter_borrowed_tokens", "gauge", limiter.borrowed_tokens),
+            ("thread_limiter_total_tokens", "gauge", limiter.total_tokens),
+            ("deferred_completed_total", "counter", self.deferred_completed),
+            ("deferred_dropped_total", "counter", self.deferred_dropped),
+            ("deferred_errors_total", "counter", self.deferred_errors),
+            ("deferred_queued", "gauge", self.deferred_queued),
+        ):
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def dump_histogram(lines: List[str], name: str, labels: str, histogram: Histogram) -> None:
+        """Append the histogram in the Prometheus text format."""
+        total = 0
+        for bound, count in zip(Histogram.BUCKETS, histogram.counts):
+            total += count
+            le = "+Inf" if bound == math.inf else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
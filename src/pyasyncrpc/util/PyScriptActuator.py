@@ -3,20 +3,30 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
-import importlib
+import threading
+import time
 from types import ModuleType
-from typing import List, Union
+from typing import List, Optional, Union
 
-from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject, PyScriptResult
+from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptResult
+from pyasyncrpc.util.CancelToken import CancelToken
+from pyasyncrpc.util.PyScriptPlan import PyScriptPlan, PyScriptStep
+from pyasyncrpc.util.SlowRequestLog import SlowRequest
+from pyasyncrpc.util.Tracer import Trace
 
 
 class PyScriptActuator:
     """execute the python script."""
 
-    def __init__(self, config: PyScriptConfig) -> None:
-        """Init."""
-        self._config = config
+    def __init__(self, config: Union[PyScriptConfig, PyScriptPlan], token: Optional[CancelToken] = None) -> None:
+        """Init, the token is checked before every call and the steps are spans of the current trace."""
+        self._plan = config if isinstance(config, PyScriptPlan) else PyScriptPlan(config)
+        self._config = self._plan.config
         self._result = PyScriptResult()
+        self._token = token
+        self._trace = Trace.current.get()
+        self._created = time.perf_counter() if self._trace is not None else 0.0
+        self._request = SlowRequest.current.get()
 
     @property
     def result(self) -> PyScriptResult:
@@ -25,41 +35,65 @@ class PyScriptActuator:
 
     def load_module(self) -> ModuleType:
         """Load module."""
-        return importlib.import_module(self._config.pkg)
+        return self._plan.resolve()
 
-    def load_methods(self, obj: Union[object, ModuleType], methods: List[PyScriptObject]) -> None:
-        """Load methods."""
-
-        def load_method(info: PyScriptObject) -> object:
-            """Load method."""
-            callable_obj = getattr(obj, info.name)
-            if not info.args:
-                return callable_obj()
-            if not info.transparent:
-                if isinstance(info.args, list):
-                    return callable_obj(*info.args)
-                if isinstance(info.args, dict):
-                    return callable_obj(**info.args)
-            return callable_obj(info.args)
+    def load_method(self, obj: Union[object, ModuleType], step: PyScriptStep) -> object:
+        """Load method."""
+        callable_obj = getattr(obj, step.name) if step.target is None else step.target
+        return step.call(callable_obj)
 
-        for m_info in methods:
-            result = load_method(m_info)
-            if not m_info.methods:
-                self._result.response[m_info.name] = result
+    def load_methods(
+        self, obj: Union[object, ModuleType], methods: List[PyScriptStep], parent_id: Optional[str] = None
+    ) -> None:
+        """Load methods."""
+        token, trace = self._token, self._trace
+        for step in methods:
+            if token is not None:
+                token.raise_if_cancelled()
+            if trace is None:
+                self.load_step(obj, step)
                 continue
-            self.load_methods(result, m_info.methods)
+            span_id, start = Trace.new_id(), time.perf_counter()
+            try:
+                self.load_step(obj, step, span_id)
+            finally:
+                trace.add(f"call {step.name}", start, time.perf_counter(), parent_id, span_id)
+
+    def load_step(self, obj: Union[object, ModuleType], step: PyScriptStep, span_id: Optional[str] = None) -> None:
+        """Load the method of the step and its nested steps."""
+        result = self.load_method(obj, step)
+        if not step.steps:
+            self._result.response[step.name] = result
+            return
+        self.load_methods(result, step.steps, span_id)
 
     def call(self) -> None:
         """Call the methods from class."""
+        trace = self._trace
+        start = time.perf_counter() if trace is not None else 0.0
+        execute_id = Trace.new_id() if trace is not None else None
+        request = self._request
+        if request is not None:
+            request.threads.add(threading.get_ident())
         try:
+            if self._token is not None:
+                self._token.raise_if_cancelled()
             module = self.load_module()
-            if not self._config.objects:
+            if trace is not None:
+                trace.add("import", start, time.perf_counter(), execute_id, pkg=self._config.pkg)
+            if not self._plan.steps:
                 return
-            self.load_methods(module, self._config.objects)
+            self.load_methods(module, self._plan.steps, execute_id)
         except Exception as e:
             self._result.success = False
             self._result.msg = f"{e!s}"
             raise e
+        finally:
+            if request is not None:
+                request.threads.discard(threading.get_ident())
+            if trace is not None:
+                trace.add("thread_queue", self._created, start, trace.parent_id)
+                trace.add("execute", start, time.perf_counter(), trace.parent_id, execute_id)
 
     def __call__(self) -> None:
         """Execute."""
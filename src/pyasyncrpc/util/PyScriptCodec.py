@@ -0,0 +1,132 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import array
+import io
+import struct
+import sys
+from typing import Any, ClassVar, FrozenSet, List, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+if sys.version_info < (3, 8):
+    import pickle5 as pickle
+else:
+    import pickle  # noqa: S403
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def load_array(typecode: str, buffer: memoryview) -> "array.array[Any]":
+    """Rebuild the array from its out-of-band buffer."""
+    values = array.array(typecode)
+    values.frombytes(buffer)
+    return values
+
+
+class OutOfBandArray:
+    """array pickled with its items in an out-of-band buffer."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: "array.array[Any]") -> None:
+        """Init."""
+        self.values = values
+
+    def __reduce_ex__(self, protocol: object) -> Any:  # noqa: ANN401
+        """Reduce to the type code and the buffer of the items."""
+        return load_array, (self.values.typecode, pickle.PickleBuffer(self.values))
+
+
+class PyScriptUnpickler(pickle.Unpickler):
+    """unpickler of the frames received from the network, only the globals rebuilding plain data are found."""
+
+    ALLOWED: ClassVar[FrozenSet[Tuple[str, str]]] = frozenset({
+        (load_array.__module__, load_array.__name__),
+        ("array", "array"),
+        ("array", "_array_reconstructor"),
+        *(("builtins", _) for _ in ("bytearray", "complex", "dict", "frozenset", "list", "set", "tuple")),
+        *(
+            (f"{package}.{module}", name)
+            for package in ("numpy.core", "numpy._core")
+            for module, name in (("multiarray", "_reconstruct"), ("multiarray", "scalar"), ("numeric", "_frombuffer"))
+        ),
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+    })
+
+    def find_class(self, module: str, name: str) -> Any:  # noqa: ANN401
+        """Find the allowed global."""
+        if (module, name) not in PyScriptUnpickler.ALLOWED:
+            msg = f"The global {module}.{name} is not allowed in a python script frame"
+            raise pickle.UnpicklingError(msg)
+        return super().find_class(module, name)
+
+
+class PyScriptCodec:
+    """binary encoding of the python script models with the buffers out of band.
+
+    The frame is the magic, the number of buffers, the size of the pickle and of every buffer, the pickle, and
+    the buffers. Bytes-like values and arrays from the minimum size, and NumPy arrays, are written once into the
+    frame; once decoded, the bytes-like values are read-only memoryviews over the frame. The decoding only finds
+    the globals rebuilding plain data, since the frames come from the network.
+    """
+
+    MAGIC: ClassVar[bytes] = b"PSC\x01"
+    HEADER: ClassVar[struct.Struct] = struct.Struct("<4sIQ")
+    SIZE: ClassVar[struct.Struct] = struct.Struct("<Q")
+
+    @staticmethod
+    def is_binary(data: Union[str, bytes, memoryview]) -> bool:
+        """Whether the data is a binary frame rather than JSON."""
+        return not isinstance(data, str) and bytes(data[:4]) == PyScriptCodec.MAGIC
+
+    @staticmethod
+    def dumps(model: BaseModel, min_buffer_size: int = 1024) -> bytes:
+        """Binary frame of the model."""
+        buffers: List[pickle.PickleBuffer] = []
+        data = pickle.dumps(PyScriptCodec.prepare(model, min_buffer_size), protocol=5, buffer_callback=buffers.append)
+        raws = [buffer.raw() for buffer in buffers]
+        header = PyScriptCodec.HEADER.pack(PyScriptCodec.MAGIC, len(raws), len(data))
+        sizes = [PyScriptCodec.SIZE.pack(raw.nbytes) for raw in raws]
+        return b"".join([header, *sizes, data, *raws])
+
+    @staticmethod
+    def loads(data: Union[bytes, memoryview], model: Type[T]) -> T:
+        """Model of the binary frame, the buffers are not copied."""
+        view = memoryview(data)
+        magic, count, size = PyScriptCodec.HEADER.unpack_from(view)
+        if magic != PyScriptCodec.MAGIC:
+            msg = "Not a binary python script frame"
+            raise ValueError(msg)
+        pos = PyScriptCodec.HEADER.size
+        sizes = [PyScriptCodec.SIZE.unpack_from(view, pos + _ * PyScriptCodec.SIZE.size)[0] for _ in range(count)]
+        pos += count * PyScriptCodec.SIZE.size
+        payload = view[pos : pos + size]
+        pos += size
+        buffers = []
+        for buffer_size in sizes:
+            buffers.append(view[pos : pos + buffer_size])
+            pos += buffer_size
+        return model.model_validate(PyScriptUnpickler(io.BytesIO(payload), buffers=buffers).load())
+
+    @staticmethod
+    def prepare(value: Any, min_buffer_size: int) -> Any:  # noqa: ANN401
+        """Mark the large bytes-like values and arrays of the containers to be written out of band."""
+        if isinstance(value, BaseModel):
+            return {name: PyScriptCodec.prepare(field, min_buffer_size) for name, field in value}
+        if isinstance(value, dict):
+            return {key: PyScriptCodec.prepare(item, min_buffer_size) for key, item in value.items()}
+        if isinstance(value, list):
+            return [PyScriptCodec.prepare(item, min_buffer_size) for item in value]
+        if isinstance(value, tuple):
+            return tuple(PyScriptCodec.prepare(item, min_buffer_size) for item in value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if memoryview(value).nbytes >= min_buffer_size:
+                return pickle.PickleBuffer(value)
+            return bytes(value) if isinstance(value, memoryview) else value
+        if isinstance(value, array.array) and len(value) * value.itemsize >= min_buffer_size:
+            return OutOfBandArray(value)
+        return value
@@ -0,0 +1,282 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import contextlib
+import functools
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Awaitable, Callable, ClassVar, List, Optional, Sequence, Set, Tuple, Union
+
+import anyio
+from typing_extensions import override
+
+from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptResult
+from pyasyncrpc.util.CancelToken import CancelToken
+from pyasyncrpc.util.PyScriptActuator import PyScriptActuator
+from pyasyncrpc.util.PyScriptPlan import PyScriptPlan, PyScriptPlanCache
+from pyasyncrpc.util.Tracer import Trace
+
+
+class PyScriptExecutor(ABC):
+    """execute python scripts outside the event loop."""
+
+    MAX_CONCURRENCY: ClassVar[int] = 64
+
+    @abstractmethod
+    async def execute(
+        self, config: Union[PyScriptConfig, PyScriptPlan], token: Optional[CancelToken] = None
+    ) -> PyScriptResult:
+        """Execute the python script and return its result, it stops once the token is cancelled."""
+
+    async def execute_many(
+        self,
+        configs: Sequence[Union[PyScriptConfig, PyScriptPlan]],
+        concurrency: Optional[int] = None,
+        token: Optional[CancelToken] = None,
+    ) -> List[PyScriptResult]:
+        """Execute the python scripts concurrently, a failed script does not abort the others."""
+        return await PyScriptExecutor.run_many(
+            [functools.partial(self.execute, config, token) for config in configs], concurrency
+        )
+
+    @staticmethod
+    async def run_many(
+        calls: Sequence[Callable[[], Awaitable[PyScriptResult]]], concurrency: Optional[int] = None
+    ) -> List[PyScriptResult]:
+        """Run the calls concurrently, the concurrency is capped by MAX_CONCURRENCY and a failure becomes a result."""
+        results = [PyScriptResult(success=False) for _ in calls]
+        limiter = anyio.CapacityLimiter(max(1, min(concurrency or len(calls), PyScriptExecutor.MAX_CONCURRENCY)))
+
+        async def run(index: int, call: Callable[[], Awaitable[PyScriptResult]]) -> None:
+            async with limiter:
+                try:
+                    results[index] = await call()
+                except Exception as e:  # noqa: BLE001
+                    results[index] = PyScriptResult(success=False, msg=f"{e!s}")
+
+        async with anyio.create_task_group() as tg:
+            for index, call in enumerate(calls):
+                tg.start_soon(run, index, call)
+        return results
+
+    async def start(self) -> None:  # noqa: B027
+        """Prepare the resources of the executor."""
+
+    async def close(self) -> None:  # noqa: B027
+        """Release the resources of the executor."""
+
+
+class ThreadPyScriptExecutor(PyScriptExecutor):
+    """execute python scripts in the anyio worker threads."""
+
+    @override
+    async def execute(
+        self, config: Union[PyScriptConfig, PyScriptPlan], token: Optional[CancelToken] = None
+    ) -> PyScriptResult:
+        if token is not None and token.cancelled:
+            return PyScriptResult(success=False, msg=token.reason)
+        actuator = PyScriptActuator(config, token)
+        with contextlib.suppress(Exception):
+            await anyio.to_thread.run_sync(actuator)
+        return actuator.result
+
+
+def get_rss() -> int:
+    """Resident set size of the current process in bytes, 0 if unknown."""
+    with contextlib.suppress(OSError, ValueError, IndexError), open("/proc/self/statm", encoding="utf-8") as f:  # noqa: PTH123
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    try:
+        import resource
+    except ImportError:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_worker(conn: Connection) -> None:
+    """Execute the received python scripts until the connection is closed."""
+    plans = PyScriptPlanCache()
+    while True:
+        try:
+            raw = conn.recv_bytes()
+        except (EOFError, OSError):
+            return
+        try:
+            actuator = PyScriptActuator(plans.get(raw))
+            with contextlib.suppress(Exception):
+                actuator()
+            result = actuator.result
+        except Exception as e:  # noqa: BLE001
+            result = PyScriptResult(success=False, msg=f"{e!s}")
+        try:
+            conn.send((result, get_rss()))
+        except Exception as e:  # noqa: BLE001
+            conn.send((PyScriptResult(success=False, msg=f"{e!s}"), get_rss()))
+
+
+class PyScriptWorker:
+    """a warm process executing python scripts."""
+
+    POLL_INTERVAL: ClassVar[float] = 0.05
+
+    def __init__(self, context: Any) -> None:  # noqa: ANN401
+        """Init."""
+        self._conn, child_conn = context.Pipe()
+        self._process: BaseProcess = context.Process(target=run_worker, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.rss = 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Process id of the worker."""
+        return self._process.pid
+
+    def call(self, raw: bytes, token: Optional[CancelToken] = None) -> PyScriptResult:
+        """Send the configuration to the worker and wait for the result, until the token is cancelled."""
+        self._conn.send_bytes(raw)
+        while token is not None:
+            remaining = token.remaining
+            if self._conn.poll(
+                PyScriptWorker.POLL_INTERVAL if remaining is None else min(remaining, PyScriptWorker.POLL_INTERVAL)
+            ):
+                break
+            if token.cancelled:
+                raise TimeoutError(token.reason)
+        result, self.rss = self._conn.recv()
+        self.tasks += 1
+        return result  # type: ignore[no-any-return]
+
+    def close(self, timeout: float = 1) -> None:
+        """Stop the worker, killed without waiting when the timeout is 0."""
+        self._conn.close()
+        if timeout:
+            self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+
+
+class ProcessPyScriptExecutor(PyScriptExecutor):
+    """execute python scripts in a pool of warm worker processes."""
+
+    CLOSE_TIMEOUT: ClassVar[float] = 5
+
+    def __init__(
+        self, size: Optional[int] = None, max_tasks_per_child: Optional[int] = None, max_rss: Optional[int] = None
+    ) -> None:
+        """Init."""
+        self._size = size or os.cpu_count() or 1
+        self._max_tasks_per_child = max_tasks_per_child
+        self._max_rss = max_rss
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._idle: List[PyScriptWorker] = []
+        self._workers: Set[PyScriptWorker] = set()
+        self._closed = False
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._semaphore: Optional[anyio.Semaphore] = None
+
+    @property
+    def size(self) -> int:
+        """Number of worker processes."""
+        return self._size
+
+    @override
+    async def start(self) -> None:
+        logging.info(f"process pool size:{self._size}")
+        self._limiter = anyio.CapacityLimiter(self._size)
+        self._semaphore = anyio.Semaphore(self._size)
+        self._closed = False
+        self._idle = [self.spawn() for _ in range(self._size)]
+
+    @override
+    async def execute(
+        self, config: Union[PyScriptConfig, PyScriptPlan], token: Optional[CancelToken] = None
+    ) -> PyScriptResult:
+        if self._semaphore is None:
+            msg = "The process pool must be started"
+            raise RuntimeError(msg)
+        if isinstance(config, PyScriptPlan):
+            raw = config.raw or config.config.model_dump_json().encode()
+        else:
+            raw = config.model_dump_json().encode()
+        trace = Trace.current.get()
+        start = time.perf_counter() if trace is not None else 0.0
+        async with self._semaphore:
+            if self._closed:
+                return PyScriptResult(success=False, msg="The process pool is closed")
+            if token is not None and token.cancelled:
+                return PyScriptResult(success=False, msg=token.reason)
+            worker = self._idle.pop()
+            acquired = time.perf_counter() if trace is not None else 0.0
+            try:
+                result, worker = await anyio.to_thread.run_sync(self.call, worker, raw, token, limiter=self._limiter)
+            finally:
+                self._idle.append(worker)
+                if trace is not None:
+                    trace.add("process_queue", start, acquired, trace.parent_id)
+                    trace.add("process", acquired, time.perf_counter(), trace.parent_id, pid=worker.pid)
+        return result
+
+    def call(
+        self, worker: PyScriptWorker, raw: bytes, token: Optional[CancelToken] = None
+    ) -> Tuple[PyScriptResult, PyScriptWorker]:
+        """Run the configuration on the worker, replacing the worker when it dies, is cancelled or recycled."""
+        try:
+            result = worker.call(raw, token)
+        except TimeoutError as e:
+            logging.warning(f"process pool worker {worker.pid} killed: {e!s}")
+            worker.close(0)
+            return PyScriptResult(success=False, msg=f"{e!s}"), self.renew(worker)
+        except (EOFError, OSError) as e:
+            logging.warning(f"process pool worker {worker.pid} died: {e!r}")
+            worker.close()
+            return PyScriptResult(success=False, msg="The worker process exited unexpectedly"), self.renew(worker)
+        if self._max_tasks_per_child and worker.tasks >= self._max_tasks_per_child:
+            logging.info(f"process pool worker {worker.pid} recycled after {worker.tasks} tasks")
+        elif self._max_rss and worker.rss > self._max_rss:
+            logging.info(f"process pool worker {worker.pid} recycled with rss {worker.rss}")
+        else:
+            return result, worker
+        worker.close()
+        return result, self.renew(worker)
+
+    def spawn(self) -> PyScriptWorker:
+        """Start a new worker process."""
+        worker = PyScriptWorker(self._context)
+        self._workers.add(worker)
+        return worker
+
+    def renew(self, worker: PyScriptWorker) -> PyScriptWorker:
+        """Replace the closed worker, it is kept once the pool is closed."""
+        self._workers.discard(worker)
+        return worker if self._closed else self.spawn()
+
+    @override
+    async def close(self) -> None:
+        self._closed = True
+        semaphore, acquired = self._semaphore, 0
+        if semaphore is None:
+            return
+        with anyio.move_on_after(ProcessPyScriptExecutor.CLOSE_TIMEOUT):
+            while acquired < self._size:
+                await semaphore.acquire()
+                acquired += 1
+        idle, self._idle = set(self._idle), []
+        workers, self._workers = self._workers, set()
+        for worker in workers:
+            if worker not in idle:
+                logging.warning(f"process pool worker {worker.pid} killed: busy at shutdown")
+            await anyio.to_thread.run_sync(worker.close, 1 if worker in idle else 0)
+        for _ in range(acquired):
+            semaphore.release()
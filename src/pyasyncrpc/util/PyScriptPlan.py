@@ -0,0 +1,130 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import importlib
+import sys
+import threading
+from types import ModuleType
+from typing import Any, Callable, Optional, OrderedDict, Union
+
+from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject
+from pyasyncrpc.util.PyScriptCodec import PyScriptCodec
+
+
+class PyScriptStep:
+    """a method or class call with a pre-decided calling convention."""
+
+    __slots__ = ("args", "call", "name", "steps", "target")
+
+    def __init__(self, info: PyScriptObject) -> None:
+        """Init."""
+        self.name = info.name
+        self.args = info.args
+        self.target: Optional[Callable[..., Any]] = None
+        self.steps = [PyScriptStep(_) for _ in info.methods] if info.methods else None
+        if not info.args:
+            self.call = self.call_without_args
+        elif info.transparent:
+            self.call = self.call_transparent
+        elif isinstance(info.args, list):
+            self.call = self.call_positional
+        else:
+            self.call = self.call_keyword
+
+    def call_without_args(self, func: Callable[..., Any]) -> object:
+        """Call without arguments."""
+        return func()
+
+    def call_transparent(self, func: Callable[..., Any]) -> object:
+        """Pass the arguments as a single value."""
+        return func(self.args)
+
+    def call_positional(self, func: Callable[..., Any]) -> object:
+        """Pass the arguments as positional arguments."""
+        return func(*self.args)  # type: ignore[misc]
+
+    def call_keyword(self, func: Callable[..., Any]) -> object:
+        """Pass the arguments as keyword arguments."""
+        return func(**self.args)  # type: ignore[arg-type]
+
+
+class PyScriptPlan:
+    """the compiled execution plan of a python script configuration."""
+
+    __slots__ = ("_module", "config", "raw", "steps")
+
+    def __init__(self, config: PyScriptConfig, raw: Optional[bytes] = None) -> None:
+        """Init."""
+        self.config = config
+        self.raw = raw
+        self.steps = [PyScriptStep(_) for _ in config.objects] if config.objects else []
+        self._module: Optional[ModuleType] = None
+
+    @property
+    def resolved(self) -> bool:
+        """Whether the module and the top-level callables are resolved and still current."""
+        module = self._module
+        if module is None or sys.modules.get(self.config.pkg) is not module:
+            return False
+        attrs = module.__dict__
+        return all(attrs.get(step.name) is step.target for step in self.steps)
+
+    def resolve(self) -> ModuleType:
+        """Import the module and resolve the top-level callables, again after the module is reloaded."""
+        if self.resolved:
+            return self._module  # type: ignore[return-value]
+        module = importlib.import_module(self.config.pkg)
+        for step in self.steps:
+            step.target = getattr(module, step.name)
+        self._module = module
+        return module
+
+
+class PyScriptPlanCache:
+    """bounded LRU cache of execution plans keyed by the raw configuration."""
+
+    def __init__(self, maxsize: int = 512) -> None:
+        """Init."""
+        self._maxsize = maxsize
+        self._plans: OrderedDict[bytes, PyScriptPlan] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Number of cached plans."""
+        return len(self._plans)
+
+    def get(self, raw: Union[str, bytes]) -> PyScriptPlan:
+        """Execution plan of the raw JSON configuration or binary frame."""
+        key = raw.encode() if isinstance(raw, str) else raw
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        if PyScriptCodec.is_binary(key):
+            config = PyScriptCodec.loads(key, PyScriptConfig)
+        else:
+            config = PyScriptConfig.model_validate_json(key)
+        plan = PyScriptPlan(config, key)
+        if self._maxsize <= 0:
+            return plan
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self._maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def invalidate(self, pkg: Optional[str] = None) -> None:
+        """Drop the plans of the package, or every plan."""
+        with self._lock:
+            if pkg is None:
+                self._plans.clear()
+                return
+            for key in [key for key, plan in self._plans.items() if plan.config.pkg == pkg]:
+                del self._plans[key]
@@ -0,0 +1,72 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import time
+from typing import Any, NamedTuple, Optional, OrderedDict
+
+
+class ReplyCacheEntry(NamedTuple):
+    """a cached reply."""
+
+    reply: bytes
+    ret: Any
+    expires: float
+
+
+class ReplyCache:
+    """LRU cache of serialized replies keyed by the serialized request."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int) -> None:
+        """Init."""
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[bytes, ReplyCacheEntry] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        """Number of cached replies."""
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[ReplyCacheEntry]:
+        """Cached reply of the request, None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires <= time.monotonic():
+            self.remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: bytes, reply: bytes, ret: Any) -> None:  # noqa: ANN401
+        """Cache the reply of the request."""
+        size = len(key) + len(reply)
+        if size > self._max_bytes:
+            return
+        self.remove(key)
+        self._entries[key] = ReplyCacheEntry(reply, ret, time.monotonic() + self._ttl)
+        self.size += size
+        while len(self._entries) > self._max_entries or self.size > self._max_bytes:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self.size -= len(old_key) + len(old_entry.reply)
+            self.evictions += 1
+
+    def remove(self, key: bytes) -> None:
+        """Remove the cached reply of the request."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry.reply)
+
+    def clear(self) -> None:
+        """Remove every cached reply."""
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,68 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+
+class ReplyConverter:
+    """convert the results of the methods into reply messages."""
+
+    SCALARS: ClassVar[Tuple[type, ...]] = (str, int, float, bool, bytes)
+
+    def __init__(self, reply_func: type) -> None:
+        """Init."""
+        self._reply_func = reply_func
+        self._converters: Dict[type, Callable[[Any], object]] = {}
+
+    def __call__(self, ret: Any) -> object:  # noqa: ANN401
+        """Reply message of the result."""
+        if isinstance(ret, self._reply_func):
+            return ret
+        converter = self._converters.get(type(ret))
+        if converter is None:
+            converter = self.prepare(type(ret))
+        return converter(ret)
+
+    def prepare(self, model: type) -> Callable[[Any], object]:
+        """Compute the field-to-message mapping of the model once."""
+        converter = self._converters.get(model)
+        if converter is not None:
+            return converter
+        mapping = self.get_mapping(model)
+        reply_func = self._reply_func
+        if mapping is None:
+
+            def converter(ret: BaseModel) -> object:
+                return reply_func(**ret.model_dump(by_alias=True))
+
+        else:
+
+            def converter(ret: BaseModel) -> object:
+                return reply_func(**{key: getattr(ret, name) for name, key in mapping})
+
+        self._converters[model] = converter
+        return converter
+
+    @staticmethod
+    def get_mapping(model: type) -> Optional[List[Tuple[str, str]]]:
+        """Pairs of attribute and message field, None when the model needs a full dump."""
+        if not isinstance(model, type) or not issubclass(model, BaseModel):
+            msg = f"Unsupported reply type:{model}"
+            raise TypeError(msg)
+        decorators = model.__pydantic_decorators__
+        if model.model_config.get("extra") == "allow" or decorators.field_serializers or decorators.model_serializers:
+            return None
+        mapping: List[Tuple[str, str]] = []
+        for name, field in model.model_fields.items():
+            if field.exclude or field.annotation not in ReplyConverter.SCALARS:
+                return None
+            mapping.append((name, field.serialization_alias or field.alias or name))
+        for name, decorator in decorators.computed_fields.items():
+            if decorator.info.return_type not in ReplyConverter.SCALARS:
+                return None
+            mapping.append((name, decorator.info.alias or name))
+        return mapping
@@ -0,0 +1,57 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Counter, Optional
+
+
+class SamplingProfiler:
+    """sample the stacks of every thread at an interval, collapsed for flame graphs.
+
+    Every line of the output is the thread name and the frames from the outermost one separated by semicolons,
+    followed by the number of samples.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Init."""
+        if interval <= 0:
+            msg = "interval must be positive"
+            raise RuntimeError(msg)
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def collapse(frame: Optional[FrameType]) -> str:
+        """Frames of the stack from the outermost one, separated by semicolons."""
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")  # noqa: PTH119
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    def profile(self, duration: float) -> str:
+        """Sample the other threads for the duration in seconds, one profile at a time."""
+        if not self._lock.acquire(blocking=False):
+            msg = "A profile is already running"
+            raise RuntimeError(msg)
+        try:
+            counts: Counter[str] = collections.Counter()
+            me = threading.get_ident()
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident != me:
+                        counts[f"{names.get(ident, ident)};{SamplingProfiler.collapse(frame)}"] += 1
+                time.sleep(self.interval)
+        finally:
+            self._lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
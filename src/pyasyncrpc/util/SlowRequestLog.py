@@ -0,0 +1,106 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import contextlib
+import contextvars
+import logging
+import sys
+import time
+import traceback
+from typing import Any, ClassVar, Deque, Dict, List, Optional, Set
+
+import anyio
+
+
+class SlowRequest:
+    """a request in flight and the threads running its python scripts."""
+
+    __slots__ = ("method", "reported", "request_id", "start", "threads", "token")
+
+    current: ClassVar["contextvars.ContextVar[Optional[SlowRequest]]"] = contextvars.ContextVar(
+        "pyasyncrpc_slow_request", default=None
+    )
+
+    def __init__(self, method: str) -> None:
+        """Init."""
+        self.method = method
+        self.request_id: Optional[int] = None
+        self.start = time.perf_counter()
+        self.threads: Set[int] = set()
+        self.reported = False
+        self.token: Optional[contextvars.Token[Optional[SlowRequest]]] = None
+
+
+class SlowRequestLog:
+    """log the stacks of the threads running the python scripts of the requests slower than the threshold."""
+
+    def __init__(self, threshold: float = 1, interval: Optional[float] = None, history: int = 100) -> None:
+        """Init, the requests are checked every interval, a quarter of the threshold by default."""
+        if threshold <= 0:
+            msg = "threshold must be positive"
+            raise RuntimeError(msg)
+        self.threshold = threshold
+        self.interval = interval or threshold / 4
+        self._requests: Set[SlowRequest] = set()
+        self._records: Deque[Dict[str, Any]] = collections.deque(maxlen=history)
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """The latest slow requests, oldest first."""
+        return list(self._records)
+
+    def start(self, method: str) -> SlowRequest:
+        """Watch the request, it is current until it is finished."""
+        request = SlowRequest(method)
+        request.token = SlowRequest.current.set(request)
+        self._requests.add(request)
+        return request
+
+    def finish(self, request: SlowRequest) -> None:
+        """Stop watching the request."""
+        self._requests.discard(request)
+        if request.token is not None:
+            with contextlib.suppress(ValueError):
+                SlowRequest.current.reset(request.token)
+        if request.reported:
+            elapsed = time.perf_counter() - request.start
+            logging.warning(f"slow request {request.method}:{request.request_id} finished in {elapsed:.3f}s")
+
+    def check(self) -> List[Dict[str, Any]]:
+        """Record the stacks of the requests that have just passed the threshold."""
+        now = time.perf_counter()
+        slow = [_ for _ in self._requests if not _.reported and now - _.start >= self.threshold]
+        if not slow:
+            return []
+        frames = sys._current_frames()
+        records = []
+        for request in slow:
+            request.reported = True
+            stacks = {
+                str(ident): "".join(traceback.format_stack(frames[ident]))
+                for ident in tuple(request.threads)
+                if ident in frames
+            }
+            record = {
+                "method": request.method,
+                "request_id": request.request_id,
+                "elapsed": now - request.start,
+                "stacks": stacks,
+            }
+            self._records.append(record)
+            records.append(record)
+            details = "".join(f"\nthread {ident}:\n{stack}" for ident, stack in stacks.items())
+            logging.warning(
+                f"slow request {request.method}:{request.request_id} over {self.threshold}s"
+                f"{details or ', no python script running'}"
+            )
+        return records
+
+    async def run(self) -> None:
+        """Check the requests every interval."""
+        while True:
+            await anyio.sleep(self.interval)
+            self.check()
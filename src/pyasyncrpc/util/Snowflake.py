@@ -3,36 +3,88 @@
 Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
+import os
+import threading
 import time
+from typing import ClassVar, List, Optional, Tuple
 
 
 class Snowflake:
     """snowflake algorithm."""
 
-    def __init__(self, worker_id: int, data_center_id: int) -> None:
+    EPOCH: ClassVar[int] = 1288834974657
+    MAX_ID: ClassVar[int] = 31
+    MAX_SEQUENCE: ClassVar[int] = 4095
+    WORKER_ID_ENV: ClassVar[str] = "PYASYNCRPC_WORKER_ID"
+    DATA_CENTER_ID_ENV: ClassVar[str] = "PYASYNCRPC_DATA_CENTER_ID"
+
+    def __init__(self, worker_id: int, data_center_id: int, max_backward: int = 10) -> None:
         """Init."""
+        for name, value in (("worker_id", worker_id), ("data_center_id", data_center_id)):
+            if not 0 <= value <= Snowflake.MAX_ID:
+                msg = f"{name} must be between 0 and {Snowflake.MAX_ID}"
+                raise ValueError(msg)
         self.worker_id = worker_id
         self.data_center_id = data_center_id
-        self.sequence = 0
+        self.max_backward = max_backward
+        self.sequence = Snowflake.MAX_SEQUENCE
         self.last_timestamp = -1
+        self._node = (data_center_id << 17) | (worker_id << 12)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(
+        cls, worker_id: Optional[int] = None, data_center_id: Optional[int] = None, index: int = 0
+    ) -> "Snowflake":
+        """Create the generator from the configuration, the environment, then the process index."""
+        if worker_id is None:
+            worker_id = int(os.environ.get(Snowflake.WORKER_ID_ENV, 1))
+        if data_center_id is None:
+            data_center_id = int(os.environ.get(Snowflake.DATA_CENTER_ID_ENV, 1))
+        return cls((worker_id + index) & Snowflake.MAX_ID, data_center_id)
 
     def next_id(self) -> int:
         """Get a unique ID."""
+        with self._lock:
+            timestamp, sequence, _ = self.reserve(1)
+        return ((timestamp - Snowflake.EPOCH) << 22) | self._node | sequence
+
+    def next_ids(self, count: int) -> List[int]:
+        """Get a block of unique IDs."""
+        ret: List[int] = []
+        with self._lock:
+            while len(ret) < count:
+                timestamp, sequence, size = self.reserve(count - len(ret))
+                prefix = ((timestamp - Snowflake.EPOCH) << 22) | self._node
+                ret.extend(prefix | _ for _ in range(sequence, sequence + size))
+        return ret
+
+    def reserve(self, count: int) -> Tuple[int, int, int]:
+        """Reserve sequence numbers, returns the timestamp, the first sequence and the number reserved."""
         timestamp = int(time.time() * 1000)
         if timestamp < self.last_timestamp:
-            raise RuntimeError(
-                "Clock moved backwards. Refusing to generate id for %d milliseconds"
-                % abs(timestamp - self.last_timestamp)
-            )
+            backward = self.last_timestamp - timestamp
+            if backward > self.max_backward:
+                msg = f"Clock moved backwards. Refusing to generate id for {backward} milliseconds"
+                raise RuntimeError(msg)
+            timestamp = self.last_timestamp
         if timestamp == self.last_timestamp:
-            self.sequence = (self.sequence + 1) & 4095
-            if self.sequence == 0:
-                timestamp = int(time.time() * 1000)
-                while timestamp <= self.last_timestamp:
-                    timestamp = int(time.time() * 1000)
+            sequence = self.sequence + 1
+            if sequence > Snowflake.MAX_SEQUENCE:
+                timestamp = self.wait_next_millis(self.last_timestamp)
+                sequence = 0
         else:
-            self.sequence = 0
+            sequence = 0
+        size = min(count, Snowflake.MAX_SEQUENCE + 1 - sequence)
+        self.sequence = sequence + size - 1
         self.last_timestamp = timestamp
-        return (
-            ((timestamp - 1288834974657) << 22) | (self.data_center_id << 17) | (self.worker_id << 12) | self.sequence
-        )
+        return timestamp, sequence, size
+
+    @staticmethod
+    def wait_next_millis(last_timestamp: int) -> int:
+        """Sleep until the millisecond after the last timestamp."""
+        while True:
+            now = time.time() * 1000
+            if now >= last_timestamp + 1:
+                return int(now)
+            time.sleep((last_timestamp + 1 - now) / 1000)
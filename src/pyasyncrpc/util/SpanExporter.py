@@ -0,0 +1,54 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, ClassVar, Deque, Dict, List, Union
+
+from typing_extensions import override
+
+
+class SpanExporter(ABC):
+    """export the finished spans in batches."""
+
+    blocking: ClassVar[bool] = False
+
+    @abstractmethod
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        """Export the batch of spans."""
+
+
+class RingBufferSpanExporter(SpanExporter):
+    """keep the latest spans in memory."""
+
+    def __init__(self, size: int = 10000) -> None:
+        """Init."""
+        self._spans: Deque[Dict[str, Any]] = collections.deque(maxlen=size)
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        """The latest spans, oldest first."""
+        return list(self._spans)
+
+    @override
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        self._spans.extend(spans)
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """append the spans to a JSON lines file."""
+
+    blocking = True
+
+    def __init__(self, file: Union[str, Path]) -> None:
+        """Init."""
+        self._file = Path(file)
+
+    @override
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with self._file.open("a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span, separators=(",", ":")) + "\n" for span in spans)
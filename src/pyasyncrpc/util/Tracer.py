@@ -0,0 +1,169 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import collections
+import contextvars
+import random
+import time
+from typing import Any, ClassVar, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import anyio
+
+from pyasyncrpc.util.SpanExporter import SpanExporter
+
+
+class Span(NamedTuple):
+    """a finished span, times from time.perf_counter."""
+
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    end: float
+    attributes: Dict[str, Any]
+
+
+class Trace:
+    """the spans of a sampled request."""
+
+    __slots__ = ("_perf", "_wall", "parent_id", "remote_parent_id", "request_id", "root_id", "spans", "trace_id")
+
+    current: ClassVar["contextvars.ContextVar[Optional[Trace]]"] = contextvars.ContextVar(
+        "pyasyncrpc_trace", default=None
+    )
+
+    def __init__(self, trace_id: str, remote_parent_id: Optional[str] = None) -> None:
+        """Init, the spans of the handler are children of the parent span."""
+        self.trace_id = trace_id
+        self.remote_parent_id = remote_parent_id
+        self.root_id = Trace.new_id()
+        self.parent_id = self.root_id
+        self.request_id: Optional[int] = None
+        self.spans: List[Span] = []
+        self._wall = time.time_ns()
+        self._perf = time.perf_counter()
+
+    @staticmethod
+    def new_id() -> str:
+        """Random span id."""
+        return f"{random.getrandbits(64):016x}"
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context of the root span."""
+        return f"00-{self.trace_id}-{self.root_id}-01"
+
+    def add(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        parent_id: Optional[str],
+        span_id: Optional[str] = None,
+        **attributes: Any,
+    ) -> str:
+        """Record the finished span, thread-safe."""
+        span_id = span_id or Trace.new_id()
+        self.spans.append(Span(span_id, parent_id, name, start, end, attributes))
+        return span_id
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """The spans with the trace context and wall-clock times in nanoseconds."""
+        base = self._wall - int(self._perf * 1e9)
+        return [
+            {
+                "trace_id": self.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "start_time_unix_nano": base + int(span.start * 1e9),
+                "end_time_unix_nano": base + int(span.end * 1e9),
+                "attributes": {"request_id": self.request_id, **span.attributes},
+            }
+            for span in self.spans
+        ]
+
+
+class Tracer:
+    """sample the requests, following the incoming trace context, and export their spans in batches."""
+
+    TRACEPARENT: ClassVar[str] = "traceparent"
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        sample_rate: float = 0.0,
+        parent_based: bool = True,  # noqa: FBT001, FBT002
+        batch_size: int = 512,
+        flush_interval: float = 1,
+        max_pending: int = 65536,
+    ) -> None:
+        """Init."""
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.parent_based = parent_based
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: Deque[Dict[str, Any]] = collections.deque()
+
+    def start(self, context: Any) -> Optional[Trace]:  # noqa: ANN401
+        """Trace of the sampled request, None when it is not sampled."""
+        if self.parent_based and context is not None:
+            for key, value in context.invocation_metadata() or ():
+                if key == Tracer.TRACEPARENT:
+                    parent = Tracer.parse_traceparent(value)
+                    if parent is not None:
+                        trace_id, parent_id, sampled = parent
+                        return Trace(trace_id, parent_id) if sampled else None
+        if not self.sample_rate or random.random() >= self.sample_rate:  # noqa: S311
+            return None
+        return Trace(f"{random.getrandbits(128):032x}")
+
+    @staticmethod
+    def parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+        """Trace id, parent span id and sampled flag of the W3C traceparent header."""
+        parts = value.strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+            return None
+        try:
+            flags = int(parts[3], 16)
+            if not int(parts[1], 16) or not int(parts[2], 16):
+                return None
+        except ValueError:
+            return None
+        return parts[1], parts[2], bool(flags & 1)
+
+    def finish(self, trace: Trace) -> None:
+        """Queue the spans of the trace for the next batch."""
+        if len(self._pending) + len(trace.spans) > self.max_pending:
+            self.dropped += len(trace.spans)
+            return
+        self._pending.extend(trace.to_dicts())
+        if len(self._pending) >= self.batch_size and not self.exporter.blocking:
+            self.exporter.export(self.take())
+
+    def take(self) -> List[Dict[str, Any]]:
+        """Remove the pending spans."""
+        batch = list(self._pending)
+        self._pending.clear()
+        return batch
+
+    async def flush(self) -> None:
+        """Export the pending spans, in a worker thread when the exporter blocks."""
+        batch = self.take()
+        if not batch:
+            return
+        if self.exporter.blocking:
+            await anyio.to_thread.run_sync(self.exporter.export, batch)
+        else:
+            self.exporter.export(batch)
+
+    async def run(self) -> None:
+        """Export the pending spans every flush interval."""
+        while True:
+            await anyio.sleep(self.flush_interval)
+            await self.flush()
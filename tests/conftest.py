@@ -11,7 +11,7 @@ import pytest
 from faker import Faker
 from grpc import _channel
 from pyasyncrpc.log.LoguruLog import LoguruLog
-from pyasyncrpc.model.GRPCConfig import GRPCInfo, GRPCMethodInfo
+from pyasyncrpc.model.GRPCConfig import GRPCInfo, GRPCMethodInfo, PyScriptPoolInfo
 from pyasyncrpc.service.GRPCService import GRPCService
 
 
@@ -32,6 +32,8 @@ async def grpc_addr() -> AsyncGenerator[str, Any]:
     """Grpc addr."""
     ip = "localhost"
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         sock.bind((ip, 0))
         yield f"{ip}:{sock.getsockname()[1]}"
 
@@ -48,6 +50,8 @@ async def grpc_server(grpc_addr: str) -> AsyncGenerator[GRPCService, Any]:
         pd2_pkg="rpc.simple_pb2",
         pd2_grpc_pkg="rpc.simple_pb2_grpc",
         listen_addr=grpc_addr,
+        process_pool=PyScriptPoolInfo(size=2, max_tasks_per_child=10),
+        admin=True,
     )
     methods_info = [
         GRPCMethodInfo(
@@ -60,6 +64,22 @@ async def grpc_server(grpc_addr: str) -> AsyncGenerator[GRPCService, Any]:
             pkg="rpc",
             method_name="execute_py_script",
         ),
+        GRPCMethodInfo(
+            grpc_method_name="executePyScriptBatch",
+            pkg="rpc",
+            method_name="execute_py_script_batch",
+        ),
+        GRPCMethodInfo(
+            grpc_method_name="streamPyScript",
+            pkg="rpc",
+            method_name="stream_py_script",
+        ),
+        GRPCMethodInfo(
+            grpc_method_name="chat",
+            pkg="rpc",
+            method_name="chat",
+            request_streaming=True,
+        ),
     ]
     async with GRPCService(info, methods_info, LoguruLog()) as server:
         await server.start()
@@ -1,10 +1,10 @@
 import logging
-from weakref import proxy
+from typing import AsyncGenerator
 
 import anyio
-from pyasyncrpc.model.PyScriptConfig import PyScriptConfig
+from pyasyncrpc.model.PyScriptConfig import PyScriptBatch, PyScriptBatchResult
 from pyasyncrpc.model.RequestContext import RequestContext
-from pyasyncrpc.util.PyScriptActuator import PyScriptActuator
+from pyasyncrpc.util.PyScriptCodec import PyScriptCodec
 from pydantic import BaseModel
 
 
@@ -19,6 +19,7 @@ class Data(BaseModel):
 
     message: str
     status: int
+    data: bytes = b""
 
 
 async def say_hello(ctx: RequestContext) -> Data:
@@ -31,12 +32,41 @@ async def say_hello(ctx: RequestContext) -> Data:
 
 
 async def execute_py_script(ctx: RequestContext) -> Data:
-    """Execute python script."""
+    """Execute python script, the binary request data is replied in binary."""
     logging.info(ctx.request_id)
+    if ctx.request.data:
+        plan = ctx.get_plan(ctx.request.data)
+        result = await ctx.get_executor(plan.config.executor).execute(plan, ctx.get_cancel_token())
+        return Data(message="", status=200, data=PyScriptCodec.dumps(result))
     arg = Arg(name=ctx.request.name)
-    config = PyScriptConfig.model_validate_json(arg.name)
-    actuator = PyScriptActuator(config)
-    await anyio.to_thread.run_sync(proxy(actuator))
-    msg = f"Execute python script:{actuator.result}"
-    logging.info(msg)
-    return Data(message=msg, status=200)
+    plan = ctx.get_plan(arg.name)
+    result = await ctx.get_executor(plan.config.executor).execute(plan, ctx.get_cancel_token())
+    logging.info(f"Execute python script:{result}")
+    return Data(message=result.model_dump_json(), status=200)
+
+
+async def execute_py_script_batch(ctx: RequestContext) -> Data:
+    """Execute python scripts in one call."""
+    arg = Arg(name=ctx.request.name)
+    batch = PyScriptBatch.model_validate_json(arg.name)
+    results = await ctx.execute_many(batch.configs, batch.concurrency)
+    logging.info(f"Execute {len(results)} python scripts")
+    return Data(message=PyScriptBatchResult(results=results).model_dump_json(), status=200)
+
+
+async def stream_py_script(ctx: RequestContext) -> AsyncGenerator[Data, None]:
+    """Execute python script and stream every response entry."""
+    arg = Arg(name=ctx.request.name)
+    plan = ctx.get_plan(arg.name)
+    result = await ctx.get_executor(plan.config.executor).execute(plan, ctx.get_cancel_token())
+    for name, value in result.response.items():
+        yield Data(message=f"{name}:{value}", status=200)
+    if not result.success:
+        yield Data(message=f"{result.msg}", status=500)
+
+
+async def chat(ctx: RequestContext) -> AsyncGenerator[Data, None]:
+    """Reply to every request of the stream."""
+    async for request in ctx.request:
+        arg = Arg(name=request.name)
+        yield Data(message=f"{ctx.request_id}[echo: {arg.name}]", status=200)
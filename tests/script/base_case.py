@@ -4,6 +4,8 @@ Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
 import time
+from array import array
+from typing import Any
 
 from script.common import TEST_RESULT_SUCCESS
 
@@ -21,6 +23,11 @@ def run() -> str:
     return TEST_RESULT_SUCCESS
 
 
+def echo(word: str) -> str:
+    """Function with a parameter."""
+    return word
+
+
 class ArgClass:
     """the classe with initialization parameters."""
 
@@ -32,3 +39,8 @@ class ArgClass:
         """The method with parameters."""
         time.sleep(min(len(word) / 10, 0.5))
         return f"{word}-{self._name}"
+
+
+def scale(values: "array[Any]", factor: float) -> "array[Any]":
+    """Function with buffer arguments and result."""
+    return array(values.typecode, (_ * factor for _ in values))
@@ -0,0 +1,19 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+from pyasyncrpc.model.RequestContext import FastRequestContext
+from pydantic import BaseModel
+
+
+class LazyData(BaseModel):
+    """reply data of the lazy method."""
+
+    message: str
+    status: int
+
+
+async def run_script(ctx: FastRequestContext) -> LazyData:
+    """Method imported on the first call."""
+    return LazyData(message=ctx.request.name, status=200)
@@ -0,0 +1,11 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+from script.common import TEST_RESULT_SUCCESS
+
+
+def run() -> str:
+    """Function of the package preloaded by the warm-up."""
+    return TEST_RESULT_SUCCESS
@@ -0,0 +1,112 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import socket
+from array import array
+from typing import Any, List, Optional
+
+import anyio
+import pytest
+from pyasyncrpc.client.GRPCClient import GRPCClient
+from pyasyncrpc.client.RetryBudget import RetryBudget
+from pyasyncrpc.model.GRPCClientConfig import GRPCClientInfo
+from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject
+from pyasyncrpc.service.GRPCService import GRPCService
+from script.common import TEST_RESULT_SUCCESS
+
+
+@pytest.mark.anyio
+async def test_client(grpc_server: GRPCService) -> None:
+    """Calls are spread over the pooled channels and the python script helpers decode the results."""
+    async with GRPCClient(grpc_server.config.info, GRPCClientInfo(channels=3)) as client:
+        replies = [await client.call("sayHello", client.create_request(str(_))) for _ in range(3)]
+        assert [reply.status for reply in replies] == [200] * 3
+        assert len(client.pool.channels) == 3
+        assert len({id(_.channel) for _ in client.pool.channels}) == 3
+        config = PyScriptConfig(pkg="script.base_case", objects=[PyScriptObject(name="run")])
+        result = await client.execute_py_script(config)
+        assert result.response.get("run") == TEST_RESULT_SUCCESS
+        results = await client.execute_py_script_batch([config, PyScriptConfig(pkg="script.not_found")])
+        assert [_.success for _ in results] == [True, False]
+        replies = [
+            reply async for reply in client.stream("streamPyScript", client.create_request(config.model_dump_json()))
+        ]
+        assert [reply.message for reply in replies] == ["run:success"]
+
+    values = array("d", range(1000))
+    config = PyScriptConfig(pkg="script.base_case", objects=[PyScriptObject(name="scale", args=[values, 2])])
+    async with GRPCClient(grpc_server.config.info, GRPCClientInfo(encoding="binary")) as client:
+        result = await client.execute_py_script(config)
+        assert result.response.get("scale") == array("d", range(0, 2000, 2))
+        config.objects = [PyScriptObject(name="run")]
+        config.executor = "process"
+        result = await client.execute_py_script(config)
+        assert result.response.get("run") == TEST_RESULT_SUCCESS
+
+
+@pytest.mark.anyio
+async def test_client_retry(grpc_server: GRPCService) -> None:
+    """Unavailable endpoints are retried on the next channel within the budget."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        dead = f"127.0.0.1:{sock.getsockname()[1]}"
+    client_info = GRPCClientInfo(endpoints=[dead, grpc_server.config.info.listen_addr], channels=1, timeout=5)
+    async with GRPCClient(grpc_server.config.info, client_info) as client:
+        for _ in range(4):
+            reply = await client.call("sayHello", client.create_request("retry"))
+            assert reply.status == 200
+        assert client.budget.tokens < client_info.retry_budget.min_tokens
+
+    budget = RetryBudget(ratio=0.5, min_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.exhausted == 1
+
+
+class SlowStub:
+    """stub replying after the delay."""
+
+    def __init__(self, delay: float, calls: List[str], error: Optional[Exception] = None) -> None:
+        """Init, the error is raised instead of replying."""
+        self.delay = delay
+        self.calls = calls
+        self.error = error
+
+    async def sayHello(self, request: Any, timeout: Any = None) -> str:  # noqa: ANN401, ARG002, ASYNC109, N802
+        """Reply after the delay."""
+        self.calls.append(f"{self.delay}")
+        await anyio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"{self.delay}"
+
+
+@pytest.mark.anyio
+async def test_client_hedge(grpc_server: GRPCService) -> None:
+    """A slow call is hedged on another channel and the first reply wins."""
+    client_info = GRPCClientInfo(channels=2, hedge_delay=0.05)
+    async with GRPCClient(grpc_server.config.info, client_info) as client:
+        calls: List[str] = []
+        client.pool.channels[0].stub = SlowStub(5, calls)
+        client.pool.channels[1].stub = SlowStub(0, calls)
+        with anyio.fail_after(1):
+            assert await client.call("sayHello", None) == "0"
+        assert calls == ["5", "0"]
+        assert all(_.in_flight == 0 for _ in client.pool.channels)
+
+    async with GRPCClient(grpc_server.config.info, client_info) as client:
+        calls = []
+        client.pool.channels[0].stub = SlowStub(0.2, calls)
+        client.pool.channels[1].stub = SlowStub(0, calls, RuntimeError("hedge failed"))
+        with anyio.fail_after(1):
+            assert await client.call("sayHello", None) == "0.2"
+        client.pool.channels[0].stub = SlowStub(0.2, calls, RuntimeError("failed"))
+        client.pool.channels[1].stub = SlowStub(0.2, calls, RuntimeError("failed"))
+        with anyio.fail_after(1), pytest.raises(RuntimeError, match="failed"):
+            await client.call("sayHello", None)
+        assert all(_.in_flight == 0 for _ in client.pool.channels)
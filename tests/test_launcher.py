@@ -0,0 +1,194 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import contextlib
+import importlib
+import importlib.util
+import json
+import os
+import re
+import signal
+import socket
+import sys
+from pathlib import Path
+from typing import Any, AsyncGenerator, List
+
+import anyio
+import grpc
+import pytest
+from faker import Faker
+from pyasyncrpc.launcher.HotReload import HotReload
+from pyasyncrpc.launcher.Launcher import Launcher
+from pyasyncrpc.launcher.LauncherFactory import LauncherFactory
+
+TESTS_PATH = Path(__file__).parent
+
+
+@pytest.fixture(scope="module")
+async def worker_addr(grpc_addr: str) -> AsyncGenerator[str, Any]:
+    """Service address served by several worker processes."""
+    methods = [
+        {"grpc_method_name": "sayHello", "pkg": "rpc", "method_name": "say_hello"},
+        {"grpc_method_name": "executePyScript", "pkg": "rpc", "method_name": "execute_py_script"},
+        {"grpc_method_name": "executePyScriptBatch", "pkg": "rpc", "method_name": "execute_py_script_batch"},
+        {"grpc_method_name": "streamPyScript", "pkg": "rpc", "method_name": "stream_py_script"},
+        {"grpc_method_name": "chat", "pkg": "rpc", "method_name": "chat", "request_streaming": True},
+    ]
+    args = [
+        *("--service_name", "Simple"),
+        *("--handle_func_name", "add_ServiceServicer_to_server"),
+        *("--server_stub_name", "ServiceStub"),
+        *("--request_func_name", "ServiceRequest"),
+        *("--reply_func_name", "ServiceReply"),
+        *("--pd2_pkg", "rpc.simple_pb2"),
+        *("--pd2_grpc_pkg", "rpc.simple_pb2_grpc"),
+        *("--listen_addr", grpc_addr.replace("localhost", "127.0.0.1")),
+        *("--workers", "2"),
+        *(arg for method in methods for arg in ("--method", json.dumps(method))),
+    ]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(TESTS_PATH.parent / "src"), str(TESTS_PATH)])}
+    async with await anyio.open_process([sys.executable, "-m", "pyasyncrpc", *args], env=env) as process:
+        try:
+            yield grpc_addr.replace("localhost", "127.0.0.1")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            with anyio.fail_after(30):
+                assert await process.wait() == 0
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fork is not available")
+@pytest.mark.anyio
+async def test_workers(worker_addr: str, faker: Faker) -> None:
+    """Requests are spread over workers with distinct snowflake worker ids."""
+    request_func = importlib.import_module("rpc.simple_pb2").ServiceRequest
+    server_stub = importlib.import_module("rpc.simple_pb2_grpc").ServiceStub
+    worker_ids: List[int] = []
+    for _ in range(20):
+        async with grpc.aio.insecure_channel(worker_addr) as channel:
+            with anyio.fail_after(30):
+                await channel.channel_ready()
+            ret = await server_stub(channel).sayHello(request_func(name=faker.name()), wait_for_ready=True)
+            request_id = int(re.match(r"\d+", ret.message).group())  # type: ignore[union-attr]
+            worker_ids.append((request_id >> 12) & 31)
+    assert set(worker_ids) <= {1, 2}
+    assert len(set(worker_ids)) == 2
+
+
+def test_launcher_factory(grpc_server: Any) -> None:  # noqa: ANN401
+    """Only the launcher of the platform is imported."""
+    launcher = LauncherFactory.create_launcher(grpc_server, backend="uvloop")
+    assert type(launcher).__name__ == f"{LauncherFactory.PLATFORM}Launcher"
+    assert launcher.service is grpc_server
+    assert launcher.backend == "uvloop"
+    others = set(LauncherFactory.LAUNCHERS) - {LauncherFactory.PLATFORM, "Linux"}
+    assert all(f"pyasyncrpc.launcher.{_}Launcher" not in sys.modules for _ in others)
+
+
+def test_launcher_factory_without_reload_signals(grpc_server: Any, monkeypatch: pytest.MonkeyPatch) -> None:  # noqa: ANN401
+    """The launchers import on the platforms without the reload signals, like windows."""
+    for name in HotReload.SIGNAL_NAMES:
+        monkeypatch.delattr(signal, name)
+    for name in [_ for _ in sys.modules if _.startswith("pyasyncrpc.launcher.")]:
+        monkeypatch.delitem(sys.modules, name)
+    factory = importlib.import_module("pyasyncrpc.launcher.LauncherFactory").LauncherFactory
+    launcher = factory.create_launcher(grpc_server, hot_reload=True)
+    assert launcher.reload_signals == ()
+    assert type(factory.create_launcher(grpc_server, 2)).__name__ == "MultiProcessLauncher"
+
+
+def test_backend(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Unavailable backends fall back to asyncio."""
+    assert Launcher.resolve_backend("asyncio") == ("asyncio", {})
+    assert Launcher.resolve_backend("trio") == ("asyncio", {})
+    monkeypatch.setattr(importlib.util, "find_spec", lambda _: None)
+    assert Launcher.resolve_backend("uvloop") == ("asyncio", {})
+    monkeypatch.setattr(importlib.util, "find_spec", lambda _: object())
+    assert Launcher.resolve_backend("uvloop") == ("asyncio", {"use_uvloop": True})
+    with pytest.raises(RuntimeError):
+        Launcher.resolve_backend("curio")
+
+
+def test_reload_env(grpc_server: Any) -> None:  # noqa: ANN401
+    """The new processes get the next snowflake worker ids, a configured worker id refuses the reload."""
+    service = type(grpc_server)(grpc_server.config.info.model_copy(update={"worker_id": None}))
+    worker_id = service.reload_env(2)["PYASYNCRPC_WORKER_ID"]
+    assert int(worker_id) == (int(os.environ.get("PYASYNCRPC_WORKER_ID", 1)) + 2) & 31
+    service = type(grpc_server)(grpc_server.config.info.model_copy(update={"worker_id": 3}))
+    with pytest.raises(RuntimeError):
+        service.reload_env(1)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="multiple workers require fork")
+def test_multi_process_ready() -> None:
+    """A worker exiting before it reported ready fails the start, the replaced supervisor then reads nothing."""
+    launcher = importlib.import_module("pyasyncrpc.launcher.MultiProcessLauncher").MultiProcessLauncher(2)
+    served, served_worker = socket.socketpair()
+    failed, failed_worker = socket.socketpair()
+    launcher._ready = {0: served, 1: failed}
+    served_worker.sendall(b"ready")
+    failed_worker.close()
+    assert not launcher.collect_ready([served, failed])
+    assert launcher._ready == {}
+    assert launcher.collect_ready([])
+    parent, child = socket.socketpair()
+    with parent, served_worker:
+        launcher._ready_fd = child.detach()
+        launcher.report_ready(ready=False)
+        assert parent.recv(16) == b""
+        assert launcher._ready_fd is None
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="the reload is tested on linux")
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.anyio
+async def test_reload(tmp_path: Path, workers: int) -> None:
+    """The new processes serve with other worker ids before the old ones stop accepting and drain."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        addr = f"127.0.0.1:{sock.getsockname()[1]}"
+    method = {"grpc_method_name": "sayHello", "pkg": "rpc", "method_name": "say_hello"}
+    args = [
+        *("--service_name", "Simple"),
+        *("--handle_func_name", "add_ServiceServicer_to_server"),
+        *("--server_stub_name", "ServiceStub"),
+        *("--request_func_name", "ServiceRequest"),
+        *("--reply_func_name", "ServiceReply"),
+        *("--pd2_pkg", "rpc.simple_pb2"),
+        *("--pd2_grpc_pkg", "rpc.simple_pb2_grpc"),
+        *("--listen_addr", addr),
+        *("--method", json.dumps(method)),
+        *("--workers", str(workers)),
+        "--reload",
+    ]
+    request_func = importlib.import_module("rpc.simple_pb2").ServiceRequest
+    server_stub = importlib.import_module("rpc.simple_pb2_grpc").ServiceStub
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(TESTS_PATH.parent / "src"), str(TESTS_PATH)])}
+
+    async def say_hello() -> int:
+        async with grpc.aio.insecure_channel(addr) as channel:
+            ret = await server_stub(channel).sayHello(request_func(name="reload"), wait_for_ready=True, timeout=30)
+            assert ret.status == 200
+            request_id = int(re.match(r"\d+", ret.message).group())  # type: ignore[union-attr]
+            return (request_id >> 12) & 31
+
+    log = tmp_path / "reload.log"
+    with log.open("wb") as output:
+        process = await anyio.open_process(
+            [sys.executable, "-m", "pyasyncrpc", *args], env=env, stdout=output, stderr=output
+        )
+    assert await say_hello() in range(1, 1 + workers)
+    process.send_signal(signal.SIGHUP)
+    with anyio.fail_after(30):
+        assert await process.wait() == 0
+    assert await say_hello() in range(1 + workers, 1 + 2 * workers)
+    text = log.read_text(errors="replace")
+    match = re.search(r"reload:the new process (\d+) is ready", text)
+    assert match is not None
+    assert "drained" in text
+    os.kill(int(match.group(1)), signal.SIGTERM)
+    stat = Path("/proc") / match.group(1) / "stat"
+    with anyio.fail_after(30), contextlib.suppress(FileNotFoundError):
+        while ") Z " not in stat.read_text():  # noqa: ASYNC110
+            await anyio.sleep(0.1)
@@ -0,0 +1,74 @@
+"""The asynchronous rpc application.
+
+Copyright (c) 2023-present 善假于PC也 (zlhywlf).
+"""
+
+import logging
+import multiprocessing
+import threading
+from pathlib import Path
+from typing import Any, Generator, List
+
+import loguru
+import pytest
+from pyasyncrpc.log.QueueLog import QueueLog
+
+
+@pytest.fixture
+def root_logger() -> Generator[logging.Logger, Any, None]:
+    """Restore the root logger."""
+    handlers, level = logging.root.handlers, logging.root.level
+    yield logging.root
+    logging.root.handlers = handlers
+    logging.root.setLevel(level)
+
+
+def test_queue_log(root_logger: logging.Logger) -> None:
+    """Records are gated, queued, dropped when the queue is full and written in the background."""
+    released = threading.Event()
+    messages: List[Any] = []
+
+    def sink(message: Any) -> None:  # noqa: ANN401
+        released.wait(10)
+        messages.append(message.record)
+
+    sink_id = loguru.logger.add(sink, level="DEBUG")
+    log = QueueLog(logging.INFO, maxsize=10)
+    try:
+        log.init_log()
+        for i in range(30):
+            root_logger.debug("hidden %d", i)
+            root_logger.info("shown %d", i)
+        released.set()
+        log.handler.close()
+    finally:
+        loguru.logger.remove(sink_id)
+    assert log.handler.dropped > 0
+    assert log.handler.written == len(messages) == 30 - log.handler.dropped
+    assert all(record["message"].startswith("shown") for record in messages)
+    assert messages[0]["function"] == "test_queue_log"
+    assert messages[0]["name"] == __name__
+
+
+def log_in_child(path: str) -> None:
+    """Log through the handler inherited from the parent."""
+    loguru.logger.add(path, format="{name}|{message}")
+    logging.root.info("child %d", 1)
+    for handler in logging.root.handlers:
+        handler.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork is required")
+def test_queue_log_after_fork(root_logger: logging.Logger, tmp_path: Path) -> None:  # noqa: ARG001
+    """A forked child restarts the writer and writes its own records."""
+    log = QueueLog(logging.INFO, maxsize=10)
+    log.init_log()
+    path = tmp_path / "child.log"
+    try:
+        process = multiprocessing.get_context("fork").Process(target=log_in_child, args=(str(path),))
+        process.start()
+        process.join(10)
+    finally:
+        log.handler.close()
+    assert process.exitcode == 0
+    assert path.read_text().strip() == f"{__name__}|child 1"
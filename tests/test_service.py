@@ -4,11 +4,30 @@ Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
 import asyncio
-from typing import Any
+import json
+import sys
+import time
+from typing import Any, List
 
+import anyio
+import grpc
 import pytest
 from faker import Faker
-from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject
+from pyasyncrpc.model.GRPCConfig import (
+    AdmissionInfo,
+    CompressionInfo,
+    DeferredQueueInfo,
+    GRPCMethodInfo,
+    ProfilerInfo,
+    ReplyCacheInfo,
+    TracingInfo,
+    WarmupInfo,
+)
+from pyasyncrpc.model.PyScriptConfig import PyScriptBatch, PyScriptBatchResult, PyScriptConfig, PyScriptObject
+from pyasyncrpc.model.RequestContext import FastRequestContext, RequestContext
+from pyasyncrpc.service.GRPCService import GRPCService, GRPCServiceMiddleware
+from pyasyncrpc.service.HealthService import HealthService
+from pydantic import BaseModel, Field, computed_field
 
 
 @pytest.mark.anyio
@@ -38,9 +57,499 @@ async def test_execute_py_script(grpc_stub: Any, grpc_request: Any, faker: Faker
     assert ret.status == 200
 
 
-@pytest.mark.parametrize("func", [test_base, test_execute_py_script])
+@pytest.mark.anyio
+async def test_execute_py_script_in_process(grpc_stub: Any, grpc_request: Any, faker: Faker) -> None:  # noqa: ANN401
+    """Execute python script in the process pool."""
+    class_arg = faker.name()
+    cls_info = PyScriptObject(name="ArgClass", args=[class_arg], methods=[PyScriptObject(name="run", args=[""])])
+    config = PyScriptConfig(pkg="script.base_case", objects=[cls_info], executor="process")
+    ret = await grpc_stub.executePyScript(grpc_request(name=config.model_dump_json()))
+    assert f"-{class_arg}" in ret.message
+    assert ret.status == 200
+
+
+@pytest.mark.anyio
+async def test_execute_py_script_batch(
+    grpc_server: GRPCService,
+    grpc_stub: Any,  # noqa: ANN401
+    grpc_request: Any,  # noqa: ANN401
+    faker: Faker,
+) -> None:
+    """Execute many python scripts in one call, failures are reported per script, the plans are cached by raw JSON."""
+    names = [faker.name() for _ in range(20)]
+    configs = [
+        PyScriptConfig(
+            pkg="script.base_case",
+            objects=[PyScriptObject(name="ArgClass", args=[name], methods=[PyScriptObject(name="run", args=[""])])],
+        )
+        for name in names
+    ]
+    configs[0].executor = "process"
+    configs.append(PyScriptConfig(pkg="script.base_case", executor="missing"))
+    configs.append(PyScriptConfig(pkg="script.not_found"))
+    batch = PyScriptBatch(configs=[_.model_dump_json() for _ in configs], concurrency=1000)
+    ret = await grpc_stub.executePyScriptBatch(grpc_request(name=batch.model_dump_json()))
+    results = PyScriptBatchResult.model_validate_json(ret.message).results
+    assert [result.response.get("run") for result in results[:-2]] == [f"-{name}" for name in names]
+    assert results[-2].msg == "Unknown python script executor:missing"
+    assert results[-1].msg == "No module named 'script.not_found'"
+    assert not results[-1].success
+    hits = grpc_server.plans.hits
+    await grpc_stub.executePyScriptBatch(grpc_request(name=batch.model_dump_json()))
+    assert grpc_server.plans.hits == hits + len(configs)
+
+
+@pytest.mark.anyio
+async def test_stream_py_script(grpc_stub: Any, grpc_request: Any) -> None:  # noqa: ANN401
+    """Stream the python script responses in order, then the error of the failed object."""
+    config = PyScriptConfig(
+        pkg="script.base_case",
+        objects=[
+            PyScriptObject(name="Simple", methods=[PyScriptObject(name="run")]),
+            PyScriptObject(name="echo", args=["streamed"]),
+            PyScriptObject(name="ArgClass", methods=[PyScriptObject(name="run", args=[""])]),
+        ],
+    )
+    replies = [ret async for ret in grpc_stub.streamPyScript(grpc_request(name=config.model_dump_json()))]
+    assert [ret.status for ret in replies] == [200, 200, 500]
+    assert [ret.message for ret in replies[:2]] == ["run:success", "echo:streamed"]
+    assert replies[2].message.endswith("missing 1 required positional argument: 'name'")
+
+
+@pytest.mark.anyio
+async def test_chat(grpc_stub: Any, grpc_request: Any, faker: Faker) -> None:  # noqa: ANN401
+    """Bidirectional streaming."""
+    names = [faker.name() for _ in range(5)]
+    call = grpc_stub.chat()
+    for name in names:
+        await call.write(grpc_request(name=name))
+        ret = await call.read()
+        assert ret.message.endswith(f"[echo: {name}]")
+    await call.done_writing()
+    assert await call.read() == grpc.aio.EOF
+
+
+@pytest.mark.parametrize("func", [test_base, test_execute_py_script, test_execute_py_script_in_process])
 @pytest.mark.anyio
 async def test_concurrent_requests(grpc_stub: Any, grpc_request: Any, faker: Faker, func: Any) -> None:  # noqa: ANN401
     """Concurrency test."""
     num = 100
     await asyncio.gather(*[asyncio.create_task(func(grpc_stub, grpc_request, faker)) for _ in range(num)])
+
+
+class CountMiddleware(GRPCServiceMiddleware):
+    """count the middleware calls."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.pre_count = 0
+        self.post_count = 0
+
+    async def pre(self, ctx: RequestContext) -> None:  # noqa: ARG002
+        """Execute before service."""
+        self.pre_count += 1
+
+    async def post(self, ctx: RequestContext, ret: BaseModel) -> None:  # noqa: ARG002
+        """Execute after service."""
+        self.post_count += 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("skip_middlewares", [True, False])
+async def test_reply_cache(grpc_server: GRPCService, skip_middlewares: bool) -> None:  # noqa: FBT001
+    """Identical requests are answered from the reply cache."""
+    cache = ReplyCacheInfo(ttl=60, max_entries=1, skip_middlewares=skip_middlewares)
+    method_info = GRPCMethodInfo(grpc_method_name="sayHello", pkg="rpc", method_name="say_hello", cache=cache)
+    middleware = CountMiddleware()
+    service = GRPCService(grpc_server.config.info, [method_info], middlewares=(middleware,))
+    method = service.config.methods[0]
+    wrap: Any = method.method
+    replies = [await wrap(None, service.config.request_func(name=name), None) for name in ("a", "a", "b", "a")]
+    assert replies[0] == replies[1]
+    assert replies[0] != replies[3]
+    assert (method.cache.hits, method.cache.misses, method.cache.evictions) == (1, 3, 2)
+    assert middleware.pre_count == (3 if skip_middlewares else 4)
+    assert middleware.post_count == middleware.pre_count
+    metrics = service.metrics.method("sayHello")
+    assert (metrics.requests, metrics.latency.count, metrics.cache_hits, metrics.cache_misses) == (4, 4, 1, 3)
+    assert 'pyasyncrpc_cache_requests_total{method="sayHello",cache="hit"} 1' in service.metrics.to_prometheus()
+
+
+class SlowMiddleware(GRPCServiceMiddleware):
+    """slow middleware off the request path."""
+
+    deferred = True
+    concurrent = True
+
+    def __init__(self, fail: bool = False) -> None:  # noqa: FBT001, FBT002
+        """Init."""
+        self.fail = fail
+
+    async def pre(self, ctx: RequestContext) -> None:  # noqa: ARG002
+        """Execute before service."""
+        await asyncio.sleep(0.02)
+
+    async def post(self, ctx: RequestContext, ret: BaseModel) -> None:  # noqa: ARG002
+        """Execute after service."""
+        await asyncio.sleep(0.2)
+        if self.fail:
+            msg = "audit failed"
+            raise RuntimeError(msg)
+
+
+@pytest.mark.anyio
+async def test_deferred_middleware(grpc_server: GRPCService) -> None:
+    """Deferred post hooks run after the reply on the bounded queue, concurrent pre hooks together."""
+    info = grpc_server.config.info.model_copy(update={"deferred_queue": DeferredQueueInfo(max_size=1, workers=1)})
+    count = CountMiddleware()
+    service = GRPCService(info, middlewares=(SlowMiddleware(), SlowMiddleware(fail=True), count))
+
+    async def echo(ctx: FastRequestContext) -> object:
+        return service.config.reply_func(message=ctx.request.name, status=200)
+
+    wrap: Any = service.register_method("echo", fast=True)(echo)
+    metrics = service.metrics
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(service.deferred_queue.run)
+        await anyio.lowlevel.checkpoint()
+        start = time.perf_counter()
+        await wrap(None, service.config.request_func(name="a"), None)
+        assert time.perf_counter() - start < 0.1
+        await wrap(None, service.config.request_func(name="b"), None)
+        assert (count.pre_count, count.post_count) == (2, 2)
+        assert (metrics.deferred_queued, metrics.deferred_dropped, metrics.deferred_completed) == (1, 2, 0)
+        await service.deferred_queue.close(1)
+    assert (metrics.deferred_queued, metrics.deferred_completed, metrics.deferred_errors) == (0, 1, 1)
+    assert "pyasyncrpc_deferred_dropped_total 2" in metrics.to_prometheus()
+
+
+@pytest.mark.anyio
+async def test_background_tasks(grpc_server: GRPCService) -> None:
+    """The background tasks run from start to close without wait, which returns once the server stopped."""
+    deferred_queue = DeferredQueueInfo(max_size=1, workers=1, overflow="block")
+    info = grpc_server.config.info.model_copy(update={"listen_addr": "localhost:0", "deferred_queue": deferred_queue})
+    service = GRPCService(info, middlewares=(SlowMiddleware(),))
+
+    async def echo(ctx: FastRequestContext) -> object:
+        return service.config.reply_func(message=ctx.request.name, status=200)
+
+    wrap: Any = service.register_method("echo", fast=True)(echo)
+    metrics = service.metrics
+    async with service:
+        await service.start()
+        with anyio.fail_after(5):
+            for name in "abc":
+                await wrap(None, service.config.request_func(name=name), None)
+            while metrics.deferred_completed < 2:  # noqa: ASYNC110
+                await anyio.sleep(0.05)
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(service.wait)
+                await service.close()
+    assert (metrics.deferred_completed, metrics.deferred_dropped) == (3, 0)
+
+
+class TraceContext:
+    """servicer context carrying the trace context of the caller."""
+
+    def __init__(self, traceparent: str) -> None:
+        """Init."""
+        self.traceparent = traceparent
+
+    def invocation_metadata(self) -> Any:  # noqa: ANN401
+        """Metadata of the rpc."""
+        return (("traceparent", self.traceparent),)
+
+
+@pytest.mark.anyio
+async def test_tracing(grpc_server: GRPCService) -> None:
+    """Sampled requests record the stages and the python script steps as spans, following the caller context."""
+    info = grpc_server.config.info.model_copy(update={"tracing": TracingInfo(sample_rate=1)})
+    service = GRPCService(info)
+    cls_info = PyScriptObject(name="ArgClass", args=["a"], methods=[PyScriptObject(name="run", args=["b"])])
+    config = PyScriptConfig(pkg="script.base_case", objects=[cls_info])
+
+    async def run(ctx: FastRequestContext) -> object:  # noqa: ARG001
+        result = await service.executors["thread"].execute(config)
+        return service.config.reply_func(message=str(result.response), status=200)
+
+    wrap: Any = service.register_method("run", fast=True)(run)
+    await wrap(None, service.config.request_func(name="a"), None)
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    await wrap(None, service.config.request_func(name="b"), TraceContext(f"00-{trace_id}-{parent_id}-01"))
+    await wrap(None, service.config.request_func(name="c"), TraceContext(f"00-{trace_id}-{parent_id}-00"))
+    spans = json.loads(await service.dump_traces(b"", None))
+    assert len({_["trace_id"] for _ in spans}) == 2
+    spans = [_ for _ in spans if _["trace_id"] == trace_id]
+    by_name = {_["name"]: _ for _ in spans}
+    assert set(by_name) == {
+        "rpc run",
+        "pre",
+        "handler",
+        "post",
+        "thread_queue",
+        "execute",
+        "import",
+        "call ArgClass",
+        "call run",
+    }
+    assert by_name["rpc run"]["parent_id"] == parent_id
+    assert by_name["handler"]["parent_id"] == by_name["rpc run"]["span_id"]
+    assert by_name["execute"]["parent_id"] == by_name["handler"]["span_id"]
+    assert by_name["call run"]["parent_id"] == by_name["call ArgClass"]["span_id"]
+    assert by_name["call ArgClass"]["parent_id"] == by_name["execute"]["span_id"]
+    assert len({_["attributes"]["request_id"] for _ in spans}) == 1
+
+
+@pytest.mark.anyio
+async def test_slow_request_log(grpc_server: GRPCService) -> None:
+    """The stacks of the python scripts of the requests slower than the threshold are recorded once."""
+    info = grpc_server.config.info.model_copy(update={"profiler": ProfilerInfo(slow_request_threshold=0.1)})
+    service = GRPCService(info)
+    config = PyScriptConfig(pkg="time", objects=[PyScriptObject(name="sleep", args=[0.4])])
+
+    async def run(ctx: RequestContext) -> object:
+        await service.executors["thread"].execute(config)
+        return service.config.reply_func(message=str(ctx.request_id), status=200)
+
+    wrap: Any = service.register_method("run")(run)
+    slow_requests = service.slow_requests
+    assert slow_requests is not None
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(wrap, None, service.config.request_func(name="a"), None)
+        await anyio.sleep(0.05)
+        assert slow_requests.check() == []
+        await anyio.sleep(0.15)
+        records = slow_requests.check()
+        assert slow_requests.check() == []
+    assert len(records) == 1
+    assert records[0]["method"] == "run"
+    assert records[0]["request_id"] is not None
+    assert records[0]["elapsed"] >= 0.1
+    (stack,) = records[0]["stacks"].values()
+    assert "PyScriptActuator.py" in stack
+    assert json.loads(await service.dump_slow_requests(b"", None)) == records
+    assert "Profile" in service.admin.methods
+    assert "Profile" not in grpc_server.admin.methods
+    assert isinstance(await service.dump_profile(b'{"duration": 0.01}', None), bytes)
+    for request in (b'{"duration": 3600}', b'{"duration": -1}', b"[]"):
+        context = AbortContext()
+        with pytest.raises(RuntimeError, match="profile duration"):
+            await service.dump_profile(request, context)
+        assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+
+
+class AliasData(BaseModel):
+    """reply data with an alias and a computed field."""
+
+    text: str = Field(alias="message")
+
+    @computed_field  # type: ignore[misc]
+    @property
+    def status(self) -> int:
+        """Status."""
+        return len(self.text)
+
+
+@pytest.mark.anyio
+async def test_fast_context(grpc_server: GRPCService) -> None:
+    """Fast methods receive an unvalidated context and may return the reply message."""
+    service = GRPCService(grpc_server.config.info)
+    reply_func = service.config.reply_func
+    contexts: List[Any] = []
+
+    async def reply_message(ctx: FastRequestContext) -> object:
+        contexts.append(ctx)
+        return reply_func(message=ctx.request.name, status=200)
+
+    async def reply_model(ctx: RequestContext) -> AliasData:
+        contexts.append(ctx)
+        return AliasData(message=ctx.request.name)
+
+    request = service.config.request_func(name="fast")
+    message_wrap = service.register_method("message", fast=True)(reply_message)
+    model_wrap = service.register_method("model")(reply_model)
+    assert await message_wrap(None, request, None) == reply_func(message="fast", status=200)
+    assert await model_wrap(None, request, None) == reply_func(**AliasData(message="fast").model_dump(by_alias=True))
+    assert isinstance(contexts[0], FastRequestContext)
+    assert isinstance(contexts[1], RequestContext)
+
+
+@pytest.mark.anyio
+async def test_metrics(grpc_server: GRPCService, grpc_stub: Any, grpc_request: Any, grpc_channel: Any) -> None:  # noqa: ANN401
+    """Metrics are recorded per method and served by the admin service."""
+    metrics = grpc_server.metrics.method("sayHello")
+    requests = metrics.requests
+    await grpc_stub.sayHello(grpc_request(name="metrics"))
+    assert metrics.requests == requests + 1
+    assert metrics.handler.count == requests + 1
+    assert metrics.in_flight == 0
+    text = (await grpc_channel.unary_unary("/pyasyncrpc.Admin/Metrics")(b"")).decode()
+    assert f'pyasyncrpc_requests_total{{method="sayHello"}} {requests + 1}' in text
+    assert 'pyasyncrpc_stage_seconds_bucket{method="sayHello",stage="handler",le="+Inf"}' in text
+    assert "pyasyncrpc_thread_limiter_total_tokens 40" in text
+
+
+class AbortContext:
+    """servicer context recording the abort."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.code: Any = None
+
+    async def abort(self, code: grpc.StatusCode, details: str) -> None:
+        """Abort the rpc."""
+        self.code = code
+        raise RuntimeError(details)
+
+
+@pytest.mark.anyio
+async def test_admission(grpc_server: GRPCService) -> None:
+    """Requests beyond the limits fail fast, queued requests are shed once they waited too long."""
+    service = GRPCService(grpc_server.config.info)
+    request = service.config.request_func(name="admission")
+    release = asyncio.Event()
+
+    async def wait(ctx: FastRequestContext) -> object:  # noqa: ARG001
+        await release.wait()
+        return service.config.reply_func(message="done", status=200)
+
+    admission = AdmissionInfo(max_in_flight=1, max_queued=1)
+    wrap: Any = service.register_method("wait", fast=True, admission=admission)(wait)
+    contexts = [AbortContext() for _ in range(3)]
+    tasks = [asyncio.ensure_future(wrap(None, request, context)) for context in contexts]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [context.code for context in contexts] == [None, None, grpc.StatusCode.RESOURCE_EXHAUSTED]
+    assert isinstance(results[2], RuntimeError)
+    assert service.metrics.method("wait").rejected == 1
+
+    async def slow(ctx: FastRequestContext) -> object:  # noqa: ARG001
+        time.sleep(0.02)  # noqa: ASYNC251
+        await asyncio.sleep(0)
+        return service.config.reply_func(message="done", status=200)
+
+    admission = AdmissionInfo(max_in_flight=1, max_queued=10, target_delay=0.001, interval=0.01)
+    wrap = service.register_method("slow", fast=True, admission=admission)(slow)
+    contexts = [AbortContext() for _ in range(6)]
+    await asyncio.gather(*(wrap(None, request, context) for context in contexts), return_exceptions=True)
+    codes = [context.code for context in contexts]
+    assert codes[:2] == [None, None]
+    assert grpc.StatusCode.RESOURCE_EXHAUSTED in codes
+    assert service.config.methods[-1].admission.shed == service.metrics.method("slow").rejected
+
+
+class CompressionContext:
+    """servicer context recording the compression."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.compression: Any = None
+
+    def set_compression(self, compression: grpc.Compression) -> None:
+        """Set the compression."""
+        self.compression = compression
+
+
+@pytest.mark.anyio
+async def test_compression(grpc_server: GRPCService) -> None:
+    """Replies are compressed from the minimum size, the ratio is sampled."""
+    service = GRPCService(grpc_server.config.info)
+
+    async def echo(ctx: FastRequestContext) -> object:
+        return service.config.reply_func(message=ctx.request.name, status=200)
+
+    compression = CompressionInfo(min_size=100, sample_every=2)
+    wrap: Any = service.register_method("echo", fast=True, compression=compression)(echo)
+    sizes = [10, 1000, 1000, 1000]
+    contexts = [CompressionContext() for _ in sizes]
+    for size, context in zip(sizes, contexts):
+        await wrap(None, service.config.request_func(name="x" * size), context)
+    assert [context.compression for context in contexts] == [
+        grpc.Compression.NoCompression,
+        grpc.Compression.Gzip,
+        grpc.Compression.Gzip,
+        grpc.Compression.Gzip,
+    ]
+    metrics = service.metrics.method("echo")
+    assert (metrics.uncompressed, metrics.compressed, metrics.compression_samples) == (1, 3, 2)
+    assert metrics.compression_bytes < metrics.compression_raw_bytes
+
+
+@pytest.mark.anyio
+async def test_lazy_method(grpc_server: GRPCService) -> None:
+    """Lazy methods import their package on the first call."""
+    method_info = GRPCMethodInfo(
+        grpc_method_name="runScript", pkg="script.lazy_case", method_name="run_script", fast=True, lazy=True
+    )
+    service = GRPCService(grpc_server.config.info, [method_info])
+    assert "script.lazy_case" not in sys.modules
+    wrap: Any = service.config.methods[0].method
+    reply = await wrap(None, service.config.request_func(name="lazy"), None)
+    assert reply == service.config.reply_func(message="lazy", status=200)
+    assert "script.lazy_case" in sys.modules
+
+
+@pytest.mark.anyio
+async def test_warmup(grpc_server: GRPCService) -> None:
+    """The warm-up preloads packages, resolves lazy methods and sends the synthetic requests off the metrics."""
+    info = grpc_server.config.info.model_copy(
+        update={
+            "warmup": WarmupInfo(
+                pkgs=["script.warmup_case", "script.not_found"],
+                requests={"echo": [{"name": "a"}, {"name": "b"}], "chat": [{}]},
+            )
+        }
+    )
+    methods_info = [
+        GRPCMethodInfo(grpc_method_name="chat", pkg="rpc", method_name="chat", request_streaming=True),
+        GRPCMethodInfo(grpc_method_name="runScript", pkg="script.lazy_case", method_name="run_script", lazy=True),
+        GRPCMethodInfo(grpc_method_name="broken", pkg="script.not_found", method_name="run", lazy=True),
+    ]
+    service = GRPCService(info, methods_info)
+    names: List[str] = []
+
+    async def echo(ctx: FastRequestContext) -> object:
+        names.append(ctx.request.name)
+        return service.config.reply_func(message=ctx.request.name, status=200)
+
+    service.register_method("echo", cache=ReplyCacheInfo(), fast=True)(echo)
+    await service.warmup()
+    assert "script.warmup_case" in sys.modules
+    assert "script.lazy_case" in sys.modules
+    assert names == ["a", "b"]
+    assert service.metrics.method("echo").requests == 0
+    assert service.metrics.method("chat").requests == 0
+    meta = next(_ for _ in service.config.methods if _.grpc_method_name == "echo")
+    assert len(meta.cache) == 0
+
+
+@pytest.mark.anyio
+async def test_health(grpc_server: GRPCService, grpc_channel: Any) -> None:  # noqa: ANN401, ARG001
+    """The health status follows the lifecycle and the load report is served."""
+    check = grpc_channel.unary_unary("/grpc.health.v1.Health/Check")
+    assert await check(b"") == HealthService.encode_response(HealthService.SERVING)
+    assert await check(b"\x0a\x06Simple") == HealthService.encode_response(HealthService.SERVING)
+    with pytest.raises(grpc.aio.AioRpcError) as e:
+        await check(b"\x0a\x07Unknown")
+    assert e.value.code() == grpc.StatusCode.NOT_FOUND
+    watch = grpc_channel.unary_stream("/grpc.health.v1.Health/Watch")(b"")
+    assert await watch.read() == HealthService.encode_response(HealthService.SERVING)
+    watch.cancel()
+    report = json.loads(await grpc_channel.unary_unary("/pyasyncrpc.Load/Report")(b""))
+    assert set(report) == {"in_flight", "thread_utilization", "loop_lag", "p99"}
+
+    health = HealthService("Simple")
+    replies: List[bytes] = []
+
+    async def watch_status() -> None:
+        async for reply in health.watch(b"", None):
+            replies.append(reply)
+
+    task = asyncio.ensure_future(watch_status())
+    await asyncio.sleep(0.05)
+    health.set_status(HealthService.SERVING)
+    await asyncio.sleep(0.05)
+    health.shutdown()
+    await asyncio.wait_for(task, 1)
+    assert replies == [HealthService.encode_response(_) for _ in (2, 1, 2)]
@@ -4,12 +4,32 @@ Copyright (c) 2023-present 善假于PC也 (zlhywlf).
 """
 
 import contextlib
+import importlib
+import multiprocessing
+import os
+import pickle  # noqa: S403
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
 from weakref import proxy
 
 import anyio
 import pytest
-from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject
+from pyasyncrpc.model.BenchmarkConfig import BenchmarkInfo, BenchmarkReport
+from pyasyncrpc.model.PyScriptConfig import PyScriptConfig, PyScriptObject, PyScriptResult
+from pyasyncrpc.service.Benchmark import Benchmark
+from pyasyncrpc.util.AdaptiveThreadLimiter import AdaptiveThreadLimiter
+from pyasyncrpc.util.CancelToken import CancelToken
+from pyasyncrpc.util.DeferredQueue import DeferredQueue
+from pyasyncrpc.util.Metrics import Metrics
 from pyasyncrpc.util.PyScriptActuator import PyScriptActuator
+from pyasyncrpc.util.PyScriptCodec import PyScriptCodec
+from pyasyncrpc.util.PyScriptExecutor import ProcessPyScriptExecutor, ThreadPyScriptExecutor
+from pyasyncrpc.util.PyScriptPlan import PyScriptPlanCache
+from pyasyncrpc.util.SamplingProfiler import SamplingProfiler
+from pyasyncrpc.util.Snowflake import Snowflake
 from script.common import TEST_RESULT_SUCCESS
 
 
@@ -65,3 +85,317 @@ async def test_method_is_not_found() -> None:
         await anyio.to_thread.run_sync(proxy(actuator))
     assert actuator.result.msg == "'Simple' object has no attribute 'not_found'"
     assert not actuator.result.success
+
+
+@pytest.mark.anyio
+async def test_process_executor() -> None:
+    """Workers are recycled after the maximum number of tasks."""
+    executor = ProcessPyScriptExecutor(size=1, max_tasks_per_child=2)
+    await executor.start()
+    try:
+        config = PyScriptConfig(pkg="script.base_case", objects=[PyScriptObject(name="run")])
+        pid = executor._idle[0].pid
+        results = [await executor.execute(config) for _ in range(2)]
+        assert executor._idle[0].pid != pid
+        pid = executor._idle[0].pid
+        results.append(await executor.execute(config))
+        assert executor._idle[0].pid == pid
+        assert all(result.success and result.response == {"run": TEST_RESULT_SUCCESS} for result in results)
+        config = PyScriptConfig(pkg="os", objects=[PyScriptObject(name="getpid")])
+        assert (await executor.execute(config)).response == {"getpid": pid}
+        assert executor._idle[0].pid != pid
+        config = PyScriptConfig(pkg="script.not_found")
+        result = await executor.execute(config)
+        assert result.msg == "No module named 'script.not_found'"
+        assert not result.success
+    finally:
+        await executor.close()
+
+
+@pytest.mark.anyio
+async def test_process_executor_close(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Workers still busy once the close timeout expired are killed, later calls fail."""
+    monkeypatch.setattr(ProcessPyScriptExecutor, "CLOSE_TIMEOUT", 0.2)
+    executor = ProcessPyScriptExecutor(size=2)
+    await executor.start()
+    workers = list(executor._idle)
+    results: List[PyScriptResult] = []
+    config = PyScriptConfig(pkg="time", objects=[PyScriptObject(name="sleep", args=[10])])
+
+    async def execute() -> None:
+        results.append(await executor.execute(config))
+
+    with anyio.fail_after(5):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(execute)
+            await anyio.sleep(0.1)
+            await executor.close()
+    assert (results[0].success, results[0].msg) == (False, "The worker process exited unexpectedly")
+    assert not any(worker._process.is_alive() for worker in workers)
+    assert executor._workers == set()
+    with anyio.fail_after(1):
+        assert (await executor.execute(config)).msg == "The process pool is closed"
+
+
+@pytest.mark.anyio
+async def test_cancel_token() -> None:
+    """Threads stop between calls past the deadline, process workers are killed."""
+    cls_info = PyScriptObject(name="ArgClass", args=["name"], methods=[PyScriptObject(name="run", args=["xx"])])
+    config = PyScriptConfig(pkg="script.base_case", objects=[cls_info, PyScriptObject(name="run")])
+    result = await ThreadPyScriptExecutor().execute(config, CancelToken(0.05))
+    assert (result.success, result.msg) == (False, "The deadline is exceeded")
+    assert result.response == {"run": "xx-name"}
+    token = CancelToken()
+    token.cancel()
+    result = await ThreadPyScriptExecutor().execute(config, token)
+    assert (result.success, result.response) == (False, {})
+
+    executor = ProcessPyScriptExecutor(size=1)
+    await executor.start()
+    try:
+        cls_info.methods = [PyScriptObject(name="run", args=["x" * 10])]
+        config = PyScriptConfig(pkg="script.base_case", objects=[cls_info])
+        start = time.perf_counter()
+        result = await executor.execute(config, CancelToken(0.1))
+        assert time.perf_counter() - start < 0.4
+        assert (result.success, result.msg) == (False, "The deadline is exceeded")
+        result = await executor.execute(PyScriptConfig(pkg="script.base_case", objects=[PyScriptObject(name="run")]))
+        assert result.response == {"run": TEST_RESULT_SUCCESS}
+    finally:
+        await executor.close()
+
+
+def test_plan_cache() -> None:
+    """Plans are reused, evicted and resolved again after the module is reloaded."""
+    cache = PyScriptPlanCache(1)
+    raw = PyScriptConfig(pkg="script.base_case", objects=[PyScriptObject(name="run")]).model_dump_json()
+    plan = cache.get(raw)
+    assert cache.get(raw) is plan
+    assert (cache.hits, cache.misses) == (1, 1)
+    PyScriptActuator(plan)()
+    assert plan.resolved
+    importlib.reload(importlib.import_module("script.base_case"))
+    assert not plan.resolved
+    actuator = PyScriptActuator(plan)
+    actuator()
+    assert actuator.result.response.get("run") == TEST_RESULT_SUCCESS
+    assert plan.resolved
+    cache.get(PyScriptConfig(pkg="script.common").model_dump_json())
+    assert len(cache) == 1
+    assert cache.get(raw) is not plan
+
+
+def test_py_script_codec() -> None:
+    """Large buffers travel out of band and are decoded without copies."""
+    blob = bytes(range(256)) * 16
+    result = PyScriptResult(
+        response={"array": array("d", range(512)), "blob": blob, "view": memoryview(b"small"), "items": [1, (blob,)]}
+    )
+    frame = PyScriptCodec.dumps(result)
+    assert PyScriptCodec.is_binary(frame)
+    assert not PyScriptCodec.is_binary(PyScriptResult().model_dump_json().encode())
+    assert frame.count(blob) == 2
+    decoded = PyScriptCodec.loads(frame, PyScriptResult)
+    assert decoded.response["array"] == result.response["array"]
+    assert isinstance(decoded.response["blob"], memoryview)
+    assert decoded.response["blob"].obj is frame
+    assert decoded.response["blob"] == blob
+    assert decoded.response["view"] == b"small"
+    assert decoded.response["items"][1][0] == blob
+    config = PyScriptConfig(pkg="script.base_case", objects=[PyScriptObject(name="scale", args=[array("i", [1]), 3])])
+    plan = PyScriptPlanCache(0).get(PyScriptCodec.dumps(config))
+    actuator = PyScriptActuator(plan)
+    actuator()
+    assert actuator.result.response.get("scale") == array("i", [3])
+    small = PyScriptResult(response={"array": array("b", [1]), "set": {1}, "bytes": bytearray(b"x")})
+    assert PyScriptCodec.loads(PyScriptCodec.dumps(small), PyScriptResult).response == small.response
+
+
+class Exploit:
+    """pickled as a call of a global that is not allowed."""
+
+    def __reduce__(self) -> Tuple[Any, Tuple[()]]:
+        """Reduce to a call of os.getcwd."""
+        return os.getcwd, ()
+
+
+def test_py_script_codec_rejects_globals() -> None:
+    """Frames calling globals beyond the plain data are rejected."""
+    data = pickle.dumps({"response": {"x": Exploit()}}, protocol=5)
+    frame = PyScriptCodec.HEADER.pack(PyScriptCodec.MAGIC, 0, len(data)) + data
+    with pytest.raises(pickle.UnpicklingError, match="posix.getcwd|nt.getcwd"):
+        PyScriptCodec.loads(frame, PyScriptResult)
+
+
+def generate_ids(snowflake: Snowflake) -> List[int]:
+    """Generate single IDs and a block of IDs."""
+    return [snowflake.next_id() for _ in range(5000)] + snowflake.next_ids(5000)
+
+
+def generate_process_ids(index: int) -> List[int]:
+    """Generate IDs in a worker process."""
+    return generate_ids(Snowflake.create(index=index))
+
+
+def test_snowflake_unique() -> None:
+    """IDs are unique across threads and processes."""
+    snowflake = Snowflake(1, 1)
+    with ThreadPoolExecutor(8) as pool:
+        ids = [_ for ret in pool.map(generate_ids, [snowflake] * 8) for _ in ret]
+    assert len(set(ids)) == len(ids)
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("spawn")) as pool:
+        ids = [_ for ret in pool.map(generate_process_ids, range(4)) for _ in ret]
+    assert len(set(ids)) == len(ids)
+
+
+def test_snowflake_clock_backwards(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Small clock steps backwards are tolerated."""
+    snowflake = Snowflake(1, 1, max_backward=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    first = snowflake.next_id()
+    monkeypatch.setattr(time, "time", lambda: now - 0.005)
+    assert snowflake.next_id() > first
+    monkeypatch.setattr(time, "time", lambda: now - 1)
+    with pytest.raises(RuntimeError):
+        snowflake.next_id()
+
+
+def test_snowflake_clock_backwards_wait(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Within max_backward the sequence of the last millisecond goes on, then waits for the clock to catch up."""
+    clock = [1700000000000.0]
+    sleeps: List[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        clock[0] += seconds * 1000
+
+    monkeypatch.setattr(time, "time", lambda: clock[0] / 1000)
+    monkeypatch.setattr(time, "sleep", sleep)
+    snowflake = Snowflake(1, 1, max_backward=10)
+    ids = snowflake.next_ids(10)
+    clock[0] -= 5
+    ids += snowflake.next_ids(Snowflake.MAX_SEQUENCE)
+    assert sleeps
+    assert clock[0] >= 1700000000001
+    assert ids == sorted(set(ids))
+    assert (ids[-1] >> 22) - (ids[0] >> 22) == 1
+    clock[0] -= 11
+    with pytest.raises(RuntimeError, match="Clock moved backwards"):
+        snowflake.next_ids(1)
+    clock[0] += 11
+    assert snowflake.next_id() > ids[-1]
+
+
+def test_snowflake_concurrent_blocks() -> None:
+    """Blocks requested concurrently from one worker are unique, each increasing and after the previous one."""
+    snowflake = Snowflake(3, 2)
+
+    def request_blocks() -> List[List[int]]:
+        return [snowflake.next_ids(3000) for _ in range(5)]
+
+    with ThreadPoolExecutor(8) as pool:
+        threads = list(pool.map(lambda _: request_blocks(), range(8)))
+    sequences = [[_ for block in blocks for _ in block] for blocks in threads]
+    assert all(sequence == sorted(sequence) for sequence in sequences)
+    ids = [_ for sequence in sequences for _ in sequence]
+    assert len(set(ids)) == len(ids) == 8 * 5 * 3000
+    assert all(((_ >> 17) & 31, (_ >> 12) & 31) == (2, 3) for _ in ids)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(("mode", "rate"), [("closed", None), ("open", 200)])
+async def test_benchmark(mode: str, rate: Optional[float]) -> None:
+    """Benchmark a local service and compare with a baseline."""
+    info = BenchmarkInfo(
+        handle_func_name="add_ServiceServicer_to_server",
+        server_stub_name="ServiceStub",
+        request_func_name="ServiceRequest",
+        reply_func_name="ServiceReply",
+        pd2_pkg="rpc.simple_pb2",
+        pd2_grpc_pkg="rpc.simple_pb2_grpc",
+        methods=["sayHello", "executePyScript"],
+        mode=mode,
+        rate=rate,
+        concurrency=4,
+        duration=0.3,
+        warmup=0.1,
+    )
+    report = await Benchmark.run_all(info)
+    assert [_.method for _ in report.results] == ["sayHello", "executePyScript"]
+    for result in report.results:
+        assert result.requests
+        assert not result.errors
+        assert result.p50 <= result.p90 <= result.p99 <= result.p999
+    assert not report.compare(report, 0)
+    baseline = BenchmarkReport.model_validate(report.model_dump())
+    baseline.results[0].throughput *= 2
+    baseline.results[1].p99 /= 2
+    assert len(report.compare(baseline, 0.1)) == 2
+
+
+@pytest.mark.anyio
+async def test_adaptive_thread_limiter() -> None:
+    """Tokens shrink while idle, grow under contention and reverse once the throughput drops."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    total_tokens = limiter.total_tokens
+    completed = [0]
+    controller = AdaptiveThreadLimiter(lambda: completed[0], min_tokens=4, max_tokens=16, step=4, target_wait=0.01)
+    try:
+        limiter.total_tokens = 10
+        assert controller.sample(0) == 6
+        assert controller.sample(0) == 4
+        assert controller.sample(0) == 4
+        completed[0] += 10
+        assert controller.sample(1) == 8
+        completed[0] += 100000
+        assert controller.sample(1) == 12
+        completed[0] += 1
+        assert controller.sample(1) == 8
+        assert [_.total_tokens for _ in controller.adjustments] == [6, 4, 8, 12, 8]
+    finally:
+        limiter.total_tokens = total_tokens
+
+
+@pytest.mark.anyio
+async def test_deferred_queue_block_closed() -> None:
+    """A job blocked on the full queue runs inline once the queue is closed."""
+    metrics = Metrics()
+    queue = DeferredQueue(metrics, max_size=1, workers=1, overflow="block")
+    done: List[int] = []
+
+    async def job() -> None:
+        done.append(len(done))
+
+    await queue.submit(job)
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(queue.submit, job)
+        await anyio.lowlevel.checkpoint()
+        await queue.close()
+    assert done == [0]
+    assert (metrics.deferred_queued, metrics.deferred_completed) == (1, 1)
+
+
+def spin(duration: float) -> None:
+    """Keep the thread busy."""
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler() -> None:
+    """The stacks of the other threads are sampled in the collapsed format, one profile at a time."""
+    profiler = SamplingProfiler(0.002)
+    thread = threading.Thread(target=spin, args=(0.5,), name="spinner")
+    thread.start()
+    try:
+        text = profiler.profile(0.2)
+        with profiler._lock, pytest.raises(RuntimeError):
+            profiler.profile(0.1)
+    finally:
+        thread.join()
+    lines = text.splitlines()
+    assert all(_.rpartition(" ")[2].isdigit() for _ in lines)
+    spinner = [_ for _ in lines if _.startswith("spinner;")]
+    assert spinner
+    assert spinner[0].rpartition(" ")[0].endswith(f"spin (test_util.py:{spin.__code__.co_firstlineno})")